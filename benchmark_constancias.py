@@ -0,0 +1,413 @@
+"""
+Benchmark del renderizado de constancias
+Ejecuta cada renderizador sobre todas las plantillas de assets/plantillas y un
+corpus de nombres sintéticos (cortos, muy largos, con acentos, en mayúsculas),
+y reporta percentiles de latencia por constancia, RSS pico, memoria asignada y
+tamaño de salida. Cada renderizador corre en su propio proceso para que el RSS
+pico sea solo suyo. Los resultados se guardan en JSON para comparar corridas.
+
+Uso:
+    python benchmark_constancias.py
+    python benchmark_constancias.py --renderizadores pagina,generador_rapido --nombres 50
+    python benchmark_constancias.py --salida antes.json
+    python benchmark_constancias.py --salida despues.json --comparar antes.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# resource no existe en Windows; ahí no se reporta el RSS pico
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Agregar el directorio raíz al path para importar módulos
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR))
+
+ASSETS_DIR = ROOT_DIR / "assets"
+PLANTILLAS_DIR = ASSETS_DIR / "plantillas"
+
+from utils.optimizacion_pdf import OPTIMIZACIONES
+
+RENDERIZADORES = (
+    'pagina',             # generar_constancia de la página de constancias, motor pypdf2
+    'pagina_rapido',      # generar_constancia de la página de constancias, motor rápido
+    'generador',          # PDFGenerator.generate_constancia, motor pypdf2
+    'generador_rapido',   # PDFGenerator.generate_constancia, motor rápido
+    'simple',             # SimplePDFGenerator.generate_simple_constancia
+)
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Piezas para el corpus de nombres sintéticos
+NOMBRES = ['Ana', 'Luis', 'José', 'María', 'Ángel', 'Sofía', 'Iñaki', 'Zoë', 'Raúl', 'Begoña', 'Jesús', 'Mónica']
+APELLIDOS = ['Pérez', 'Núñez', 'Gómez', 'Castañeda', 'Ibáñez', 'López', 'Martínez', 'Güemes', 'Ríos', 'Peña', 'Li', 'Ortiz']
+
+
+def corpus_nombres(por_categoria, semilla=2025):
+    """
+    Genera el corpus de nombres sintéticos, determinista para una semilla
+
+    Returns:
+        list: Tuplas (categoria, nombre)
+    """
+    aleatorio = random.Random(semilla)
+    corpus = []
+
+    for _ in range(por_categoria):
+        corpus.append(('corto', f"{aleatorio.choice(NOMBRES)[:3]} {aleatorio.choice(APELLIDOS)[:2]}"))
+
+        partes = aleatorio.sample(NOMBRES, 4) + aleatorio.sample(APELLIDOS, 5)
+        corpus.append(('largo', ' '.join(partes)))
+
+        nombre = f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}"
+        corpus.append(('acentos', nombre))
+
+        nombre = f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}"
+        corpus.append(('mayusculas', nombre.upper()))
+
+    return corpus
+
+
+def participante_para_plantilla(plantilla, nombre):
+    """Construye el participante y el tipo de constancia que usa la página para una plantilla"""
+    stem = Path(plantilla).stem
+    if stem.startswith('W') and stem[1:].isdigit():
+        return {'nombre_completo': nombre}, 'workshop'
+    if 'mundialito' in stem.lower():
+        return {'nombre_completo': nombre}, 'mundialito'
+    return {'nombre_completo': nombre}, 'general'
+
+
+def crear_renderizador(nombre, optimizacion=None):
+    """
+    Devuelve una función (plantilla, nombre_completo) -> bytes para un renderizador
+
+    El cache de constancias se desactiva en todos para medir el renderizado real.
+    `optimizacion` no aplica al renderizador 'simple'.
+    """
+    if nombre in ('pagina', 'pagina_rapido'):
+        from utils.assets import obtener_assets
+        from utils.generador_constancias import generar_constancia
+
+        assets = obtener_assets(ASSETS_DIR)
+        motor = 'rapido' if nombre == 'pagina_rapido' else 'pypdf2'
+
+        def renderizar(plantilla, nombre_completo):
+            participante, tipo = participante_para_plantilla(plantilla, nombre_completo)
+            return generar_constancia(participante, tipo, assets=assets, motor=motor, usar_cache=False,
+                                      optimizacion=optimizacion, plantilla=Path(plantilla).name).getvalue()
+        return renderizar
+
+    if nombre in ('generador', 'generador_rapido'):
+        from utils.pdf_generator import PDFGenerator, ESTILO_JII
+
+        generador = PDFGenerator(ASSETS_DIR, usar_cache=False,
+                                 motor='rapido' if nombre == 'generador_rapido' else 'pypdf2',
+                                 optimizacion=optimizacion)
+
+        def renderizar(plantilla, nombre_completo):
+            return generador.generate_constancia(plantilla, nombre_completo, estilo=ESTILO_JII)
+        return renderizar
+
+    if nombre == 'simple':
+        from utils.pdf_generator import SimplePDFGenerator
+
+        generador = SimplePDFGenerator(ASSETS_DIR)
+
+        def renderizar(plantilla, nombre_completo):
+            return generador.generate_simple_constancia(plantilla, nombre_completo)
+        return renderizar
+
+    raise ValueError(f"Renderizador no válido: {nombre}. Opciones: {', '.join(RENDERIZADORES)}")
+
+
+def percentil(valores, p):
+    """Percentil con interpolación lineal sobre valores ya ordenados"""
+    if not valores:
+        return None
+    k = (len(valores) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(valores) - 1)
+    return valores[i] + (valores[j] - valores[i]) * (k - i)
+
+
+def resumir(valores):
+    """Media, mínimo, máximo y percentiles de una lista de mediciones"""
+    ordenados = sorted(valores)
+    resumen = {
+        'n': len(ordenados),
+        'media': statistics.fmean(ordenados),
+        'min': ordenados[0],
+        'max': ordenados[-1],
+    }
+    for p in PERCENTILES:
+        resumen[f"p{p}"] = percentil(ordenados, p)
+    return resumen
+
+
+def rss_pico_mb():
+    """RSS pico del proceso en MB, o None si la plataforma no lo reporta"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def ejecutar_renderizador(nombre, plantillas, corpus, repeticiones, calentamiento, muestras_memoria,
+                          optimizacion=None):
+    """
+    Mide un renderizador; se ejecuta en un proceso hijo
+
+    Returns:
+        dict: Resultados del renderizador
+    """
+    rss_inicial = rss_pico_mb()
+    inicio = time.perf_counter()
+    renderizar = crear_renderizador(nombre, optimizacion)
+    inicializacion_ms = (time.perf_counter() - inicio) * 1000
+
+    # Calentamiento: la primera constancia de cada plantilla parsea y prepara la plantilla
+    for plantilla in plantillas:
+        for _, nombre_completo in corpus[:calentamiento]:
+            renderizar(plantilla, nombre_completo)
+
+    latencias_ms = []
+    tamanos = []
+    por_plantilla = {}
+    por_categoria = {}
+    errores = []
+
+    for _ in range(repeticiones):
+        for plantilla in plantillas:
+            for categoria, nombre_completo in corpus:
+                try:
+                    t0 = time.perf_counter()
+                    pdf_bytes = renderizar(plantilla, nombre_completo)
+                    ms = (time.perf_counter() - t0) * 1000
+                except Exception as e:
+                    errores.append(f"{plantilla} / {nombre_completo}: {e}")
+                    continue
+                latencias_ms.append(ms)
+                tamanos.append(len(pdf_bytes))
+                por_plantilla.setdefault(plantilla, []).append(ms)
+                por_categoria.setdefault(categoria, []).append(ms)
+
+    # Memoria asignada por constancia en una pasada aparte: tracemalloc distorsiona la latencia
+    asignado = []
+    if muestras_memoria:
+        tracemalloc.start()
+        for plantilla in plantillas:
+            for _, nombre_completo in corpus[:muestras_memoria]:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+                renderizar(plantilla, nombre_completo)
+                _, pico = tracemalloc.get_traced_memory()
+                asignado.append(pico - base)
+        tracemalloc.stop()
+
+    return {
+        'renderizador': nombre,
+        'constancias': len(latencias_ms),
+        'errores': errores[:20],
+        'num_errores': len(errores),
+        'inicializacion_ms': inicializacion_ms,
+        'latencia_ms': resumir(latencias_ms) if latencias_ms else None,
+        'latencia_p50_por_plantilla_ms': {p: percentil(sorted(v), 50) for p, v in por_plantilla.items()},
+        'latencia_p50_por_categoria_ms': {c: percentil(sorted(v), 50) for c, v in por_categoria.items()},
+        'constancias_por_segundo': len(latencias_ms) / (sum(latencias_ms) / 1000) if latencias_ms else None,
+        'rss_inicial_mb': rss_inicial,
+        'rss_pico_mb': rss_pico_mb(),
+        'asignado_pico_por_constancia_bytes': resumir(asignado) if asignado else None,
+        'tamano_salida_bytes': resumir(tamanos) if tamanos else None,
+    }
+
+
+def _ejecutar_en_hijo(cola, *args):
+    try:
+        cola.put(ejecutar_renderizador(*args))
+    except Exception as e:
+        cola.put({'renderizador': args[0], 'error_fatal': str(e)})
+
+
+def ejecutar_aislado(*args, timeout=None):
+    """
+    Ejecuta un renderizador en un proceso nuevo para medir su RSS pico por separado
+
+    Si el proceso muere sin entregar resultado (por ejemplo, lo mata el OOM
+    killer) o tarda más de timeout segundos, devuelve un resultado con
+    'error_fatal' en lugar de quedarse esperando.
+    """
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_ejecutar_en_hijo, args=(cola,) + args)
+    proceso.start()
+    limite = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            resultado = cola.get(timeout=1)
+            break
+        except queue.Empty:
+            pass
+        if not proceso.is_alive():
+            # El hijo pudo escribir justo antes de terminar
+            try:
+                resultado = cola.get(timeout=1)
+            except queue.Empty:
+                resultado = {'renderizador': args[0],
+                             'error_fatal': f"el proceso terminó sin resultado (exitcode {proceso.exitcode})"}
+            break
+        if limite is not None and time.monotonic() > limite:
+            proceso.terminate()
+            resultado = {'renderizador': args[0], 'error_fatal': f"sin resultado tras {timeout:.0f} s"}
+            break
+    proceso.join()
+    return resultado
+
+
+def metadatos(args, plantillas, corpus):
+    """Información de la corrida para poder comparar resultados entre máquinas y commits"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'plantillas': plantillas,
+        'nombres': len(corpus),
+        'repeticiones': args.repeticiones,
+        'calentamiento': args.calentamiento,
+        'optimizacion': args.optimizacion,
+    }
+
+
+def imprimir_resultado(resultado):
+    """Imprime el resumen de un renderizador"""
+    nombre = resultado['renderizador']
+    if 'error_fatal' in resultado:
+        print(f"  ❌ {nombre}: {resultado['error_fatal']}")
+        return
+
+    latencia = resultado['latencia_ms']
+    if latencia is None:
+        print(f"  ❌ {nombre}: sin constancias generadas ({resultado['num_errores']} errores)")
+        return
+
+    rss = resultado['rss_pico_mb']
+    asignado = resultado['asignado_pico_por_constancia_bytes']
+    print(f"  📊 {nombre}")
+    print(f"     latencia ms: p50 {latencia['p50']:.2f} | p90 {latencia['p90']:.2f} | "
+          f"p95 {latencia['p95']:.2f} | p99 {latencia['p99']:.2f} | max {latencia['max']:.2f}")
+    print(f"     {resultado['constancias_por_segundo']:.1f} constancias/s | "
+          f"inicialización {resultado['inicializacion_ms']:.1f} ms | "
+          f"RSS pico {f'{rss:.1f} MB' if rss is not None else 'n/d'}")
+    if asignado:
+        print(f"     memoria asignada por constancia: media {asignado['media'] / 1024:.0f} KB, "
+              f"max {asignado['max'] / 1024:.0f} KB")
+    print(f"     tamaño de salida: media {resultado['tamano_salida_bytes']['media'] / 1024:.0f} KB")
+    if resultado['num_errores']:
+        print(f"     ⚠️  {resultado['num_errores']} errores, p. ej. {resultado['errores'][0][:100]}")
+
+
+def comparar(actual, anterior_path):
+    """Imprime la variación de p50/p95 y RSS pico contra una corrida anterior"""
+    anterior = json.loads(Path(anterior_path).read_text(encoding='utf-8'))
+    previos = {r['renderizador']: r for r in anterior['resultados']}
+
+    print(f"\n🔁 Comparación contra {anterior_path} (commit {anterior['metadatos'].get('commit')})")
+    for resultado in actual['resultados']:
+        previo = previos.get(resultado['renderizador'])
+        if not previo or not previo.get('latencia_ms') or not resultado.get('latencia_ms'):
+            continue
+        cambios = []
+        for p in ('p50', 'p95'):
+            antes = previo['latencia_ms'][p]
+            despues = resultado['latencia_ms'][p]
+            cambios.append(f"{p} {antes:.2f} → {despues:.2f} ms ({(despues - antes) * 100 / antes:+.1f}%)")
+        if previo.get('rss_pico_mb') and resultado.get('rss_pico_mb'):
+            cambios.append(f"RSS {previo['rss_pico_mb']:.0f} → {resultado['rss_pico_mb']:.0f} MB")
+        print(f"  {resultado['renderizador']}: " + ' | '.join(cambios))
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark del renderizado de constancias")
+    parser.add_argument('--renderizadores', default=','.join(RENDERIZADORES),
+                        help="Renderizadores separados por coma")
+    parser.add_argument('--plantillas', help="Plantillas separadas por coma (por defecto todas)")
+    parser.add_argument('--nombres', type=int, default=10, help="Nombres por categoría del corpus")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Veces que se recorre el corpus")
+    parser.add_argument('--calentamiento', type=int, default=2,
+                        help="Constancias por plantilla que no se miden")
+    parser.add_argument('--muestras-memoria', type=int, default=5,
+                        help="Constancias por plantilla medidas con tracemalloc (0 para omitir)")
+    parser.add_argument('--optimizacion', choices=list(OPTIMIZACIONES),
+                        help="Nivel de optimización de la salida (por defecto el configurado)")
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help="Segundos máximos por renderizador (0 para no limitar)")
+    parser.add_argument('--salida', default='benchmark_constancias.json', help="Archivo JSON de resultados")
+    parser.add_argument('--comparar', help="Archivo JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    renderizadores = [r.strip() for r in args.renderizadores.split(',') if r.strip()]
+    for r in renderizadores:
+        if r not in RENDERIZADORES:
+            parser.error(f"Renderizador no válido: {r}. Opciones: {', '.join(RENDERIZADORES)}")
+
+    if args.plantillas:
+        plantillas = [p.strip() for p in args.plantillas.split(',') if p.strip()]
+    else:
+        plantillas = sorted(p.name for p in PLANTILLAS_DIR.glob("*.pdf"))
+    corpus = corpus_nombres(args.nombres)
+
+    print("\n" + "=" * 60)
+    print("⏱️  BENCHMARK DE CONSTANCIAS")
+    print("=" * 60)
+    print(f"\n📄 {len(plantillas)} plantillas × {len(corpus)} nombres × {args.repeticiones} repetición(es)")
+
+    resultados = []
+    for nombre in renderizadores:
+        print(f"\n⚙️  Ejecutando {nombre}...")
+        resultado = ejecutar_aislado(
+            nombre, plantillas, corpus, args.repeticiones, args.calentamiento, args.muestras_memoria,
+            args.optimizacion, timeout=args.timeout
+        )
+        imprimir_resultado(resultado)
+        resultados.append(resultado)
+
+    salida = {'metadatos': metadatos(args, plantillas, corpus), 'resultados': resultados}
+    Path(args.salida).write_text(json.dumps(salida, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.comparar:
+        comparar(salida, args.comparar)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Resultados guardados en {args.salida}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
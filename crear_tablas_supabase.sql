@@ -23,6 +23,8 @@ CREATE TABLE IF NOT EXISTS public.participantes (
 
 -- Índices para mejorar rendimiento de búsquedas
 CREATE INDEX IF NOT EXISTS idx_participantes_email ON public.participantes(email);
+-- Búsquedas por email sin distinguir mayúsculas (como la vista y obtener_elegibilidad)
+CREATE INDEX IF NOT EXISTS idx_participantes_email_lower ON public.participantes(LOWER(email));
 CREATE INDEX IF NOT EXISTS idx_participantes_categoria ON public.participantes(categoria);
 
 -- Comentarios para documentación
@@ -58,6 +60,8 @@ CREATE TABLE IF NOT EXISTS public.actividades (
 CREATE INDEX IF NOT EXISTS idx_actividades_codigo ON public.actividades(codigo);
 CREATE INDEX IF NOT EXISTS idx_actividades_tipo ON public.actividades(tipo);
 CREATE INDEX IF NOT EXISTS idx_actividades_fecha_inicio ON public.actividades(fecha_inicio);
+-- Marca de agua de las lecturas incrementales (utils/snapshot_datos.py)
+CREATE INDEX IF NOT EXISTS idx_actividades_actualizado ON public.actividades(actualizado);
 
 -- Comentarios
 COMMENT ON TABLE public.actividades IS 'Conferencias, talleres y actividades del evento';
@@ -81,6 +85,7 @@ CREATE TABLE IF NOT EXISTS public.asistencias (
 
 -- Índices para consultas frecuentes
 CREATE INDEX IF NOT EXISTS idx_asistencias_participante ON public.asistencias(participante_email);
+CREATE INDEX IF NOT EXISTS idx_asistencias_participante_lower ON public.asistencias(LOWER(participante_email));
 CREATE INDEX IF NOT EXISTS idx_asistencias_actividad ON public.asistencias(actividad_codigo);
 CREATE INDEX IF NOT EXISTS idx_asistencias_estado ON public.asistencias(estado);
 CREATE INDEX IF NOT EXISTS idx_asistencias_fecha ON public.asistencias(fecha_asistencia);
@@ -118,6 +123,17 @@ CREATE TABLE IF NOT EXISTS public.equipos_concurso (
 
 -- Índices
 CREATE INDEX IF NOT EXISTS idx_equipos_capitan ON public.equipos_concurso(email_capitan);
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_1 ON public.equipos_concurso(email_miembro_1);
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_2 ON public.equipos_concurso(email_miembro_2);
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_3 ON public.equipos_concurso(email_miembro_3);
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_4 ON public.equipos_concurso(email_miembro_4);
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_5 ON public.equipos_concurso(email_miembro_5);
+CREATE INDEX IF NOT EXISTS idx_equipos_capitan_lower ON public.equipos_concurso(LOWER(email_capitan));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_1_lower ON public.equipos_concurso(LOWER(email_miembro_1));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_2_lower ON public.equipos_concurso(LOWER(email_miembro_2));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_3_lower ON public.equipos_concurso(LOWER(email_miembro_3));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_4_lower ON public.equipos_concurso(LOWER(email_miembro_4));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_5_lower ON public.equipos_concurso(LOWER(email_miembro_5));
 CREATE INDEX IF NOT EXISTS idx_equipos_estado_registro ON public.equipos_concurso(estado_registro);
 CREATE INDEX IF NOT EXISTS idx_equipos_activo ON public.equipos_concurso(activo);
 
@@ -216,6 +232,10 @@ CREATE POLICY "Permitir actualización autenticada de asistencias"
 ON public.asistencias FOR UPDATE 
 USING (true);
 
+CREATE POLICY "Permitir actualización autenticada de encuestas" 
+ON public.encuesta_respuestas FOR UPDATE 
+USING (true);
+
 -- Políticas: Permitir eliminación autenticada (para importación)
 CREATE POLICY "Permitir eliminación autenticada de participantes" 
 ON public.participantes FOR DELETE 
@@ -256,11 +276,23 @@ BEFORE UPDATE ON public.participantes
 FOR EACH ROW 
 EXECUTE FUNCTION update_updated_at_column();
 
--- Trigger para actividades
-CREATE TRIGGER update_actividades_updated_at 
+-- Función para actualizar actualizado automáticamente (actividades no tiene
+-- updated_at; su columna de última modificación es actualizado)
+CREATE OR REPLACE FUNCTION update_actualizado_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.actualizado = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger para actividades (reemplaza al que usaba update_updated_at_column)
+DROP TRIGGER IF EXISTS update_actividades_updated_at ON public.actividades;
+DROP TRIGGER IF EXISTS update_actividades_actualizado ON public.actividades;
+CREATE TRIGGER update_actividades_actualizado 
 BEFORE UPDATE ON public.actividades 
 FOR EACH ROW 
-EXECUTE FUNCTION update_updated_at_column();
+EXECUTE FUNCTION update_actualizado_column();
 
 -- ============================================================
 -- VISTAS ÚTILES
@@ -296,6 +328,315 @@ FROM public.participantes p
 LEFT JOIN public.asistencias a ON LOWER(p.email) = LOWER(a.participante_email)
 GROUP BY p.id, p.nombre_completo, p.email, p.categoria, p.programa, p.encuesta_completada;
 
+-- Vista: Estadísticas de la encuesta calculadas en la base (una sola fila)
+CREATE OR REPLACE VIEW public.vista_estadisticas_encuesta AS
+SELECT 
+    COUNT(*) as total_respuestas,
+    COUNT(DISTINCT participante_email) as total_participantes,
+    (SELECT fecha FROM public.encuesta_respuestas ORDER BY timestamp DESC LIMIT 1) as ultima_respuesta
+FROM public.encuesta_respuestas;
+
+-- ============================================================
+-- ESTADÍSTICAS INCREMENTALES DE LA ENCUESTA
+-- Contadores mantenidos por triggers al guardar respuestas, para
+-- leer las estadísticas sin recorrer encuesta_respuestas
+-- ============================================================
+CREATE TABLE IF NOT EXISTS public.encuesta_estadisticas (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    total_respuestas BIGINT NOT NULL DEFAULT 0,
+    total_participantes BIGINT NOT NULL DEFAULT 0,
+    ultimo_timestamp BIGINT,
+    ultima_respuesta TEXT,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE public.encuesta_estadisticas ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Permitir lectura pública de estadísticas de encuesta" 
+ON public.encuesta_estadisticas FOR SELECT 
+USING (true);
+
+-- Función: Recalcula los contadores desde cero (inicialización o corrección)
+CREATE OR REPLACE FUNCTION public.recalcular_estadisticas_encuesta()
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO public.encuesta_estadisticas (id, total_respuestas, total_participantes, ultimo_timestamp, ultima_respuesta, updated_at)
+    SELECT 
+        1,
+        COUNT(*),
+        COUNT(DISTINCT participante_email),
+        MAX(timestamp),
+        (SELECT fecha FROM public.encuesta_respuestas ORDER BY timestamp DESC LIMIT 1),
+        NOW()
+    FROM public.encuesta_respuestas
+    ON CONFLICT (id) DO UPDATE SET
+        total_respuestas = EXCLUDED.total_respuestas,
+        total_participantes = EXCLUDED.total_participantes,
+        ultimo_timestamp = EXCLUDED.ultimo_timestamp,
+        ultima_respuesta = EXCLUDED.ultima_respuesta,
+        updated_at = EXCLUDED.updated_at;
+$$;
+
+-- Triggers por sentencia (con tablas de transición): un solo UPDATE de
+-- contadores por cada guardado, aunque inserte o borre varias respuestas
+CREATE OR REPLACE FUNCTION public.estadisticas_encuesta_insertar()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE public.encuesta_estadisticas e SET
+        total_respuestas = e.total_respuestas + (SELECT COUNT(*) FROM nuevas),
+        -- Participantes que no tenían respuestas antes de esta sentencia
+        total_participantes = e.total_participantes + (
+            SELECT COUNT(DISTINCT n.participante_email)
+            FROM nuevas n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM public.encuesta_respuestas r
+                WHERE r.participante_email = n.participante_email
+                    AND NOT EXISTS (SELECT 1 FROM nuevas x WHERE x.id = r.id)
+            )
+        ),
+        ultimo_timestamp = GREATEST(COALESCE(e.ultimo_timestamp, 0), (SELECT MAX(timestamp) FROM nuevas)),
+        ultima_respuesta = CASE
+            WHEN (SELECT MAX(timestamp) FROM nuevas) >= COALESCE(e.ultimo_timestamp, 0)
+            THEN (SELECT fecha FROM nuevas ORDER BY timestamp DESC LIMIT 1)
+            ELSE e.ultima_respuesta
+        END,
+        updated_at = NOW()
+    WHERE e.id = 1;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.estadisticas_encuesta_borrar()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE public.encuesta_estadisticas e SET
+        total_respuestas = e.total_respuestas - (SELECT COUNT(*) FROM borradas),
+        -- Participantes que se quedaron sin respuestas
+        total_participantes = e.total_participantes - (
+            SELECT COUNT(DISTINCT b.participante_email)
+            FROM borradas b
+            WHERE NOT EXISTS (
+                SELECT 1 FROM public.encuesta_respuestas r
+                WHERE r.participante_email = b.participante_email
+            )
+        ),
+        updated_at = NOW()
+    WHERE e.id = 1;
+
+    -- Si se borró la última respuesta, buscar la nueva última por el índice de timestamp
+    IF (SELECT MAX(timestamp) FROM borradas) >= (SELECT COALESCE(ultimo_timestamp, 0) FROM public.encuesta_estadisticas WHERE id = 1) THEN
+        UPDATE public.encuesta_estadisticas SET
+            (ultimo_timestamp, ultima_respuesta) = (
+                SELECT r.timestamp, r.fecha FROM public.encuesta_respuestas r
+                ORDER BY r.timestamp DESC LIMIT 1
+            )
+        WHERE id = 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.estadisticas_encuesta_actualizar()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    -- Los upserts de la encuesta actualizan filas existentes: solo cambia la última respuesta
+    UPDATE public.encuesta_estadisticas e SET
+        ultimo_timestamp = GREATEST(COALESCE(e.ultimo_timestamp, 0), (SELECT MAX(timestamp) FROM nuevas)),
+        ultima_respuesta = CASE
+            WHEN (SELECT MAX(timestamp) FROM nuevas) >= COALESCE(e.ultimo_timestamp, 0)
+            THEN (SELECT fecha FROM nuevas ORDER BY timestamp DESC LIMIT 1)
+            ELSE e.ultima_respuesta
+        END,
+        updated_at = NOW()
+    WHERE e.id = 1;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS estadisticas_encuesta_insertar ON public.encuesta_respuestas;
+CREATE TRIGGER estadisticas_encuesta_insertar
+AFTER INSERT ON public.encuesta_respuestas
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.estadisticas_encuesta_insertar();
+
+DROP TRIGGER IF EXISTS estadisticas_encuesta_borrar ON public.encuesta_respuestas;
+CREATE TRIGGER estadisticas_encuesta_borrar
+AFTER DELETE ON public.encuesta_respuestas
+REFERENCING OLD TABLE AS borradas
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.estadisticas_encuesta_borrar();
+
+DROP TRIGGER IF EXISTS estadisticas_encuesta_actualizar ON public.encuesta_respuestas;
+CREATE TRIGGER estadisticas_encuesta_actualizar
+AFTER UPDATE ON public.encuesta_respuestas
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.estadisticas_encuesta_actualizar();
+
+-- Inicializar los contadores con las respuestas que ya existan
+SELECT public.recalcular_estadisticas_encuesta();
+
+-- ============================================================
+-- FUNCIONES DE ELEGIBILIDAD
+-- ============================================================
+
+-- Función: Datos de elegibilidad de un participante en una sola llamada
+-- (participante, asistencias, workshops y mundialito), usada por
+-- SupabaseHandler.obtener_elegibilidad. Compara los emails en minúsculas,
+-- igual que vista_participantes_completa (índices *_lower)
+CREATE OR REPLACE FUNCTION public.obtener_elegibilidad(p_email TEXT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH participante AS (
+        SELECT id, nombre_completo, email, categoria, programa, encuesta_completada
+        FROM public.participantes
+        WHERE LOWER(email) = LOWER(TRIM(p_email))
+        LIMIT 1
+    ),
+    asistencias_participante AS (
+        SELECT actividad_codigo, estado
+        FROM public.asistencias
+        WHERE LOWER(participante_email) = LOWER(TRIM(p_email))
+    )
+    SELECT JSONB_BUILD_OBJECT(
+        'participante', (SELECT TO_JSONB(p) FROM participante p),
+        'total_asistencias', (SELECT COUNT(*) FROM asistencias_participante),
+        'asistencias_confirmadas', (SELECT COUNT(*) FROM asistencias_participante WHERE estado = 'asistió'),
+        'workshops', COALESCE((
+            SELECT JSONB_AGG(DISTINCT actividad_codigo ORDER BY actividad_codigo)
+            FROM asistencias_participante
+            WHERE actividad_codigo LIKE 'W%'
+        ), '[]'::JSONB),
+        'en_equipo', EXISTS (
+            SELECT 1
+            FROM public.equipos_concurso e
+            WHERE LOWER(e.email_capitan) = LOWER(TRIM(p_email))
+               OR LOWER(e.email_miembro_1) = LOWER(TRIM(p_email))
+               OR LOWER(e.email_miembro_2) = LOWER(TRIM(p_email))
+               OR LOWER(e.email_miembro_3) = LOWER(TRIM(p_email))
+               OR LOWER(e.email_miembro_4) = LOWER(TRIM(p_email))
+               OR LOWER(e.email_miembro_5) = LOWER(TRIM(p_email))
+        )
+    );
+$$;
+
+-- Función: Elegibilidad de varios participantes; devuelve un objeto email -> datos
+CREATE OR REPLACE FUNCTION public.obtener_elegibilidad_lote(p_emails TEXT[])
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(JSONB_OBJECT_AGG(e.email, public.obtener_elegibilidad(e.email)), '{}'::JSONB)
+    FROM (SELECT DISTINCT LOWER(TRIM(x)) AS email FROM UNNEST(p_emails) AS x) e;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.obtener_elegibilidad(TEXT) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.obtener_elegibilidad_lote(TEXT[]) TO anon, authenticated;
+
+-- ============================================================
+-- GUARDADO DE LA ENCUESTA
+-- ============================================================
+
+-- Función: Guarda las respuestas de un participante y marca su encuesta como
+-- completada en una sola transacción, usada por SupabaseHandler.guardar_encuesta.
+-- p_respuestas es un arreglo de objetos {pregunta_id, pregunta_texto, respuesta}
+CREATE OR REPLACE FUNCTION public.guardar_encuesta(
+    p_email TEXT,
+    p_nombre_completo TEXT,
+    p_respuestas JSONB,
+    p_fecha TEXT,
+    p_timestamp BIGINT
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_email TEXT := LOWER(TRIM(p_email));
+    v_respuestas INTEGER;
+    v_completada BOOLEAN;
+BEGIN
+    -- Insertar o reemplazar sobre el índice único (participante_email, pregunta_id)
+    INSERT INTO public.encuesta_respuestas
+        (participante_email, nombre_completo, pregunta_id, pregunta_texto, respuesta, fecha, timestamp)
+    SELECT v_email, p_nombre_completo, r.pregunta_id, r.pregunta_texto, r.respuesta, p_fecha, p_timestamp
+    FROM JSONB_TO_RECORDSET(p_respuestas) AS r(pregunta_id INTEGER, pregunta_texto TEXT, respuesta TEXT)
+    ON CONFLICT (participante_email, pregunta_id) DO UPDATE SET
+        nombre_completo = EXCLUDED.nombre_completo,
+        pregunta_texto = EXCLUDED.pregunta_texto,
+        respuesta = EXCLUDED.respuesta,
+        fecha = EXCLUDED.fecha,
+        timestamp = EXCLUDED.timestamp;
+    GET DIAGNOSTICS v_respuestas = ROW_COUNT;
+
+    -- Eliminar respuestas previas de preguntas que ya no se respondieron
+    DELETE FROM public.encuesta_respuestas
+    WHERE participante_email = v_email
+        AND pregunta_id NOT IN (
+            SELECT (r ->> 'pregunta_id')::INTEGER FROM JSONB_ARRAY_ELEMENTS(p_respuestas) AS r
+        );
+
+    -- email solo es único distinguiendo mayúsculas: puede haber varias filas
+    -- con el mismo email en minúsculas (RETURNING INTO fallaría con más de una)
+    UPDATE public.participantes
+    SET encuesta_completada = TRUE
+    WHERE LOWER(email) = v_email;
+    v_completada := FOUND;
+
+    RETURN JSONB_BUILD_OBJECT(
+        'email', v_email,
+        'respuestas', v_respuestas,
+        'encuesta_completada', v_completada
+    );
+END;
+$$;
+
+-- Función: Guarda varias encuestas en una sola transacción, usada por la cola
+-- de encuestas de la app. p_encuestas es un arreglo de objetos
+-- {email, nombre_completo, respuestas, fecha, timestamp}
+CREATE OR REPLACE FUNCTION public.guardar_encuestas_lote(p_encuestas JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_encuesta JSONB;
+    v_guardadas INTEGER := 0;
+BEGIN
+    FOR v_encuesta IN SELECT * FROM JSONB_ARRAY_ELEMENTS(p_encuestas)
+    LOOP
+        PERFORM public.guardar_encuesta(
+            v_encuesta ->> 'email',
+            v_encuesta ->> 'nombre_completo',
+            v_encuesta -> 'respuestas',
+            v_encuesta ->> 'fecha',
+            (v_encuesta ->> 'timestamp')::BIGINT
+        );
+        v_guardadas := v_guardadas + 1;
+    END LOOP;
+    RETURN v_guardadas;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.guardar_encuesta(TEXT, TEXT, JSONB, TEXT, BIGINT) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.guardar_encuestas_lote(JSONB) TO anon, authenticated;
+
 -- ============================================================
 -- VERIFICACIÓN FINAL
 -- ============================================================
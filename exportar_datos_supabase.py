@@ -16,7 +16,7 @@ sys.path.insert(0, str(ROOT_DIR))
 # Cargar variables de entorno desde .env
 load_dotenv()
 
-from utils.supabase_handler import SupabaseHandler
+from utils.supabase_handler import obtener_handler, BACKEND
 
 # Directorio de datos
 DATA_DIR = ROOT_DIR / "datos"
@@ -73,15 +73,14 @@ def exportar_tabla_generica(nombre_archivo, nombre_tabla):
                 if isinstance(value, float) and math.isnan(value):
                     registro[key] = None
         
-        # Conectar a Supabase
-        supabase_handler = SupabaseHandler()
-        supabase_handler.connect()  # Inicializar el cliente
+        # Cliente de Supabase compartido por todo el script
+        supabase_handler = obtener_handler()
         
         # Eliminar datos existentes en la tabla
         print(f"🗑️  Limpiando tabla {nombre_tabla}...")
         try:
             # Intentar eliminar todos los registros
-            supabase_handler.client.table(nombre_tabla).delete().neq('id', -9999).execute()
+            supabase_handler.limpiar_tabla(nombre_tabla)
         except Exception as e:
             print(f"  ⚠️  No se pudo limpiar la tabla (puede que no exista aún): {str(e)[:80]}")
         
@@ -96,7 +95,7 @@ def exportar_tabla_generica(nombre_archivo, nombre_tabla):
             batch = registros[i:i+batch_size]
             batch_num = (i // batch_size) + 1  # Calcular batch_num ANTES del try
             try:
-                supabase_handler.client.table(nombre_tabla).insert(batch).execute()
+                supabase_handler.insertar_filas(nombre_tabla, batch)
                 exitos += len(batch)
                 print(f"  ✅ Lote {batch_num}/{total_batches}: {len(batch)} registros insertados")
             except Exception as e:
@@ -142,7 +141,7 @@ def exportar_respuestas_encuesta():
         
         # Conectar a Supabase
         print("\n🔗 Conectando a Supabase...")
-        supabase_handler = SupabaseHandler()
+        supabase_handler = obtener_handler()
         
         # Mapear pregunta_id a pregunta_texto (reconstruir desde el CSV)
         print("\n📋 Procesando respuestas por participante...")
@@ -214,7 +213,7 @@ def verificar_exportacion():
     print("=" * 60)
     
     try:
-        supabase_handler = SupabaseHandler()
+        supabase_handler = obtener_handler()
         estadisticas = supabase_handler.obtener_estadisticas()
         
         print(f"\n📊 Estadísticas de Supabase:")
@@ -237,15 +236,19 @@ def main():
     # Verificar configuración
     print("\n🔧 Verificando configuración...")
     
-    if not os.getenv('SUPABASE_URL'):
-        print("❌ SUPABASE_URL no está configurado en .env")
-        return
-    
-    if not os.getenv('SUPABASE_KEY'):
-        print("❌ SUPABASE_KEY no está configurado en .env")
-        return
-    
-    print("  ✅ Variables de entorno configuradas")
+    if BACKEND == 'sqlite':
+        # Réplica local: no hacen falta credenciales de Supabase
+        print(f"  ✅ Backend local SQLite ({obtener_handler().ruta})")
+    else:
+        if not os.getenv('SUPABASE_URL'):
+            print("❌ SUPABASE_URL no está configurado en .env")
+            return
+        
+        if not os.getenv('SUPABASE_KEY'):
+            print("❌ SUPABASE_KEY no está configurado en .env")
+            return
+        
+        print("  ✅ Variables de entorno configuradas")
     
     # Verificar archivos
     if not verificar_archivos():
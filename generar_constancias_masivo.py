@@ -0,0 +1,290 @@
+"""
+Script para generar las constancias de todos los participantes elegibles
+Calcula la elegibilidad de cada participante y renderiza sus constancias en
+paralelo con varios procesos, escribiendo a un directorio o a un archivo ZIP
+
+Uso:
+    python generar_constancias_masivo.py --salida constancias/
+    python generar_constancias_masivo.py --zip constancias.zip --workers 8 --lote 25
+    python generar_constancias_masivo.py --salida constancias/ --motor rapido
+    python generar_constancias_masivo.py --salida constancias/ --emails ana@correo.mx,luis@correo.mx
+"""
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+# Agregar el directorio raíz al path para importar módulos
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR))
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+
+from utils.elegibilidad import (
+    IndiceElegibilidad, verificar_elegibilidad_puntual, constancias_disponibles, PREFIJOS_ARCHIVO
+)
+from utils.pdf_generator import PDFGenerator, ESTILO_JII, MOTORES, MOTOR_PREDETERMINADO
+from utils.optimizacion_pdf import OPTIMIZACIONES, OPTIMIZACION_PREDETERMINADA
+
+ASSETS_DIR = ROOT_DIR / "assets"
+
+
+def cargar_desde_supabase():
+    """Carga participantes, asistencias y equipos desde Supabase"""
+    from utils.supabase_handler import obtener_handler
+    from utils.carga_datos import cargar_tablas
+
+    datos, _ = cargar_tablas(obtener_handler(), tablas=('participantes', 'asistencias', 'equipos'))
+
+    return datos['participantes'], datos['asistencias'], datos['equipos']
+
+
+def cargar_desde_csv(directorio):
+    """Carga participantes, asistencias y equipos desde los CSV de un directorio"""
+    directorio = Path(directorio)
+    participantes = pd.read_csv(directorio / "participantes.csv")
+    asistencias = pd.read_csv(directorio / "asistencias.csv")
+
+    equipos_file = directorio / "equipos_concurso.csv"
+    equipos = pd.read_csv(equipos_file, dtype=str) if equipos_file.exists() else pd.DataFrame()
+
+    # El CSV no trae la columna calculada por vista_participantes_completa
+    if 'total_asistencias' not in participantes.columns:
+        conteo = asistencias['participante_email'].str.lower().value_counts()
+        participantes['total_asistencias'] = (
+            participantes['email'].str.lower().map(conteo).fillna(0).astype(int)
+        )
+
+    return participantes, asistencias, equipos
+
+
+def nombre_archivo(tipo, nombre_completo, participante_id):
+    """Nombre del PDF dentro de la salida; el id evita choques entre homónimos"""
+    nombre = nombre_completo.replace(' ', '_').replace('/', '_')
+    return f"{tipo}/{PREFIJOS_ARCHIVO[tipo]}_{nombre}_{participante_id}.pdf"
+
+
+def calcular_trabajos(participantes, asistencias, equipos, tipos, incluir_sin_encuesta):
+    """
+    Calcula las constancias a generar para todos los participantes
+
+    Returns:
+        list: Tuplas (archivo, plantilla, nombre_completo)
+    """
+    indice = IndiceElegibilidad(participantes, asistencias, equipos)
+    return trabajos_de_elegibilidades(
+        (indice.verificar(email) for email in participantes['email'].dropna().unique()),
+        tipos, incluir_sin_encuesta
+    )
+
+
+def calcular_trabajos_emails(emails, tipos, incluir_sin_encuesta):
+    """
+    Calcula las constancias a generar solo para algunos correos
+
+    Consulta la elegibilidad de todos los correos en una sola llamada a
+    Supabase, sin leer las tablas completas.
+
+    Returns:
+        list: Tuplas (archivo, plantilla, nombre_completo)
+    """
+    from utils.supabase_handler import obtener_handler
+
+    datos = obtener_handler().obtener_elegibilidad_lote(emails)
+    for email in sorted({e.strip().lower() for e in emails}):
+        if not datos.get(email) or datos[email].get('participante') is None:
+            print(f"  ⚠️  {email} - No encontrado")
+
+    return trabajos_de_elegibilidades(
+        (verificar_elegibilidad_puntual(datos_email) for datos_email in datos.values()),
+        tipos, incluir_sin_encuesta
+    )
+
+
+def trabajos_de_elegibilidades(resultados, tipos, incluir_sin_encuesta):
+    """Convierte resultados (elegibilidad, error) en la lista de trabajos"""
+    trabajos = []
+
+    for elegibilidad, error in resultados:
+        if error or not elegibilidad['elegible_general']:
+            continue
+        if not incluir_sin_encuesta and not elegibilidad['encuesta_completada']:
+            continue
+
+        participante = elegibilidad['participante']
+        for constancia in constancias_disponibles(elegibilidad):
+            if constancia['tipo'] not in tipos:
+                continue
+            trabajos.append((
+                nombre_archivo(constancia['tipo'], participante['nombre_completo'], participante['id']),
+                constancia['plantilla'],
+                participante['nombre_completo']
+            ))
+
+    return trabajos
+
+
+# Generador por proceso, creado una sola vez por el initializer del pool
+_generador = None
+
+
+def _inicializar_worker(assets_dir, motor, optimizacion):
+    global _generador
+    _generador = PDFGenerator(assets_dir, motor=motor, optimizacion=optimizacion)
+
+
+def _renderizar_lote(lote, salida_dir):
+    """
+    Renderiza un lote de constancias dentro de un proceso del pool
+
+    Si salida_dir está definido, el worker escribe los PDF directamente y solo
+    devuelve los nombres; si no, devuelve los bytes para que el proceso
+    principal los agregue al ZIP.
+
+    Returns:
+        list: Tuplas (archivo, bytes o None, error o None)
+    """
+    resultados = []
+    for archivo, plantilla, nombre_completo in lote:
+        try:
+            pdf_bytes = _generador.generate_constancia(plantilla, nombre_completo, estilo=ESTILO_JII)
+            if salida_dir:
+                destino = Path(salida_dir) / archivo
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                destino.write_bytes(pdf_bytes)
+                resultados.append((archivo, None, None))
+            else:
+                resultados.append((archivo, pdf_bytes, None))
+        except Exception as e:
+            resultados.append((archivo, None, str(e)))
+    return resultados
+
+
+def generar(trabajos, workers, tamano_lote, salida_dir=None, zip_path=None, motor=MOTOR_PREDETERMINADO,
+            optimizacion=OPTIMIZACION_PREDETERMINADA):
+    """
+    Reparte los trabajos en lotes y los renderiza con un ProcessPoolExecutor
+
+    Se mantienen como máximo 2 lotes por worker en vuelo para acotar la memoria
+    cuando los PDF viajan de regreso al proceso principal (modo ZIP).
+
+    Returns:
+        tuple: (exitos, errores)
+    """
+    lotes = [trabajos[i:i + tamano_lote] for i in range(0, len(trabajos), tamano_lote)]
+    total = len(trabajos)
+    exitos = 0
+    errores = 0
+    inicio = time.time()
+
+    zip_file = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) if zip_path else None
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_inicializar_worker,
+            initargs=(str(ASSETS_DIR), motor, optimizacion)
+        ) as executor:
+            pendientes = set()
+            siguiente = 0
+
+            while siguiente < len(lotes) or pendientes:
+                while siguiente < len(lotes) and len(pendientes) < workers * 2:
+                    pendientes.add(executor.submit(_renderizar_lote, lotes[siguiente], salida_dir))
+                    siguiente += 1
+
+                completados, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in completados:
+                    for archivo, pdf_bytes, error in futuro.result():
+                        if error:
+                            errores += 1
+                            print(f"  ❌ {archivo}: {error[:100]}")
+                            continue
+                        if zip_file is not None:
+                            zip_file.writestr(archivo, pdf_bytes)
+                        exitos += 1
+
+                hechos = exitos + errores
+                transcurrido = time.time() - inicio
+                velocidad = hechos / transcurrido if transcurrido > 0 else 0
+                print(f"  📄 [{hechos}/{total}] {hechos * 100 // max(total, 1)}% - {velocidad:.1f} constancias/s")
+    finally:
+        if zip_file is not None:
+            zip_file.close()
+
+    return exitos, errores
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Genera las constancias de todos los participantes elegibles")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--salida', help="Directorio donde escribir los PDF")
+    destino.add_argument('--zip', help="Archivo ZIP donde escribir los PDF")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Número de procesos")
+    parser.add_argument('--lote', type=int, default=20, help="Constancias por unidad de trabajo")
+    parser.add_argument('--tipos', default='general,workshop,mundialito',
+                        help="Tipos de constancia separados por coma")
+    parser.add_argument('--csv', help="Leer los datos desde los CSV de este directorio en lugar de Supabase")
+    parser.add_argument('--emails', help="Generar solo para estos correos (separados por coma), consultados en Supabase")
+    parser.add_argument('--incluir-sin-encuesta', action='store_true',
+                        help="Incluir participantes que no han completado la encuesta")
+    parser.add_argument('--motor', choices=MOTORES, default=MOTOR_PREDETERMINADO,
+                        help="Motor de renderizado (rapido: actualización incremental sobre la plantilla)")
+    parser.add_argument('--optimizacion', choices=list(OPTIMIZACIONES), default=OPTIMIZACION_PREDETERMINADA,
+                        help="Optimización de la salida (web: imágenes a 200 dpi y PDF linealizado)")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("🚀 GENERACIÓN MASIVA DE CONSTANCIAS")
+    print("=" * 60)
+
+    tipos = {t.strip() for t in args.tipos.split(',') if t.strip()}
+
+    if args.emails and not args.csv:
+        emails = [e for e in args.emails.split(',') if e.strip()]
+        print(f"\n🔍 Consultando elegibilidad de {len(emails)} correo(s)...")
+        trabajos = calcular_trabajos_emails(emails, tipos, args.incluir_sin_encuesta)
+    else:
+        print("\n📂 Cargando datos...")
+        if args.csv:
+            participantes, asistencias, equipos = cargar_desde_csv(args.csv)
+        else:
+            participantes, asistencias, equipos = cargar_desde_supabase()
+        if args.emails:
+            emails = {e.strip().lower() for e in args.emails.split(',') if e.strip()}
+            participantes = participantes[participantes['email'].str.lower().isin(emails)]
+        print(f"  ✅ {len(participantes)} participantes, {len(asistencias)} asistencias, {len(equipos)} equipos")
+
+        print("\n🔍 Calculando elegibilidad...")
+        trabajos = calcular_trabajos(participantes, asistencias, equipos, tipos, args.incluir_sin_encuesta)
+    print(f"  ✅ {len(trabajos)} constancias por generar")
+
+    if not trabajos:
+        print("\n⚠️  No hay constancias por generar")
+        return
+
+    if args.salida:
+        Path(args.salida).mkdir(parents=True, exist_ok=True)
+
+    print(f"\n⚙️  Generando con {args.workers} proceso(s), lotes de {args.lote}, motor {args.motor}...")
+    inicio = time.time()
+    exitos, errores = generar(trabajos, args.workers, args.lote, salida_dir=args.salida, zip_path=args.zip,
+                             motor=args.motor, optimizacion=args.optimizacion)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Generación completada: {exitos} exitosas, {errores} errores en {time.time() - inicio:.1f}s")
+    print(f"📁 Salida: {args.salida or args.zip}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,12 @@
 Página de Constancias - Sistema JII 2025
 """
 import streamlit as st
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
-import io
+import os
+import tempfile
+import threading
 import time
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PyPDF2 import PdfReader, PdfWriter
 
 # Cargar variables de entorno ANTES de importar handlers
 from dotenv import load_dotenv
@@ -20,11 +15,19 @@ load_dotenv()  # Carga el archivo .env
 
 # Importar handler de almacenamiento persistente (Supabase)
 try:
-    from utils.supabase_handler import SupabaseHandler
+    from utils.supabase_handler import obtener_handler, construir_dataframe
+    from utils.snapshot_datos import obtener_snapshot, CacheDatos
     SUPABASE_AVAILABLE = True
 except:
     SUPABASE_AVAILABLE = False
 
+from utils.elegibilidad import verificar_elegibilidad_puntual, constancias_disponibles
+from utils.generador_constancias import generar_constancia
+from utils.prerenderizado import obtener_prerenderizador, clave_participante
+from utils.cola_encuestas import obtener_cola
+from utils.pdf_generator import PDFGenerator, ESTILO_JII, MOTOR_PREDETERMINADO
+from utils.assets import obtener_assets, FUENTE_NOMBRE
+
 # Configuración
 st.set_page_config(page_title="Constancias - JII 2025", page_icon="📝", layout="wide")
 
@@ -206,10 +209,9 @@ FONT_DIR = ASSETS_DIR / "fonts"
 PLANTILLAS_DIR = ASSETS_DIR / "plantillas"
 IMAGES_DIR = ASSETS_DIR / "images"
 
-# Registrar fuente
-try:
-    pdfmetrics.registerFont(TTFont('OldStandardTT-Bold', str(FONT_DIR / 'OldStandardTT-Bold.ttf')))
-except:
+# Registrar fuentes (una sola vez por proceso; en las siguientes ejecuciones no se vuelve a parsear)
+assets = obtener_assets(ASSETS_DIR)
+if not assets.fuente_disponible(FUENTE_NOMBRE):
     st.warning("⚠️ No se pudo cargar la fuente OldStandardTT-Bold. Se usará la fuente predeterminada.")
 
 # Preguntas de la encuesta
@@ -246,102 +248,191 @@ PREGUNTAS_DICT = {}
 for pregunta in PREGUNTAS_GENERALES + PREGUNTAS_WORKSHOP + PREGUNTAS_MUNDIALITO:
     PREGUNTAS_DICT[pregunta['id']] = pregunta['texto']
 
+# Vigencia de los datos cargados desde Supabase
+TTL_DATOS = 300  # 5 minutos en producción
+# Pasado el TTL los datos se siguen sirviendo mientras se recargan en segundo
+# plano, hasta esta antigüedad; después las sesiones esperan la recarga
+ANTIGUEDAD_MAXIMA_DATOS = float(os.getenv("CONSTANCIAS_ANTIGUEDAD_MAXIMA", 900))
+
 # Funciones auxiliares
-@st.cache_data(ttl=300)  # Cache por 5 minutos (300 segundos) en producción
+@st.cache_resource
+def estado_datos():
+    """
+    Estado compartido por todas las sesiones: encuestas enviadas que quizá
+    aún no están en los datos en cache
+    """
+    return {
+        'encuestas_recientes': {},  # email -> momento del envío
+        'lock': threading.Lock(),
+    }
+
+@st.cache_resource
+def cache_datos():
+    """
+    Cache de la instantánea de las tablas compartida por todas las sesiones
+    (sin copias por sesión): una sola carga en curso a la vez y, vencido el
+    TTL, la versión anterior se sigue sirviendo mientras se recarga en
+    segundo plano
+    """
+    return CacheDatos(_leer_datos, ttl=TTL_DATOS, antiguedad_maxima=ANTIGUEDAD_MAXIMA_DATOS)
+
+def datos_vigentes():
+    """Indica si hay tablas completas que se pueden servir sin esperar a Supabase"""
+    if not SUPABASE_AVAILABLE:
+        return False
+    instantanea = cache_datos().vigente()
+    return instantanea is not None and not instantanea.participantes.empty
+
+def refrescar_datos_en_segundo_plano():
+    """Lanza la carga de las tablas en un hilo, a lo más una a la vez por proceso"""
+    cache_datos().refrescar_en_segundo_plano()
+
+def registrar_encuesta_enviada(email):
+    """
+    Registra que el participante envió la encuesta
+
+    Las sesiones consultan estas escrituras recientes antes que los datos en
+    cache, así que no se invalidan las tablas compartidas: el cambio llega
+    con la siguiente carga incremental y entonces se descarta el registro.
+    """
+    estado = estado_datos()
+    with estado['lock']:
+        estado['encuestas_recientes'][email.strip().lower()] = time.time()
+
+def descartar_encuestas_recientes(participantes):
+    """Olvida las encuestas enviadas que ya aparecen como completadas en los datos cargados"""
+    estado = estado_datos()
+    if not estado['encuestas_recientes'] or 'encuesta_completada' not in participantes.columns:
+        return
+    completadas = set(participantes.loc[participantes['encuesta_completada'] == True, 'email'].str.lower())
+    with estado['lock']:
+        for email in list(estado['encuestas_recientes']):
+            if email in completadas:
+                del estado['encuestas_recientes'][email]
+
+def ultimo_snapshot():
+    """Última instantánea buena de las tablas o None"""
+    if not SUPABASE_AVAILABLE:
+        return None
+    instantanea, _ = cache_datos().ultimo()
+    if instantanea is None or instantanea.participantes.empty:
+        return None
+    return instantanea
+
+def avisar_snapshot():
+    """Avisa que se muestran datos guardados porque Supabase no responde"""
+    _, ultimo_en = cache_datos().ultimo()
+    hora = datetime.fromtimestamp(ultimo_en).strftime('%H:%M') if ultimo_en else '--:--'
+    st.warning(f"⚠️ Supabase no responde en este momento; se muestran los datos cargados a las {hora}.")
+
+def _leer_datos():
+    """Lee las cuatro tablas; los errores se propagan para que no queden en cache"""
+    # La primera vez se leen completas (al mismo tiempo, con el cliente
+    # compartido del proceso); después solo las filas que cambiaron desde la
+    # lectura anterior se fusionan con las que ya están en memoria. Si nada
+    # cambió se recibe la misma instantánea, con su índice ya construido
+    instantanea = obtener_snapshot().refrescar(obtener_handler())
+    
+    if not instantanea.participantes.empty:
+        descartar_encuestas_recientes(instantanea.participantes)
+    return instantanea
+
 def cargar_datos():
-    """Carga los datos de participantes, asistencias, actividades y equipos desde Supabase"""
+    """Carga desde Supabase la instantánea compartida de las tablas (o None si no hay datos)"""
     try:
         if not SUPABASE_AVAILABLE:
             st.error("❌ Supabase no está disponible. Contacta al administrador.")
-            return None, None, None, None
+            return None
         
-        # Conectar a Supabase
-        supabase_handler = SupabaseHandler()
-        supabase_handler.connect()
-        
-        # Obtener datos de todas las tablas (usa vista_participantes_completa)
-        participantes_data = supabase_handler.obtener_todos_participantes()
-        asistencias_data = supabase_handler.obtener_todas_asistencias()
-        actividades_data = supabase_handler.obtener_todas_actividades()
-        equipos_data = supabase_handler.obtener_todos_equipos()
-        
-        # Convertir a DataFrames
-        participantes = pd.DataFrame(participantes_data)
-        asistencias = pd.DataFrame(asistencias_data)
-        actividades = pd.DataFrame(actividades_data)
-        equipos = pd.DataFrame(equipos_data)
+        instantanea = cache_datos().obtener()
         
         # Verificar que se obtuvieron datos
-        if participantes.empty:
+        if instantanea.participantes.empty:
             st.warning("⚠️ No se encontraron participantes en la base de datos.")
-            return None, None, None, None
+            return None
         
-        return participantes, asistencias, actividades, equipos
+        return instantanea
         
     except Exception as e:
+        if ultimo_snapshot() is not None:
+            avisar_snapshot()
+            return ultimo_snapshot()
         st.error(f"❌ Error al cargar datos desde Supabase: {str(e)}")
-        return None, None, None, None
-
-def verificar_elegibilidad(email, participantes, asistencias, equipos):
-    """Verifica si el participante es elegible para constancias"""
-    # Buscar participante en la vista (que ya incluye total_asistencias)
-    participante = participantes[participantes['email'].str.lower() == email.lower()]
-    
-    if participante.empty:
-        return None, "❌ No se encontró tu correo electrónico en la base de datos."
-    
-    participante = participante.iloc[0]
-    
-    # Obtener número de asistencias desde la columna total_asistencias de la vista
-    # La vista vista_participantes_completa calcula esto automáticamente
-    num_asistencias = int(participante.get('total_asistencias', 0))
-    
-    # Verificar participación en workshops (códigos W1-W6)
-    asistencias_participante = asistencias[asistencias['participante_email'].str.lower() == email.lower()]
-    participo_workshop = any(asistencias_participante['actividad_codigo'].str.startswith('W'))
-    
-    # Verificar participación en mundialito - buscar email en captain o cualquiera de los 5 miembros
-    participo_mundialito = False
-    email_lower = email.lower()
-    
-    # Verificar si el email aparece como capitán o miembro del equipo
-    if not equipos.empty:
-        es_capitan = equipos['email_capitan'].str.lower() == email_lower
-        es_miembro_1 = equipos['email_miembro_1'].str.lower() == email_lower
-        es_miembro_2 = equipos['email_miembro_2'].str.lower() == email_lower
-        es_miembro_3 = equipos['email_miembro_3'].str.lower() == email_lower
-        es_miembro_4 = equipos['email_miembro_4'].str.lower() == email_lower
-        es_miembro_5 = equipos['email_miembro_5'].str.lower() == email_lower
+        return None
+
+@st.cache_resource(ttl=TTL_DATOS, show_spinner=False)
+def _leer_actividades():
+    """Lee solo el código y título de las actividades"""
+    return construir_dataframe(
+        obtener_handler().iterar_paginas('actividades', 'id,codigo,titulo'),
+        columnas=['id', 'codigo', 'titulo']
+    )
+
+def cargar_actividades():
+    """Carga solo el código y título de las actividades, para la encuesta"""
+    try:
+        if not SUPABASE_AVAILABLE:
+            st.error("❌ Supabase no está disponible. Contacta al administrador.")
+            return None
         
-        participo_mundialito = any([
-            es_capitan.any(), es_miembro_1.any(), es_miembro_2.any(),
-            es_miembro_3.any(), es_miembro_4.any(), es_miembro_5.any()
-        ])
-    
-    # Obtener encuesta_completada directamente de la vista
-    # La vista ya incluye este campo de la tabla participantes
-    encuesta_completada = participante.get('encuesta_completada', False)
-    
-    elegibilidad = {
-        'participante': participante,
-        'num_asistencias': num_asistencias,
-        'participo_workshop': participo_workshop,
-        'participo_mundialito': participo_mundialito,
-        'elegible_general': num_asistencias >= 2,
-        'encuesta_completada': encuesta_completada
-    }
+        return _leer_actividades()
+        
+    except Exception as e:
+        if ultimo_snapshot() is not None:
+            return ultimo_snapshot().actividades
+        st.error(f"❌ Error al cargar actividades desde Supabase: {str(e)}")
+        return None
+
+@st.cache_data(ttl=TTL_DATOS)
+def consultar_elegibilidad(email):
+    """Consulta por email los datos de elegibilidad de un solo participante"""
+    return obtener_handler().obtener_elegibilidad(email)
+
+def verificar_participante(email):
+    """
+    Verifica la elegibilidad de un correo
+
+    Usa las tablas completas si ya están en cache; si no, consulta solo los
+    datos de ese participante.
+    """
+    if instantanea is not None:
+        return instantanea.verificar(email)
     
-    return elegibilidad, None
+    if not SUPABASE_AVAILABLE:
+        return None, "❌ Supabase no está disponible. Contacta al administrador."
+    
+    try:
+        return verificar_elegibilidad_puntual(consultar_elegibilidad(email.strip().lower()))
+    except Exception as e:
+        # Supabase falla o el circuito está abierto: usar el último snapshot bueno
+        if ultimo_snapshot() is not None:
+            avisar_snapshot()
+            return ultimo_snapshot().verificar(email)
+        return None, f"❌ Error al consultar tus datos en Supabase: {str(e)}"
 
-def guardar_respuestas_encuesta(email, respuestas, participantes_df):
+def obtener_cola_encuestas():
+    """Cola de encuestas del proceso, con su hilo de envío a Supabase ya iniciado"""
+    cola = obtener_cola()
+    cola.iniciar(lambda lote: obtener_handler().guardar_encuestas_lote(lote))
+    return cola
+
+def encuesta_enviada(email):
+    """
+    Indica si el participante ya envió la encuesta aunque los datos en cache
+    aún no lo reflejen: la envió en este proceso o está en la cola, pendiente
+    de llegar a Supabase
+    """
+    if email.strip().lower() in estado_datos()['encuestas_recientes']:
+        return True
+    try:
+        return obtener_cola().pendiente(email)
+    except Exception:
+        return False
+
+def guardar_respuestas_encuesta(email, respuestas, participante):
     """Guarda las respuestas de la encuesta en Supabase"""
     try:
-        # Obtener nombre completo del participante
-        participante = participantes_df[participantes_df['email'].str.lower() == email.lower()]
-        if participante.empty:
-            st.error("No se encontró el participante")
-            return False
-        nombre_completo = participante.iloc[0]['nombre_completo']
+        nombre_completo = participante['nombre_completo']
         
         # Guardar en Supabase
         if not SUPABASE_AVAILABLE:
@@ -349,14 +440,21 @@ def guardar_respuestas_encuesta(email, respuestas, participantes_df):
             return False
         
         try:
-            supabase_handler = SupabaseHandler()
-            supabase_handler.connect()
+            # Escribir en la cola local y confirmar de inmediato; el hilo de la
+            # cola las envía a Supabase por lotes
+            obtener_cola_encuestas().encolar(email, nombre_completo, respuestas, PREGUNTAS_DICT)
             
-            # Guardar respuestas
-            supabase_handler.guardar_respuestas(email, nombre_completo, respuestas, PREGUNTAS_DICT)
+            st.success("✅ Respuestas guardadas exitosamente")
+            return True
+            
+        except Exception as e:
+            print(f"Error al escribir en la cola de encuestas: {e}")
+        
+        try:
+            supabase_handler = obtener_handler()
             
-            # Marcar encuesta como completada
-            supabase_handler.marcar_encuesta_completada(email)
+            # Sin cola: guardar respuestas y marcar encuesta como completada (una sola transacción)
+            supabase_handler.guardar_encuesta(email, nombre_completo, respuestas, PREGUNTAS_DICT)
             
             st.success("✅ Respuestas guardadas exitosamente")
             return True
@@ -369,137 +467,182 @@ def guardar_respuestas_encuesta(email, respuestas, participantes_df):
         st.error(f"❌ Error inesperado: {str(e)}")
         return False
 
-def generar_constancia_pdf(participante, tipo_constancia):
-    """Genera una constancia en PDF"""
-    buffer = io.BytesIO()
-    
-    # Determinar qué plantilla usar
-    plantillas_map = {
-        'general': 'Participacion_general.pdf',
-        'workshop': f'W{participante.get("workshop_numero", "1")}.pdf',
-        'mundialito': 'Constancia_mundialito.pdf'
-    }
-    
-    plantilla_path = PLANTILLAS_DIR / plantillas_map.get(tipo_constancia, 'Participacion_general.pdf')
-    
+def generar_constancia_pdf(participante, tipo_constancia, plantilla):
+    """Genera una constancia en PDF con la plantilla de constancias_disponibles"""
     try:
-        if plantilla_path.exists():
-            # Usar plantilla existente
-            pdf_reader = PdfReader(str(plantilla_path))
-            pdf_writer = PdfWriter()
-            
-            # Obtener dimensiones de la página de la plantilla
-            page = pdf_reader.pages[0]
-            media_box = page.mediabox
-            page_width = float(media_box.width)
-            page_height = float(media_box.height)
-            
-            # Crear overlay con el nombre usando las dimensiones correctas de la plantilla
-            packet = io.BytesIO()
-            can = canvas.Canvas(packet, pagesize=(page_width, page_height))
-            
-            # Configurar fuente con tamaño más grande
-            font_size = 32
-            try:
-                can.setFont("OldStandardTT-Bold", font_size)
-            except:
-                can.setFont("Helvetica-Bold", font_size)
-            
-            # Configurar color del texto: rgba(4, 68, 153) -> RGB en escala 0-1
-            can.setFillColorRGB(4/255, 68/255, 153/255)
-            
-            # Usar el nombre completo en MAYÚSCULAS para homogeneidad
-            nombre_completo = participante['nombre_completo'].upper()
-            
-            # Centrar el texto horizontalmente usando drawCentredString
-            # La posición X será el centro de la página automáticamente
-            x_center = page_width / 2
-            
-            # Posición vertical: aproximadamente en el centro vertical de la plantilla
-            # Para una plantilla horizontal de ~612pt de alto, el centro está alrededor de 306pt
-            y = page_height / 1.80
-            
-            # Usar drawCentredString para centrado automático
-            can.drawCentredString(x_center, y, nombre_completo)
-            can.save()
-            
-            # Combinar
-            packet.seek(0)
-            overlay_pdf = PdfReader(packet)
-            page = pdf_reader.pages[0]
-            page.merge_page(overlay_pdf.pages[0])
-            pdf_writer.add_page(page)
-            
-            # Guardar en buffer
-            pdf_writer.write(buffer)
-        else:
-            # Crear constancia desde cero
-            can = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
-            
-            # Título
-            can.setFont("Helvetica-Bold", 28)
-            can.drawCentredString(width/2, height - 100, "CONSTANCIA")
-            
-            # Subtítulo
-            can.setFont("Helvetica", 16)
-            can.drawCentredString(width/2, height - 150, "Jornada de Ingeniería Industrial 2025")
-            
-            # Cuerpo
-            can.setFont("Helvetica", 14)
-            can.drawCentredString(width/2, height - 250, "Se otorga la presente constancia a:")
-            
-            # Nombre con tamaño más grande
-            font_size = 32
-            try:
-                can.setFont("OldStandardTT-Bold", font_size)
-            except:
-                can.setFont("Helvetica-Bold", font_size)
-            
-            # Usar el nombre completo en MAYÚSCULAS para homogeneidad
-            nombre_completo = participante['nombre_completo'].upper()
-            
-            can.drawCentredString(width/2, height - 300, nombre_completo)
-            
-            # Descripción según tipo
-            can.setFont("Helvetica", 12)
-            if tipo_constancia == 'general':
-                texto = "Por su destacada participación en la Jornada de Ingeniería Industrial 2025"
-            elif tipo_constancia == 'workshop':
-                texto = f"Por su participación en el Workshop de la Jornada de Ingeniería Industrial 2025"
-            else:
-                texto = "Por su participación en el Mundialito Mexicano - JII 2025"
-            
-            can.drawCentredString(width/2, height - 380, texto)
-            
-            # Fecha
-            can.drawCentredString(width/2, height - 450, "Cancún, Quintana Roo - Octubre 2025")
-            
-            # Footer
-            can.setFont("Helvetica", 10)
-            can.drawCentredString(width/2, 50, "Universidad del Caribe")
-            
-            can.save()
-    
-        buffer.seek(0)
-        return buffer
-    
+        return generar_constancia(participante, tipo_constancia, assets=assets, motor=MOTOR_PREDETERMINADO,
+                                  plantilla=plantilla)
     except Exception as e:
         st.error(f"Error al generar constancia: {e}")
         return None
 
+def _clave_constancia(participante, tipo_constancia):
+    """Clave de memoización de una constancia dentro de la sesión"""
+    return clave_participante(participante['email'], participante['nombre_completo'], tipo_constancia)
+
+def programar_constancias(elegibilidad):
+    """Pre-renderiza en segundo plano las constancias del participante recién encuestado"""
+    constancias = constancias_disponibles(elegibilidad)
+    if constancias:
+        obtener_prerenderizador().programar(elegibilidad['participante'], constancias)
+
+def preparar_constancia(participante, tipo_constancia, plantilla):
+    """
+    Genera una constancia bajo demanda y la memoiza en la sesión
+    
+    Se usa como callback del botón "Generar PDF", de modo que el PDF solo se
+    renderiza cuando el usuario lo solicita y no en cada rerun de la página.
+    """
+    constancias = st.session_state.setdefault('constancias_generadas', {})
+    clave = _clave_constancia(participante, tipo_constancia)
+    if clave not in constancias:
+        # Si se está pre-renderizando en segundo plano, esperar ese resultado
+        pdf_bytes = obtener_prerenderizador().obtener(*clave, espera=30)
+        if pdf_bytes is None:
+            pdf_buffer = generar_constancia_pdf(participante, tipo_constancia, plantilla)
+            pdf_bytes = pdf_buffer.getvalue() if pdf_buffer else None
+        if pdf_bytes:
+            constancias[clave] = pdf_bytes
+    return constancias.get(clave)
+
+def mostrar_descarga_constancia(participante, constancia, file_name):
+    """
+    Muestra el botón de descarga si la constancia ya se generó, o el botón para generarla
+    
+    Args:
+        participante: Fila del participante
+        constancia (dict): Elemento de constancias_disponibles ('tipo' y 'plantilla')
+        file_name (str): Nombre del archivo descargado
+    """
+    tipo_constancia = constancia['tipo']
+    constancias = st.session_state.setdefault('constancias_generadas', {})
+    clave = _clave_constancia(participante, tipo_constancia)
+    pdf_bytes = constancias.get(clave)
+    
+    # Las constancias pre-renderizadas tras la encuesta se ofrecen directamente
+    if pdf_bytes is None:
+        pdf_bytes = obtener_prerenderizador().obtener(*clave)
+        if pdf_bytes is not None:
+            constancias[clave] = pdf_bytes
+    
+    if pdf_bytes:
+        st.download_button(
+            label="Descargar PDF",
+            data=pdf_bytes,
+            file_name=file_name,
+            mime="application/pdf",
+            key=f"download_{tipo_constancia}",
+            use_container_width=True
+        )
+    else:
+        st.button(
+            "📄 Generar PDF",
+            key=f"generar_{tipo_constancia}",
+            on_click=preparar_constancia,
+            args=(participante, tipo_constancia, constancia['plantilla']),
+            use_container_width=True
+        )
+
+@st.cache_resource
+def obtener_generador():
+    """Generador de PDFs compartido por todas las sesiones del servidor"""
+    return PDFGenerator(ASSETS_DIR)
+
+def preparar_paquete(participante, constancias, formato):
+    """
+    Genera todas las constancias del participante en un solo archivo y lo memoiza en la sesión
+    
+    Args:
+        participante: Fila del participante
+        constancias (list): Resultado de constancias_disponibles
+        formato (str): 'pdf' para un PDF combinado, 'zip' para un ZIP con un PDF por constancia
+    """
+    paquetes = st.session_state.setdefault('constancias_generadas', {})
+    clave = _clave_constancia(participante, f"paquete_{formato}")
+    if clave in paquetes:
+        return paquetes[clave]
+    
+    generador = obtener_generador()
+    try:
+        if formato == 'zip':
+            # El ZIP se escribe entrada por entrada en un archivo temporal
+            # (en memoria hasta 8 MB) en lugar de juntar todos los PDF primero
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as destino:
+                generador.generate_paquete_zip(constancias, participante['nombre_completo'], destino, estilo=ESTILO_JII)
+                destino.seek(0)
+                paquetes[clave] = destino.read()
+        else:
+            paquetes[clave] = generador.generate_paquete_pdf(constancias, participante['nombre_completo'], estilo=ESTILO_JII)
+    except Exception as e:
+        st.error(f"Error al generar el paquete de constancias: {str(e)}")
+        return None
+    return paquetes[clave]
+
+def mostrar_descarga_paquete(participante, constancias):
+    """Muestra la opción de descargar todas las constancias en un solo archivo"""
+    formato = st.radio(
+        "Formato",
+        options=['pdf', 'zip'],
+        format_func=lambda f: "Un solo PDF" if f == 'pdf' else "Archivo ZIP",
+        horizontal=True,
+        key="formato_paquete"
+    )
+    
+    nombre = participante['nombre_completo'].replace(' ', '_')
+    paquetes = st.session_state.get('constancias_generadas', {})
+    datos = paquetes.get(_clave_constancia(participante, f"paquete_{formato}"))
+    
+    if datos:
+        st.download_button(
+            label="Descargar todas",
+            data=datos,
+            file_name=f"Constancias_JII2025_{nombre}.{formato}",
+            mime="application/pdf" if formato == 'pdf' else "application/zip",
+            key=f"download_paquete_{formato}",
+            use_container_width=True
+        )
+    else:
+        st.button(
+            "📦 Generar todas",
+            key=f"generar_paquete_{formato}",
+            on_click=preparar_paquete,
+            args=(participante, constancias, formato),
+            use_container_width=True
+        )
+
 # Header
 st.title("📝 Obtén tus Constancias")
 st.markdown("**Jornada de Ingeniería Industrial 2025**")
 
 st.markdown("---")
 
-# Cargar datos
-participantes_df, asistencias_df, actividades_df, equipos_df = cargar_datos()
+# Reanudar el envío de encuestas que quedaron en la cola
+if SUPABASE_AVAILABLE:
+    obtener_cola_encuestas()
 
-if participantes_df is None or asistencias_df is None or actividades_df is None or equipos_df is None:
-    st.error("No se pudieron cargar los datos. Por favor, contacta al administrador.")
-    st.stop()
+# Cargar datos: si la carga completa está en cache se usa; si no (primera
+# visita o cache vencida) se verifica con consultas por email mientras las
+# tablas completas se recargan en segundo plano
+if datos_vigentes():
+    instantanea = cargar_datos()
+    if instantanea is None:
+        st.error("No se pudieron cargar los datos. Por favor, contacta al administrador.")
+        st.stop()
+    actividades_df = instantanea.actividades
+    if actividades_df.empty:
+        # Carga parcial: actividades no respondió a tiempo
+        actividades_df = cargar_actividades()
+        if actividades_df is None:
+            st.error("No se pudieron cargar los datos. Por favor, contacta al administrador.")
+            st.stop()
+else:
+    instantanea = None
+    actividades_df = cargar_actividades()
+    if actividades_df is None:
+        st.error("No se pudieron cargar los datos. Por favor, contacta al administrador.")
+        st.stop()
+    if SUPABASE_AVAILABLE:
+        refrescar_datos_en_segundo_plano()
 
 # Preparar listas de actividades para los selectbox
 # Solo conferencias con código C1, C2, C3, etc.
@@ -521,7 +664,7 @@ st.header("1️⃣ Verificación de Participación")
 email = st.text_input("📧 Ingresa tu correo electrónico:", placeholder="Correo electrónico")
 
 if email:
-    elegibilidad, error = verificar_elegibilidad(email, participantes_df, asistencias_df, equipos_df)
+    elegibilidad, error = verificar_participante(email)
     
     if error:
         st.error(error)
@@ -553,6 +696,11 @@ if email:
         
         st.markdown("---")
         
+        # Una encuesta recién enviada cuenta como completada aunque aún no
+        # llegue a Supabase o a los datos en cache
+        if not elegibilidad['encuesta_completada'] and encuesta_enviada(email):
+            elegibilidad['encuesta_completada'] = True
+        
         # Paso 2: Encuesta
         if not elegibilidad['encuesta_completada']:
             st.header("2️⃣ Encuesta de Satisfacción")
@@ -658,11 +806,13 @@ if email:
                     if respuestas_vacias:
                         st.error("⚠️ Por favor, completa todas las preguntas obligatorias y selecciona opciones válidas.")
                     else:
-                        if guardar_respuestas_encuesta(email, respuestas, participantes_df):
+                        if guardar_respuestas_encuesta(email, respuestas, participante):
+                            # Renderizar las constancias mientras se muestra la confirmación
+                            programar_constancias(elegibilidad)
                             st.success("✅ ¡Encuesta enviada exitosamente!")
                             st.balloons()
-                            # Limpiar cache para forzar recarga de datos
-                            cargar_datos.clear()
+                            # Solo este participante: los datos compartidos siguen en cache
+                            registrar_encuesta_enviada(email)
                             # Pequeño delay para que el usuario vea el mensaje de éxito
                             time.sleep(1)
                             st.rerun()
@@ -674,37 +824,31 @@ if email:
             
             st.markdown("### 📄 Selecciona las constancias que deseas descargar:")
             
+            # Misma plantilla (p. ej. el workshop asistido) en los botones y en el paquete
+            constancias = constancias_disponibles(elegibilidad)
+            por_tipo = {constancia['tipo']: constancia for constancia in constancias}
+            
             col1, col2, col3 = st.columns(3)
             
             with col1:
                 if elegibilidad['elegible_general']:
                     st.markdown("#### 🏆 Participación General")
                     st.info("Constancia por asistir a la JII 2025")
-                    pdf_buffer = generar_constancia_pdf(participante, 'general')
-                    if pdf_buffer:
-                        st.download_button(
-                            label="Descargar PDF",
-                            data=pdf_buffer,
-                            file_name=f"Constancia_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf",
-                            mime="application/pdf",
-                            key="download_general",
-                            use_container_width=True
-                        )
+                    mostrar_descarga_constancia(
+                        participante,
+                        por_tipo['general'],
+                        f"Constancia_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf"
+                    )
             
             with col2:
                 if elegibilidad['participo_workshop']:
                     st.markdown("#### 🔧 Workshop")
                     st.info("Constancia por participar en Workshop")
-                    pdf_buffer = generar_constancia_pdf(participante, 'workshop')
-                    if pdf_buffer:
-                        st.download_button(
-                            label="Descargar PDF",
-                            data=pdf_buffer,
-                            file_name=f"Constancia_Workshop_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf",
-                            mime="application/pdf",
-                            key="download_workshop",
-                            use_container_width=True
-                        )
+                    mostrar_descarga_constancia(
+                        participante,
+                        por_tipo['workshop'],
+                        f"Constancia_Workshop_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf"
+                    )
                 else:
                     st.markdown("#### 🔧 Workshop")
                     st.warning("No elegible")
@@ -713,19 +857,19 @@ if email:
                 if elegibilidad['participo_mundialito']:
                     st.markdown("#### ⚽ Mundialito")
                     st.info("Constancia por participar en Mundialito")
-                    pdf_buffer = generar_constancia_pdf(participante, 'mundialito')
-                    if pdf_buffer:
-                        st.download_button(
-                            label="Descargar PDF",
-                            data=pdf_buffer,
-                            file_name=f"Constancia_Mundialito_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf",
-                            mime="application/pdf",
-                            key="download_mundialito",
-                            use_container_width=True
-                        )
+                    mostrar_descarga_constancia(
+                        participante,
+                        por_tipo['mundialito'],
+                        f"Constancia_Mundialito_JII2025_{participante['nombre_completo'].replace(' ', '_')}.pdf"
+                    )
                 else:
                     st.markdown("#### ⚽ Mundialito")
                     st.warning("No elegible")
+            
+            # Con más de una constancia, ofrecer descargarlas todas juntas
+            if len(constancias) > 1:
+                st.markdown("### 📦 Descarga todas tus constancias en un solo archivo")
+                mostrar_descarga_paquete(participante, constancias)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,10 @@
+"""
+Configuración común de las pruebas
+Las pruebas importan los módulos de utils desde la raíz del repositorio y no
+necesitan Supabase: usan SQLiteHandler y tablas de pandas construidas aquí.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,173 @@
+"""
+Pruebas de los fallos y reintentos de ColaEncuestas
+"""
+
+import pytest
+
+from utils import cola_encuestas
+from utils.cola_encuestas import ColaEncuestas
+
+
+class Backend:
+    """guardar_lote de prueba: registra los lotes y falla para los emails indicados"""
+
+    def __init__(self):
+        self.caido = False
+        self.rechazados = set()
+        self.lotes = []
+
+    def __call__(self, encuestas):
+        emails = [encuesta['email'] for encuesta in encuestas]
+        self.lotes.append(emails)
+        if self.caido:
+            raise Exception("Supabase no responde")
+        rechazados = self.rechazados.intersection(emails)
+        if rechazados:
+            raise Exception(f"Fila rechazada: {sorted(rechazados)[0]}")
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def cola(tmp_path, backend):
+    cola = ColaEncuestas(tmp_path / "cola.sqlite3")
+    # Sin iniciar el hilo: las pruebas llaman a enviar_pendientes directamente
+    cola._guardar_lote = backend
+    return cola
+
+
+def _encolar(cola, email):
+    return cola.encolar(email, 'Nombre', {1: 'Sí', 2: 'Muy bien'}, {1: '¿Asististe?', 2: '¿Qué tal?'})
+
+
+def test_envia_las_nuevas_en_un_lote(cola, backend):
+    _encolar(cola, 'Ana@Uni.mx')
+    _encolar(cola, 'luis@uni.mx')
+
+    assert cola.pendiente('ana@uni.mx')
+    assert cola.enviar_pendientes() == 2
+
+    assert backend.lotes == [['ana@uni.mx', 'luis@uni.mx']]
+    assert not cola.pendiente('ana@uni.mx')
+    assert cola.estadisticas()['pendientes'] == 0
+    assert cola.enviar_pendientes() == 0
+
+
+def test_fallo_conserva_las_encuestas(cola, backend):
+    _encolar(cola, 'ana@uni.mx')
+    backend.caido = True
+
+    with pytest.raises(Exception, match="no responde"):
+        cola.enviar_pendientes()
+
+    estadisticas = cola.estadisticas()
+    assert estadisticas['pendientes'] == 1
+    assert estadisticas['reintentando'] == 1
+    assert estadisticas['errores'] == 1
+    assert estadisticas['ultimo_error'] == "Supabase no responde"
+    assert cola.pendiente('ana@uni.mx')
+
+    # Al volver Supabase, el reintento la guarda
+    backend.caido = False
+    assert cola.enviar_pendientes() == 1
+    assert cola.estadisticas()['pendientes'] == 0
+
+
+def test_caida_no_aparta_encuestas(cola, backend, monkeypatch):
+    monkeypatch.setattr(cola_encuestas, 'MAX_INTENTOS', 2)
+    _encolar(cola, 'ana@uni.mx')
+    _encolar(cola, 'luis@uni.mx')
+    backend.caido = True
+
+    for _ in range(5):
+        with pytest.raises(Exception):
+            cola.enviar_pendientes()
+
+    estadisticas = cola.estadisticas()
+    assert estadisticas['con_error'] == 0
+    assert estadisticas['pendientes'] == 2
+
+
+def test_reintentos_van_uno_por_uno(cola, backend):
+    _encolar(cola, 'ana@uni.mx')
+    _encolar(cola, 'luis@uni.mx')
+    backend.rechazados = {'luis@uni.mx'}
+
+    with pytest.raises(Exception, match="rechazada"):
+        cola.enviar_pendientes()
+
+    # La encuesta buena no espera a la que falla
+    assert cola.enviar_pendientes() == 1
+    assert backend.lotes[-2:] == [['ana@uni.mx'], ['luis@uni.mx']]
+    assert not cola.pendiente('ana@uni.mx')
+    assert cola.pendiente('luis@uni.mx')
+
+
+def test_encuesta_que_siempre_falla_pasa_a_error(cola, backend, monkeypatch, capsys):
+    monkeypatch.setattr(cola_encuestas, 'MAX_INTENTOS', 2)
+    _encolar(cola, 'mala@uni.mx')
+    _encolar(cola, 'ana@uni.mx')
+    backend.rechazados = {'mala@uni.mx'}
+
+    # El lote nuevo falla; después la mala (id menor) va primero y, sin
+    # ningún guardado todavía, la cola no sabe si Supabase está caído
+    for _ in range(2):
+        with pytest.raises(Exception, match="mala"):
+            cola.enviar_pendientes()
+    assert cola.estadisticas()['con_error'] == 0
+    # Con menos intentos, la buena va primero y se guarda; la mala llega a MAX_INTENTOS
+    assert cola.enviar_pendientes() == 1
+
+    estadisticas = cola.estadisticas()
+    assert estadisticas['con_error'] == 1
+    assert estadisticas['pendientes'] == 0
+    # Se avisa en el log y para el participante sigue contando como enviada
+    assert "Encuesta 1 de mala@uni.mx apartada" in capsys.readouterr().out
+    assert cola.pendiente('mala@uni.mx')
+
+    # Las nuevas ya no se encuentran con la encuesta apartada
+    _encolar(cola, 'luis@uni.mx')
+    assert cola.enviar_pendientes() == 1
+    assert backend.lotes[-1] == ['luis@uni.mx']
+
+
+def _apartar(cola, backend, monkeypatch):
+    """Deja mala@uni.mx apartada en 'error' (con ana@uni.mx guardada)"""
+    monkeypatch.setattr(cola_encuestas, 'MAX_INTENTOS', 1)
+    _encolar(cola, 'mala@uni.mx')
+    _encolar(cola, 'ana@uni.mx')
+    backend.rechazados = {'mala@uni.mx'}
+    with pytest.raises(Exception):
+        cola.enviar_pendientes()
+    with pytest.raises(Exception):
+        cola.enviar_pendientes()
+    assert cola.enviar_pendientes() == 1
+    assert cola.estadisticas()['con_error'] == 1
+
+
+def test_apartadas_se_reintentan(cola, backend, monkeypatch, capsys):
+    _apartar(cola, backend, monkeypatch)
+
+    # Mientras Supabase la siga rechazando, sigue apartada y se avisa
+    assert cola.reintentar_apartadas() == 0
+    assert "1 encuesta(s) siguen apartadas" in capsys.readouterr().out
+    assert cola.estadisticas()['con_error'] == 1
+
+    backend.rechazados = set()
+    assert cola.reintentar_apartadas() == 1
+    assert backend.lotes[-1] == ['mala@uni.mx']
+    estadisticas = cola.estadisticas()
+    assert estadisticas['con_error'] == 0
+    assert not cola.pendiente('mala@uni.mx')
+
+
+def test_envio_normal_ignora_las_apartadas(cola, backend, monkeypatch):
+    _apartar(cola, backend, monkeypatch)
+
+    _encolar(cola, 'luis@uni.mx')
+    assert cola.enviar_pendientes() == 1
+    assert backend.lotes[-1] == ['luis@uni.mx']
+    assert cola.estadisticas()['con_error'] == 1
@@ -0,0 +1,86 @@
+"""
+Pruebas de IndiceElegibilidad contra verificar_elegibilidad
+"""
+
+import pandas as pd
+import pytest
+
+from utils.elegibilidad import IndiceElegibilidad, verificar_elegibilidad
+
+
+@pytest.fixture
+def tablas():
+    participantes = pd.DataFrame([
+        {'id': 1, 'nombre_completo': 'Ana Pérez', 'email': 'Ana.Perez@Uni.mx', 'categoria': 'Estudiante',
+         'programa': 'II', 'encuesta_completada': True, 'total_asistencias': 3, 'asistencias_confirmadas': 3},
+        {'id': 2, 'nombre_completo': 'Luis Gómez', 'email': 'luis@uni.mx', 'categoria': 'Docente',
+         'programa': 'IS', 'encuesta_completada': False, 'total_asistencias': 1, 'asistencias_confirmadas': 0},
+        {'id': 3, 'nombre_completo': 'Marta Ruiz', 'email': 'MARTA@UNI.MX', 'categoria': 'Estudiante',
+         'programa': 'II', 'encuesta_completada': True, 'total_asistencias': 0, 'asistencias_confirmadas': 0},
+        # Email repetido con otras mayúsculas: gana la primera fila
+        {'id': 4, 'nombre_completo': 'Ana Duplicada', 'email': 'ana.perez@uni.mx', 'categoria': 'Docente',
+         'programa': 'IS', 'encuesta_completada': False, 'total_asistencias': 0, 'asistencias_confirmadas': 0},
+    ])
+    asistencias = pd.DataFrame([
+        {'id': 1, 'participante_email': 'ana.perez@uni.mx', 'actividad_codigo': 'C1', 'estado': 'asistió'},
+        {'id': 2, 'participante_email': 'ANA.PEREZ@UNI.MX', 'actividad_codigo': 'W3', 'estado': 'asistió'},
+        {'id': 3, 'participante_email': 'Ana.Perez@Uni.mx', 'actividad_codigo': 'W1', 'estado': 'asistió'},
+        {'id': 4, 'participante_email': 'Luis@Uni.mx', 'actividad_codigo': 'C2', 'estado': 'registrado'},
+    ])
+    equipos = pd.DataFrame([
+        {'id': 1, 'email_capitan': 'Luis@UNI.mx', 'email_miembro_1': 'otro@uni.mx', 'email_miembro_2': None,
+         'email_miembro_3': None, 'email_miembro_4': None, 'email_miembro_5': None},
+        {'id': 2, 'email_capitan': 'capitan@uni.mx', 'email_miembro_1': None, 'email_miembro_2': 'marta@uni.mx',
+         'email_miembro_3': None, 'email_miembro_4': None, 'email_miembro_5': None},
+    ])
+    return participantes, asistencias, equipos
+
+
+def _comparable(resultado):
+    """(elegibilidad, error) con la fila del participante como diccionario"""
+    elegibilidad, error = resultado
+    if elegibilidad is None:
+        return None, error
+    return {**elegibilidad, 'participante': elegibilidad['participante'].to_dict()}, error
+
+
+@pytest.mark.parametrize('email', [
+    'Ana.Perez@Uni.mx',
+    'ana.perez@uni.mx',
+    'ANA.PEREZ@UNI.MX',
+    'luis@uni.mx',
+    'LUIS@uni.MX',
+    'marta@uni.mx',
+    'Marta@Uni.Mx',
+    'nadie@uni.mx',
+])
+def test_indice_igual_a_verificar_elegibilidad(tablas, email):
+    participantes, asistencias, equipos = tablas
+    indice = IndiceElegibilidad(participantes, asistencias, equipos)
+
+    assert _comparable(indice.verificar(email)) == _comparable(
+        verificar_elegibilidad(email, participantes, asistencias, equipos)
+    )
+
+
+def test_indice_ignora_mayusculas(tablas):
+    indice = IndiceElegibilidad(*tablas)
+
+    elegibilidad, error = indice.verificar('ANA.perez@UNI.mx')
+
+    assert error is None
+    assert elegibilidad['participante']['id'] == 1
+    assert elegibilidad['workshops'] == ['W1', 'W3']
+    assert elegibilidad['workshop_numero'] == '1'
+    assert elegibilidad['participo_mundialito'] is False
+    assert indice.verificar('marta@uni.mx')[0]['participo_mundialito'] is True
+
+
+def test_indice_con_tablas_vacias(tablas):
+    participantes, asistencias, equipos = tablas
+    vacias = (asistencias.iloc[0:0], equipos.iloc[0:0])
+    indice = IndiceElegibilidad(participantes, *vacias)
+
+    assert _comparable(indice.verificar('luis@uni.mx')) == _comparable(
+        verificar_elegibilidad('luis@uni.mx', participantes, *vacias)
+    )
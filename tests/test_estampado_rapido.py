@@ -0,0 +1,136 @@
+"""
+Pruebas del motor rápido de estampado sobre las plantillas reales de assets/plantillas
+"""
+
+import io
+import re
+from pathlib import Path
+
+import pytest
+from PyPDF2 import PdfReader
+
+from utils import generador_constancias
+from utils.estampado_rapido import TextoNoCodificable, estampar_nombre, obtener_preparada
+from utils.generador_constancias import generar_constancia
+from utils.pdf_generator import PDFGenerator
+from utils.plantillas import obtener_plantilla
+
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "assets"
+FUENTE = ASSETS_DIR / "fonts" / "OldStandardTT-Bold.ttf"
+COLOR = (4 / 255, 68 / 255, 153 / 255)
+
+# Acentos, ñ y los caracteres que se escapan en un string PDF: ( ) \
+NOMBRE = "JOSÉ PEÑA (O'BRIEN) \\ MÜLLER"
+NOMBRE_FUERA_DE_CP1252 = "Łukasz Żółć"
+
+
+def _estampar(plantilla, nombre=NOMBRE, subconjunto=False):
+    return estampar_nombre(
+        obtener_plantilla(ASSETS_DIR / "plantillas" / plantilla), FUENTE,
+        nombre, 32, COLOR, 1 / 1.80, subconjunto=subconjunto
+    )
+
+
+def _texto(pdf):
+    return PdfReader(io.BytesIO(pdf)).pages[0].extract_text()
+
+
+@pytest.mark.parametrize('subconjunto', [False, True])
+@pytest.mark.parametrize('plantilla', ['Participacion_general.pdf', 'W3.pdf', 'Constancia_mundialito.pdf'])
+def test_nombre_estampado_en_plantilla_real(plantilla, subconjunto):
+    pdf = _estampar(plantilla, subconjunto=subconjunto)
+
+    # strict=True falla si algún offset de la tabla xref no apunta a su objeto
+    reader = PdfReader(io.BytesIO(pdf), strict=True)
+    assert len(reader.pages) == 1
+    assert NOMBRE in reader.pages[0].extract_text()
+    assert '/FJII' in reader.pages[0]['/Resources']['/Font']
+
+
+@pytest.mark.parametrize('subconjunto', [False, True])
+def test_actualizacion_incremental(subconjunto):
+    plantilla = obtener_plantilla(ASSETS_DIR / "plantillas" / 'W3.pdf')
+    preparada = obtener_preparada(plantilla, FUENTE, subconjunto)
+
+    pdf = _estampar('W3.pdf', subconjunto=subconjunto)
+
+    # La base no se modifica: la constancia solo le agrega una sección al final
+    assert pdf.startswith(preparada.base)
+    actualizacion = pdf[len(preparada.base):]
+    assert actualizacion.endswith(b'%%EOF\n')
+
+    # /Prev encadena con la tabla xref de la base
+    prev_base = int(re.findall(rb'startxref\s+(\d+)', preparada.base)[-1])
+    assert re.search(rb'/Prev (\d+)', actualizacion).group(1) == str(prev_base).encode()
+
+    # startxref apunta a la nueva tabla, y cada subsección al objeto que redefine
+    startxref = int(re.findall(rb'startxref\s+(\d+)', pdf)[-1])
+    assert pdf[startxref:].startswith(b'xref\n')
+    subsecciones = re.findall(rb'(\d+) 1\n(\d{10}) 00000 n ', pdf[startxref:])
+    esperados = {preparada.num_hueco, preparada.num_programa} if subconjunto else {preparada.num_hueco}
+    assert {int(num) for num, _ in subsecciones} == esperados
+    for num, offset in subsecciones:
+        assert pdf[int(offset):].startswith(b'%d 0 obj\n' % int(num))
+
+
+def test_subconjunto_reduce_la_fuente():
+    completo = _estampar('Participacion_general.pdf')
+    subconjunto = _estampar('Participacion_general.pdf', subconjunto=True)
+
+    assert len(subconjunto) < len(completo)
+    assert _texto(subconjunto) == _texto(completo)
+
+
+def test_nombre_fuera_de_cp1252_no_se_estampa():
+    with pytest.raises(TextoNoCodificable):
+        _estampar('Participacion_general.pdf', NOMBRE_FUERA_DE_CP1252)
+
+
+@pytest.fixture
+def espia_pypdf2(monkeypatch):
+    """Cuenta las constancias que PDFGenerator genera con el motor pypdf2"""
+    llamadas = []
+    original = PDFGenerator._generate_pypdf2
+
+    def espia(self, *args, **kwargs):
+        llamadas.append(args)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PDFGenerator, '_generate_pypdf2', espia)
+    return llamadas
+
+
+def test_pdf_generator_usa_pypdf2_fuera_de_cp1252(espia_pypdf2):
+    generador = PDFGenerator(ASSETS_DIR, usar_cache=False, motor='rapido')
+
+    pdf = generador.generate_constancia('Participacion_general.pdf', NOMBRE_FUERA_DE_CP1252)
+
+    assert len(espia_pypdf2) == 1
+    assert NOMBRE_FUERA_DE_CP1252 in _texto(pdf)
+
+
+def test_pdf_generator_usa_el_motor_rapido_en_cp1252(espia_pypdf2):
+    generador = PDFGenerator(ASSETS_DIR, usar_cache=False, motor='rapido')
+
+    pdf = generador.generate_constancia('Participacion_general.pdf', 'José Peña')
+
+    assert espia_pypdf2 == []
+    assert 'José Peña' in _texto(pdf)
+
+
+def test_generar_constancia_usa_pypdf2_fuera_de_cp1252(monkeypatch):
+    fusiones = []
+    original = generador_constancias.fusionar_overlay
+
+    def espia(*args, **kwargs):
+        fusiones.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(generador_constancias, 'fusionar_overlay', espia)
+
+    buffer = generar_constancia(
+        {'nombre_completo': NOMBRE_FUERA_DE_CP1252}, 'workshop', motor='rapido', usar_cache=False, plantilla='W3.pdf'
+    )
+
+    assert len(fusiones) == 1
+    assert NOMBRE_FUERA_DE_CP1252.upper() in _texto(buffer.getvalue())
@@ -0,0 +1,193 @@
+"""
+Pruebas de los estados del Circuito y de los reintentos de ResilienciaSupabase
+"""
+
+import time
+
+import pytest
+
+from utils import resiliencia
+from utils.resiliencia import Circuito, CircuitoAbierto, ResilienciaSupabase
+
+
+def test_circuito_se_abre_tras_el_umbral():
+    circuito = Circuito(umbral_fallos=3, espera_reapertura=60)
+
+    for _ in range(2):
+        circuito.permitir()
+        circuito.fallo()
+    assert circuito.estado == 'cerrado'
+
+    circuito.permitir()
+    circuito.fallo()
+    assert circuito.estado == 'abierto'
+    assert circuito.aperturas == 1
+
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+    assert circuito.rechazadas == 1
+
+
+def test_exito_reinicia_los_fallos_seguidos():
+    circuito = Circuito(umbral_fallos=2, espera_reapertura=60)
+
+    circuito.fallo()
+    circuito.exito()
+    circuito.fallo()
+
+    assert circuito.estado == 'cerrado'
+
+
+def test_medio_abierto_deja_pasar_una_prueba():
+    circuito = Circuito(umbral_fallos=1, espera_reapertura=0.05)
+    circuito.fallo()
+    assert circuito.estado == 'abierto'
+
+    time.sleep(0.06)
+    circuito.permitir()
+    assert circuito.estado == 'medio_abierto'
+
+    # Mientras la prueba está en curso las demás llamadas se rechazan
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+
+    circuito.exito()
+    assert circuito.estado == 'cerrado'
+    circuito.permitir()
+
+
+def test_prueba_fallida_vuelve_a_abrir():
+    circuito = Circuito(umbral_fallos=5, espera_reapertura=0.05)
+    for _ in range(5):
+        circuito.fallo()
+
+    time.sleep(0.06)
+    circuito.permitir()
+    circuito.fallo()
+
+    assert circuito.estado == 'abierto'
+    assert circuito.aperturas == 2
+    with pytest.raises(CircuitoAbierto):
+        circuito.permitir()
+
+
+@pytest.fixture
+def sin_backoff(monkeypatch):
+    monkeypatch.setattr(resiliencia, 'BACKOFF_MAXIMO', 0.0)
+
+
+def test_lectura_se_reintenta(sin_backoff):
+    capa = ResilienciaSupabase(timeouts={'lectura': 1}, intentos=3, circuito=Circuito(umbral_fallos=5))
+    llamadas = []
+
+    def leer():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise Exception("conexión reiniciada")
+        return 'ok'
+
+    assert capa.llamar('leer', 'lectura', leer) == 'ok'
+    estadisticas = capa.estadisticas()
+    assert estadisticas['reintentos'] == 2
+    assert estadisticas['fallos'] == 2
+    assert estadisticas['circuito'] == 'cerrado'
+
+
+def test_escritura_no_se_reintenta(sin_backoff):
+    capa = ResilienciaSupabase(timeouts={'escritura': 1}, intentos=3, circuito=Circuito(umbral_fallos=5))
+    llamadas = []
+
+    def escribir():
+        llamadas.append(1)
+        raise Exception("conflicto")
+
+    with pytest.raises(Exception, match="conflicto"):
+        capa.llamar('escribir', 'escritura', escribir)
+    assert len(llamadas) == 1
+
+
+def test_fallos_abren_el_circuito_de_la_capa(sin_backoff):
+    capa = ResilienciaSupabase(timeouts={'lectura': 1}, intentos=2,
+                               circuito=Circuito(umbral_fallos=2, espera_reapertura=60))
+
+    def caido():
+        raise Exception("Supabase no responde")
+
+    with pytest.raises(Exception, match="no responde"):
+        capa.llamar('leer', 'lectura', caido)
+    with pytest.raises(CircuitoAbierto):
+        capa.llamar('leer', 'lectura', caido)
+    assert capa.estadisticas()['circuito'] == 'abierto'
+
+
+def test_timeout_corta_la_espera(sin_backoff):
+    capa = ResilienciaSupabase(timeouts={'lectura': 0.1}, intentos=1, circuito=Circuito(umbral_fallos=5))
+
+    inicio = time.monotonic()
+    with pytest.raises(Exception, match="Tiempo de espera agotado"):
+        capa.llamar('lenta', 'lectura', time.sleep, 1)
+
+    assert time.monotonic() - inicio < 0.5
+    assert capa.estadisticas()['timeouts'] == 1
+
+
+class ConsultaLenta:
+    """Consulta encadenable de prueba sobre una lista de filas; cada execute tarda demora segundos"""
+
+    def __init__(self, filas, demora):
+        self.filas = filas
+        self.demora = demora
+        self.despues_de = None
+        self.limite = None
+        self.count = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def gt(self, columna, valor):
+        self.despues_de = valor
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, limite):
+        self.limite = limite
+        return self
+
+    def execute(self):
+        time.sleep(self.demora)
+        filas = [f for f in self.filas if self.despues_de is None or f['id'] > self.despues_de]
+        self.data = filas[:self.limite]
+        return self
+
+
+class ClienteLento:
+    def __init__(self, filas, demora):
+        self.filas = filas
+        self.demora = demora
+
+    def table(self, nombre):
+        return ConsultaLenta(self.filas, self.demora)
+
+
+def test_lectura_completa_tiene_tiempo_limite_por_pagina(monkeypatch, sin_backoff):
+    from utils import supabase_handler
+    from utils.supabase_handler import SupabaseHandler
+
+    monkeypatch.setattr(supabase_handler, 'TAMANO_PAGINA', 10)
+    monkeypatch.setattr(resiliencia, '_resiliencia', ResilienciaSupabase(
+        timeouts={'lectura': 0.3}, intentos=1, circuito=Circuito(umbral_fallos=1, espera_reapertura=60)
+    ))
+    handler = SupabaseHandler.__new__(SupabaseHandler)
+    filas = [{'id': i, 'participante_email': f'p{i}@uni.mx', 'timestamp': str(i)} for i in range(1, 31)]
+    handler.client = ClienteLento(filas, demora=0.1)
+
+    # 4 páginas de 0.1 s: el recorrido completo pasa del tiempo límite de una lectura
+    inicio = time.monotonic()
+    respuestas = handler.obtener_respuestas()
+    assert time.monotonic() - inicio > 0.3
+
+    assert len(respuestas) == 30
+    assert respuestas[0]['timestamp'] == '9'
+    assert resiliencia.obtener_resiliencia().estadisticas()['timeouts'] == 0
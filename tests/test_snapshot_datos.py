@@ -0,0 +1,143 @@
+"""
+Pruebas del refresco incremental de SnapshotDatos sobre SQLiteHandler
+"""
+
+import time
+
+import pytest
+
+from utils.snapshot_datos import SnapshotDatos
+from utils.sqlite_handler import SQLiteHandler
+
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = SQLiteHandler(tmp_path / "constancias.sqlite3")
+    handler.connect()
+    handler.insertar_filas('participantes', [
+        {'id': 1, 'nombre_completo': 'Ana Pérez', 'email': 'ana@uni.mx', 'categoria': 'Estudiante'},
+        {'id': 2, 'nombre_completo': 'Luis Gómez', 'email': 'Luis@Uni.mx', 'categoria': 'Docente'},
+    ])
+    handler.insertar_filas('actividades', [
+        {'id': 1, 'codigo': 'C1', 'titulo': 'Conferencia 1'},
+        {'id': 2, 'codigo': 'W3', 'titulo': 'Workshop 3'},
+    ])
+    handler.insertar_filas('asistencias', [
+        {'id': 1, 'participante_email': 'ana@uni.mx', 'actividad_codigo': 'C1', 'estado': 'asistió'},
+    ])
+    return handler
+
+
+def _ejecutar(handler, sql, parametros=()):
+    # Las marcas de agua tienen resolución de milisegundos
+    time.sleep(0.01)
+    conexion = handler._conexion()
+    conexion.execute(sql, parametros)
+    conexion.commit()
+
+
+def test_primera_carga_es_completa(handler):
+    snapshot = SnapshotDatos()
+
+    instantanea = snapshot.refrescar(handler)
+
+    assert instantanea.version == 1
+    assert sorted(instantanea.participantes['email']) == ['Luis@Uni.mx', 'ana@uni.mx']
+    assert snapshot.estadisticas()['recargas_completas'] == 1
+
+
+def test_insercion_se_fusiona(handler):
+    snapshot = SnapshotDatos()
+    snapshot.refrescar(handler)
+
+    time.sleep(0.01)
+    handler.insertar_filas('asistencias', [
+        {'id': 2, 'participante_email': 'LUIS@uni.mx', 'actividad_codigo': 'W3', 'estado': 'asistió'},
+        {'id': 3, 'participante_email': 'luis@uni.mx', 'actividad_codigo': 'C1', 'estado': 'asistió'},
+    ])
+    instantanea = snapshot.refrescar(handler)
+
+    estadisticas = snapshot.estadisticas()
+    assert estadisticas['recargas_completas'] == 1
+    assert estadisticas['refrescos_incrementales'] == 1
+    assert estadisticas['motivos'] == {}
+    assert len(instantanea.asistencias) == 3
+    # Los totales de la vista se recalculan con las asistencias nuevas
+    elegibilidad, _ = instantanea.verificar('luis@uni.mx')
+    assert elegibilidad['num_asistencias'] == 2
+    assert elegibilidad['workshops'] == ['W3']
+
+
+def test_actualizacion_se_fusiona(handler):
+    snapshot = SnapshotDatos()
+    snapshot.refrescar(handler)
+
+    _ejecutar(handler, "UPDATE participantes SET nombre_completo = ? WHERE id = 1", ('Ana María Pérez',))
+    _ejecutar(handler, "UPDATE actividades SET titulo = ? WHERE id = 2", ('Workshop de datos',))
+    instantanea = snapshot.refrescar(handler)
+
+    estadisticas = snapshot.estadisticas()
+    assert estadisticas['recargas_completas'] == 1
+    assert estadisticas['motivos'] == {}
+    assert len(instantanea.participantes) == 2
+    assert instantanea.participante('ANA@uni.mx')['nombre_completo'] == 'Ana María Pérez'
+    assert instantanea.actividades.set_index('id').loc[2, 'titulo'] == 'Workshop de datos'
+
+
+def test_actualizacion_con_fecha_anterior_a_la_marca(handler):
+    # Una transacción que empezó antes del refresco y terminó después deja
+    # su fila con un updated_at menor que la marca ya tomada
+    snapshot = SnapshotDatos()
+    snapshot.refrescar(handler)
+    _ejecutar(handler, "UPDATE participantes SET categoria = 'Docente' WHERE id = 1")
+    snapshot.refrescar(handler)
+    marca, _ = snapshot.estadisticas()['marcas']['participantes']
+
+    _ejecutar(
+        handler,
+        "UPDATE participantes SET encuesta_completada = 1, "
+        "updated_at = strftime('%Y-%m-%d %H:%M:%f', ?, '-5 seconds') WHERE id = 2",
+        (marca,)
+    )
+    instantanea = snapshot.refrescar(handler)
+
+    assert instantanea.participante('luis@uni.mx')['encuesta_completada']
+    estadisticas = snapshot.estadisticas()
+    assert estadisticas['recargas_completas'] == 1
+    assert estadisticas['motivos'] == {}
+    # La marca no retrocede
+    assert estadisticas['marcas']['participantes'][0] == marca
+
+
+def test_solape_no_publica_versiones_sin_cambios(handler):
+    snapshot = SnapshotDatos()
+    snapshot.refrescar(handler)
+    _ejecutar(handler, "UPDATE participantes SET categoria = 'Docente' WHERE id = 1")
+    cambiada = snapshot.refrescar(handler)
+
+    # Las filas de la ventana de solape se vuelven a leer, pero no cambiaron
+    assert snapshot.refrescar(handler) is cambiada
+    assert snapshot.estadisticas()['filas_fusionadas'] == 1
+
+
+def test_borrado_recarga_la_tabla(handler):
+    snapshot = SnapshotDatos()
+    snapshot.refrescar(handler)
+
+    _ejecutar(handler, "DELETE FROM asistencias WHERE id = 1")
+    instantanea = snapshot.refrescar(handler)
+
+    estadisticas = snapshot.estadisticas()
+    assert 'asistencias' in estadisticas['motivos']
+    assert estadisticas['refrescos_incrementales'] == 1
+    assert instantanea.asistencias.empty
+    assert instantanea.verificar('ana@uni.mx')[0]['num_asistencias'] == 0
+
+
+def test_sin_cambios_conserva_la_instantanea(handler):
+    snapshot = SnapshotDatos()
+    primera = snapshot.refrescar(handler)
+
+    segunda = snapshot.refrescar(handler)
+
+    assert segunda is primera
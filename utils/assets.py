@@ -0,0 +1,146 @@
+"""
+Registro de assets compartido por el proceso
+Las fuentes de assets/fonts se parsean y se registran en reportlab una sola vez
+por proceso del servidor (cada TTFont guarda su tabla de anchos, así que medir
+texto no vuelve a leer el archivo) y las plantillas se delegan al registro de
+plantillas. Streamlit vuelve a ejecutar las páginas en cada interacción, por lo
+que todo lo de este módulo es idempotente y seguro entre hilos.
+"""
+
+import copy
+import threading
+from pathlib import Path
+from weakref import WeakKeyDictionary
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFont
+
+from utils.plantillas import obtener_plantilla
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+ASSETS_DIR = ROOT_DIR / "assets"
+FONTS_DIR = ASSETS_DIR / "fonts"
+PLANTILLAS_DIR = ASSETS_DIR / "plantillas"
+
+# Nombre registrado en reportlab -> archivo TTF
+# La página usa 'OldStandardTT-Bold' y PDFGenerator 'OldStandard-*'; los alias
+# de un mismo archivo comparten la fuente ya parseada
+FUENTES = {
+    'OldStandard-Bold': 'OldStandardTT-Bold.ttf',
+    'OldStandard-Regular': 'OldStandardTT-Regular.ttf',
+    'OldStandard-Italic': 'OldStandardTT-Italic.ttf',
+    'OldStandardTT-Bold': 'OldStandardTT-Bold.ttf',
+}
+
+# Fuente con la que se imprime el nombre del participante
+FUENTE_NOMBRE = 'OldStandardTT-Bold'
+
+
+class RegistroAssets:
+    """Fuentes y plantillas de un directorio de assets"""
+
+    def __init__(self, assets_dir=None):
+        self.assets_dir = Path(assets_dir or ASSETS_DIR)
+        self.fonts_dir = self.assets_dir / "fonts"
+        self.plantillas_dir = self.assets_dir / "plantillas"
+
+        self._lock = threading.RLock()
+        self._fuentes = {}          # nombre -> TTFont registrada
+        self._por_archivo = {}      # archivo TTF -> primera TTFont parseada
+        self._errores = {}          # nombre -> mensaje del error al cargarla
+
+    def _cargar_fuente(self, nombre, archivo):
+        """Registra una fuente, parseando cada archivo TTF solo una vez"""
+        ruta = self.fonts_dir / archivo
+        base = self._por_archivo.get(ruta)
+
+        if base is None:
+            fuente = TTFont(nombre, str(ruta))
+            self._por_archivo[ruta] = fuente
+        else:
+            # Alias de un archivo ya parseado: se comparte la cara de la fuente
+            # y solo se separa el estado por documento de reportlab
+            fuente = copy.copy(base)
+            fuente.fontName = nombre
+            fuente.encoding = TTEncoding()
+            fuente.state = WeakKeyDictionary()
+
+        pdfmetrics.registerFont(fuente)
+        self._fuentes[nombre] = fuente
+        return fuente
+
+    def registrar_fuentes(self):
+        """
+        Registra en reportlab todas las fuentes de FUENTES
+
+        Es idempotente: las fuentes ya registradas no se vuelven a parsear, y
+        las que fallaron no se reintentan.
+
+        Returns:
+            dict: Nombre -> mensaje de error de las fuentes que no se pudieron cargar
+        """
+        with self._lock:
+            for nombre, archivo in FUENTES.items():
+                if nombre in self._fuentes or nombre in self._errores:
+                    continue
+                try:
+                    self._cargar_fuente(nombre, archivo)
+                except Exception as e:
+                    self._errores[nombre] = str(e)
+            return dict(self._errores)
+
+    def fuente_disponible(self, nombre):
+        """Indica si la fuente quedó registrada en reportlab"""
+        self.registrar_fuentes()
+        return nombre in self._fuentes
+
+    def ruta_fuente(self, nombre):
+        """Ruta del archivo TTF de una fuente de FUENTES"""
+        return self.fonts_dir / FUENTES[nombre]
+
+    def plantilla(self, nombre):
+        """
+        Devuelve una plantilla de assets/plantillas desde el registro de plantillas
+
+        Args:
+            nombre (str): Nombre del archivo (ej: 'Participacion_general.pdf')
+
+        Returns:
+            PlantillaCargada: Plantilla parseada
+        """
+        ruta = self.plantillas_dir / nombre
+        if not ruta.exists():
+            raise FileNotFoundError(f"Plantilla no encontrada: {ruta}")
+        return obtener_plantilla(ruta)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Fuentes registradas, archivos parseados y errores
+        """
+        with self._lock:
+            return {
+                'fuentes': sorted(self._fuentes),
+                'archivos_ttf': len(self._por_archivo),
+                'errores': dict(self._errores),
+            }
+
+
+_registros = {}
+_registros_lock = threading.Lock()
+
+
+def obtener_assets(assets_dir=None):
+    """
+    Devuelve el registro de assets del proceso para un directorio
+
+    Las fuentes se registran al crear el registro, así que después de esta
+    llamada ya se pueden usar en reportlab.
+    """
+    clave = Path(assets_dir or ASSETS_DIR).resolve()
+    with _registros_lock:
+        registro = _registros.get(clave)
+        if registro is None:
+            registro = _registros[clave] = RegistroAssets(clave)
+    registro.registrar_fuentes()
+    return registro
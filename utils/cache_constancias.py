@@ -0,0 +1,204 @@
+"""
+Cache en disco de constancias ya renderizadas
+La salida depende solo de (plantilla, nombre, fuente, color, posición), así que
+se direcciona por el hash de esas entradas; el mismo hash sirve como ETag
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+# Cambiar al modificar la forma de renderizar para invalidar el cache existente
+VERSION_RENDER = 2
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DIRECTORIO_PREDETERMINADO = ROOT_DIR / ".cache" / "constancias"
+MAX_MB_PREDETERMINADO = 512
+
+
+def clave_constancia(plantilla_sha256, nombre_completo, estilo, motor='pypdf2', optimizacion=None):
+    """
+    Calcula la clave de contenido de una constancia
+
+    Args:
+        plantilla_sha256 (str): Hash del archivo de plantilla (PlantillaCargada.sha256)
+        nombre_completo (str): Nombre tal como se imprime en la constancia
+        estilo (dict): Fuente, tamaño, color y posición del nombre
+        motor (str): Motor de renderizado usado
+        optimizacion (dict, optional): Opciones de optimización de la salida
+
+    Returns:
+        str: Hash hexadecimal SHA-256, estable entre procesos y reinicios
+    """
+    entradas = {
+        'version': VERSION_RENDER,
+        'motor': motor,
+        'plantilla': plantilla_sha256,
+        'nombre': nombre_completo,
+        'estilo': estilo,
+        'optimizacion': optimizacion,
+    }
+    serializado = json.dumps(entradas, sort_keys=True, ensure_ascii=False, default=list)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def etag(clave):
+    """Devuelve la clave en formato de ETag HTTP"""
+    return f'"{clave}"'
+
+
+class CacheConstancias:
+    """Cache de PDFs en disco con desalojo LRU acotado por tamaño total"""
+
+    def __init__(self, directorio=None, max_bytes=None):
+        self.directorio = Path(directorio or DIRECTORIO_PREDETERMINADO)
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_MB_PREDETERMINADO * 1024 * 1024
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _ruta(self, clave):
+        # Dos niveles para no acumular miles de archivos en un solo directorio
+        return self.directorio / clave[:2] / f"{clave}.pdf"
+
+    def _archivos(self):
+        if not self.directorio.exists():
+            return []
+        return [p for p in self.directorio.glob("*/*.pdf") if p.is_file()]
+
+    def _tamano_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(p.stat().st_size for p in self._archivos())
+        return self._total_bytes
+
+    def obtener(self, clave):
+        """
+        Lee una constancia del cache
+
+        Args:
+            clave (str): Clave calculada con clave_constancia
+
+        Returns:
+            bytes: PDF cacheado, o None si no existe
+        """
+        ruta = self._ruta(clave)
+        try:
+            datos = ruta.read_bytes()
+        except FileNotFoundError:
+            self.fallos += 1
+            return None
+
+        # Actualizar mtime para que el desalojo sea por uso reciente
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+
+        self.aciertos += 1
+        return datos
+
+    def guardar(self, clave, datos):
+        """
+        Guarda una constancia en el cache y desaloja las menos usadas si se excede el límite
+
+        Args:
+            clave (str): Clave calculada con clave_constancia
+            datos (bytes): PDF renderizado
+        """
+        if len(datos) > self.max_bytes:
+            return
+
+        ruta = self._ruta(clave)
+        if ruta.exists():
+            # Misma clave, mismo contenido: no hay nada que escribir
+            return
+
+        with self._lock:
+            # Inicializar el total antes de escribir para no contar dos veces este archivo
+            self._tamano_total()
+
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+
+        # Escritura atómica: otro proceso nunca ve un archivo a medias
+        temporal = ruta.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temporal.write_bytes(datos)
+        os.replace(temporal, ruta)
+
+        with self._lock:
+            self._total_bytes += len(datos)
+            if self._total_bytes > self.max_bytes:
+                self._desalojar()
+
+    def _desalojar(self):
+        """Elimina las constancias con uso más antiguo hasta quedar en el 90% del límite"""
+        archivos = []
+        for ruta in self._archivos():
+            try:
+                stat = ruta.stat()
+                archivos.append((stat.st_mtime, stat.st_size, ruta))
+            except FileNotFoundError:
+                continue
+
+        # Recalcular con lo que hay en disco (otros procesos también escriben)
+        total = sum(tamano for _, tamano, _ in archivos)
+        objetivo = self.max_bytes * 0.9
+
+        for _, tamano, ruta in sorted(archivos):
+            if total <= objetivo:
+                break
+            try:
+                ruta.unlink()
+                total -= tamano
+            except FileNotFoundError:
+                continue
+
+        self._total_bytes = total
+
+    def limpiar(self):
+        """Elimina todas las constancias del cache"""
+        with self._lock:
+            for ruta in self._archivos():
+                try:
+                    ruta.unlink()
+                except FileNotFoundError:
+                    pass
+            self._total_bytes = 0
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Archivos, bytes usados, aciertos y fallos del cache
+        """
+        with self._lock:
+            return {
+                'archivos': len(self._archivos()),
+                'bytes': self._tamano_total(),
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """
+    Devuelve el cache de constancias del proceso
+
+    El directorio y el límite se configuran con las variables de entorno
+    CONSTANCIAS_CACHE_DIR y CONSTANCIAS_CACHE_MB
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_mb = int(os.getenv("CONSTANCIAS_CACHE_MB", MAX_MB_PREDETERMINADO))
+            _cache = CacheConstancias(
+                directorio=os.getenv("CONSTANCIAS_CACHE_DIR") or DIRECTORIO_PREDETERMINADO,
+                max_bytes=max_mb * 1024 * 1024
+            )
+        return _cache
@@ -0,0 +1,93 @@
+"""
+Carga concurrente de las tablas de Supabase
+Participantes, asistencias, actividades y equipos se leen al mismo tiempo en un
+pool de hilos, así que una carga en frío tarda lo que la tabla más lenta y no
+la suma de las cuatro. Cada tabla tiene su propio tiempo límite y las tablas no
+críticas (actividades) pueden faltar sin que falle la carga completa.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pandas as pd
+
+from utils.resiliencia import tiempo_maximo
+from utils.supabase_handler import construir_dataframe
+
+# Segundos máximos de espera por tabla, contados desde el inicio de la carga;
+# por defecto lo que puede tardar una lectura con todos sus reintentos, para
+# no abandonar una página que todavía se está reintentando
+TIMEOUT_PREDETERMINADO = float(os.getenv("CONSTANCIAS_TIMEOUT_CARGA", tiempo_maximo('lectura')))
+TIMEOUTS_TABLAS = {
+    'actividades': float(os.getenv("CONSTANCIAS_TIMEOUT_ACTIVIDADES", 5)),
+}
+
+# Tablas cuya ausencia no impide verificar la elegibilidad; si tardan o fallan
+# se devuelven vacías, con estas columnas
+TABLAS_OPCIONALES = {
+    'actividades': ['id', 'codigo', 'titulo'],
+}
+
+TABLAS = ('participantes', 'asistencias', 'actividades', 'equipos')
+
+
+def _leer_tabla(handler, nombre):
+    """Lee una tabla completa por páginas y la convierte a DataFrame"""
+    if nombre == 'participantes':
+        # Usa vista_participantes_completa, con la tabla participantes como fallback
+        return construir_dataframe(handler.iterar_participantes(prefetch=True))
+    tabla = 'equipos_concurso' if nombre == 'equipos' else nombre
+    return construir_dataframe(handler.iterar_paginas(tabla, prefetch=True))
+
+
+def cargar_tablas(handler, tablas=TABLAS, timeout=None, timeouts=None):
+    """
+    Lee varias tablas de Supabase al mismo tiempo
+
+    Args:
+        handler (SupabaseHandler): Handler conectado (normalmente obtener_handler())
+        tablas (tuple): Nombres a cargar, de TABLAS
+        timeout (float, optional): Segundos por tabla; por defecto TIMEOUT_PREDETERMINADO
+        timeouts (dict, optional): Segundos por tabla que reemplazan a TIMEOUTS_TABLAS
+
+    Returns:
+        tuple: (datos, faltantes) donde datos es {nombre: DataFrame} y faltantes
+               es {nombre: mensaje} de las tablas opcionales que no se pudieron
+               cargar (en datos aparecen vacías)
+
+    Raises:
+        Exception: Si una tabla no opcional falla o no responde a tiempo
+    """
+    timeout = TIMEOUT_PREDETERMINADO if timeout is None else timeout
+    limites = {**TIMEOUTS_TABLAS, **(timeouts or {})}
+
+    datos = {}
+    faltantes = {}
+    inicio = time.monotonic()
+
+    executor = ThreadPoolExecutor(max_workers=len(tablas), thread_name_prefix="carga-datos")
+    try:
+        futuros = {nombre: executor.submit(_leer_tabla, handler, nombre) for nombre in tablas}
+
+        for nombre, futuro in futuros.items():
+            restante = inicio + limites.get(nombre, timeout) - time.monotonic()
+            try:
+                datos[nombre] = futuro.result(timeout=max(restante, 0))
+            except TimeoutError:
+                error = f"{nombre} no respondió en {limites.get(nombre, timeout):g} s"
+            except Exception as e:
+                error = str(e)
+            else:
+                continue
+
+            if nombre not in TABLAS_OPCIONALES:
+                raise Exception(f"Error al cargar {nombre}: {error}")
+            print(f"⚠️  Carga parcial: {error}")
+            faltantes[nombre] = error
+            datos[nombre] = pd.DataFrame(columns=TABLAS_OPCIONALES[nombre])
+    finally:
+        # No esperar a las lecturas que excedieron su tiempo; terminan solas
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return datos, faltantes
@@ -0,0 +1,355 @@
+"""
+Cola durable de encuestas (write-behind)
+Las encuestas enviadas se escriben primero en un archivo SQLite local y se
+confirman al usuario de inmediato; un hilo en segundo plano las envía a
+Supabase por lotes, reintenta con backoff si falla y las marca como guardadas.
+Así un backend lento no bloquea al usuario y una caída no pierde respuestas.
+
+Las encuestas cuyo lote falló se reintentan una por una, de modo que una
+encuesta que Supabase siempre rechaza no detiene a las demás; tras
+MAX_INTENTOS fallos (con otras guardándose bien) pasa al estado 'error'. Las
+apartadas no se pierden: se registran en el log, se siguen reintentando cada
+REINTENTO_APARTADAS_SEGUNDOS y cuentan como enviadas para el participante.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RUTA_PREDETERMINADA = ROOT_DIR / ".cache" / "cola_encuestas.sqlite3"
+
+TAMANO_LOTE = 50
+INTERVALO_SEGUNDOS = 1.0        # espera entre envíos cuando no hay errores
+BACKOFF_MAXIMO_SEGUNDOS = 60.0
+DIAS_CONSERVAR_GUARDADAS = 7    # las guardadas se conservan como bitácora
+MAX_INTENTOS = 8                # fallos antes de apartar una encuesta como 'error'
+REINTENTO_APARTADAS_SEGUNDOS = 600.0  # espera entre reintentos de las apartadas
+
+
+class ColaEncuestas:
+    """Bitácora SQLite de encuestas pendientes de guardar en Supabase"""
+
+    def __init__(self, ruta=None, tamano_lote=TAMANO_LOTE):
+        self.ruta = Path(ruta or RUTA_PREDETERMINADA)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.tamano_lote = tamano_lote
+
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._hilo = None
+        self._guardar_lote = None
+        self.lotes = 0
+        self.guardadas = 0
+        self.errores = 0
+        self.ultimo_error = None
+        self._revisar_apartadas_en = 0.0    # time.monotonic() del siguiente reintento de las apartadas
+
+        with self._conexion() as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS encuestas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT NOT NULL,
+                    nombre_completo TEXT NOT NULL,
+                    respuestas TEXT NOT NULL,
+                    preguntas TEXT NOT NULL,
+                    momento REAL NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'pendiente',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    guardada_en REAL
+                )
+            """)
+            conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_encuestas_estado ON encuestas(estado, id)"
+            )
+            conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_encuestas_email ON encuestas(email, estado)"
+            )
+
+    @contextmanager
+    def _conexion(self):
+        """Conexión de una sola operación, con commit al salir (sqlite3 no comparte conexiones entre hilos)"""
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def encolar(self, email, nombre_completo, respuestas, preguntas_dict):
+        """
+        Guarda una encuesta en la bitácora local; vuelve en cuanto está en disco
+
+        Args:
+            email (str): Email del participante
+            nombre_completo (str): Nombre completo del participante
+            respuestas (dict): Diccionario {pregunta_id: respuesta}
+            preguntas_dict (dict): Diccionario {pregunta_id: texto_pregunta}
+
+        Returns:
+            int: Id de la encuesta en la cola
+        """
+        preguntas = {pid: preguntas_dict.get(pid, f"Pregunta {pid}") for pid in respuestas}
+        with self._lock, self._conexion() as conexion:
+            cursor = conexion.execute(
+                "INSERT INTO encuestas (email, nombre_completo, respuestas, preguntas, momento) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    email.strip().lower(),
+                    nombre_completo,
+                    json.dumps({str(k): str(v) for k, v in respuestas.items()}, ensure_ascii=False),
+                    json.dumps({str(k): v for k, v in preguntas.items()}, ensure_ascii=False),
+                    time.time(),
+                )
+            )
+            id_encuesta = cursor.lastrowid
+        self._hay_trabajo.set()
+        return id_encuesta
+
+    def pendiente(self, email):
+        """Indica si el participante tiene una encuesta en la cola (pendiente o apartada) que aún no llega a Supabase"""
+        with self._conexion() as conexion:
+            fila = conexion.execute(
+                "SELECT 1 FROM encuestas WHERE email = ? AND estado IN ('pendiente', 'error') LIMIT 1",
+                (email.strip().lower(),)
+            ).fetchone()
+        return fila is not None
+
+    def _pendientes(self, estado='pendiente'):
+        # Primero las nuevas; las que ya fallaron, de menos a más intentos
+        with self._conexion() as conexion:
+            filas = conexion.execute(
+                "SELECT id, email, nombre_completo, respuestas, preguntas, momento, intentos FROM encuestas "
+                "WHERE estado = ? ORDER BY intentos, id LIMIT ?",
+                (estado, self.tamano_lote)
+            ).fetchall()
+        return [
+            {
+                'id': id_encuesta,
+                'email': email,
+                'nombre_completo': nombre_completo,
+                'respuestas': {int(k): v for k, v in json.loads(respuestas).items()},
+                'preguntas': {int(k): v for k, v in json.loads(preguntas).items()},
+                'momento': momento,
+                'intentos': intentos,
+            }
+            for id_encuesta, email, nombre_completo, respuestas, preguntas, momento, intentos in filas
+        ]
+
+    def _marcar_fallo(self, encuestas, error, apartar=False):
+        """Suma un intento a las encuestas; con apartar=True las que llegan a MAX_INTENTOS pasan a 'error'"""
+        ids = [encuesta['id'] for encuesta in encuestas]
+        marcas = ','.join('?' * len(ids))
+        with self._lock, self._conexion() as conexion:
+            conexion.execute(
+                f"UPDATE encuestas SET intentos = intentos + 1, ultimo_error = ? WHERE id IN ({marcas})",
+                [str(error)[:500], *ids]
+            )
+            apartadas = []
+            if apartar:
+                apartadas = conexion.execute(
+                    f"SELECT id, email FROM encuestas "
+                    f"WHERE estado = 'pendiente' AND intentos >= ? AND id IN ({marcas})",
+                    [MAX_INTENTOS, *ids]
+                ).fetchall()
+                conexion.executemany(
+                    "UPDATE encuestas SET estado = 'error' WHERE id = ?", [(id_encuesta,) for id_encuesta, _ in apartadas]
+                )
+            self.errores += 1
+            self.ultimo_error = str(error)
+        for id_encuesta, email in apartadas:
+            print(f"⚠️ Encuesta {id_encuesta} de {email} apartada en 'error' tras {MAX_INTENTOS} intentos "
+                  f"(se reintentará cada {REINTENTO_APARTADAS_SEGUNDOS:.0f} s): {error}")
+
+    def _marcar_guardadas(self, encuestas):
+        ids = [encuesta['id'] for encuesta in encuestas]
+        marcas = ','.join('?' * len(ids))
+        with self._lock, self._conexion() as conexion:
+            conexion.execute(
+                f"UPDATE encuestas SET estado = 'guardada', guardada_en = ? WHERE id IN ({marcas})",
+                [time.time(), *ids]
+            )
+            conexion.execute(
+                "DELETE FROM encuestas WHERE estado = 'guardada' AND guardada_en < ?",
+                (time.time() - DIAS_CONSERVAR_GUARDADAS * 86400,)
+            )
+            self.lotes += 1
+            self.guardadas += len(ids)
+
+    def enviar_pendientes(self):
+        """
+        Envía a Supabase un lote de encuestas pendientes
+
+        Las nuevas van juntas en un lote; las que ya fallaron se envían una
+        por una, para que una encuesta que siempre falla no arrastre a las
+        demás. Si una encuesta vuelve a fallar mientras otras sí se guardan,
+        el problema es de esa encuesta: al llegar a MAX_INTENTOS se aparta
+        en el estado 'error'. Si todo falla (Supabase caído) no se aparta
+        ninguna.
+
+        Returns:
+            int: Encuestas enviadas (0 si no había pendientes)
+
+        Raises:
+            Exception: Si no se pudo guardar ninguna; siguen pendientes
+        """
+        lote = self._pendientes()
+        if not lote:
+            return 0
+
+        nuevas = [encuesta for encuesta in lote if not encuesta['intentos']]
+        reintentos = [encuesta for encuesta in lote if encuesta['intentos']]
+        enviadas = 0
+        ultimo_error = None
+
+        if nuevas:
+            try:
+                self._guardar_lote(nuevas)
+            except Exception as e:
+                self._marcar_fallo(nuevas, e)
+                raise
+            self._marcar_guardadas(nuevas)
+            enviadas += len(nuevas)
+
+        for encuesta in reintentos:
+            try:
+                self._guardar_lote([encuesta])
+            except Exception as e:
+                ultimo_error = e
+                self._marcar_fallo([encuesta], e, apartar=enviadas > 0)
+                if not enviadas:
+                    # Sin ningún guardado no se sabe si el problema es la encuesta o
+                    # Supabase: no seguir hasta el siguiente intento con backoff
+                    break
+                continue
+            self._marcar_guardadas([encuesta])
+            enviadas += 1
+
+        if not enviadas and ultimo_error is not None:
+            raise ultimo_error
+        return enviadas
+
+    def reintentar_apartadas(self):
+        """
+        Vuelve a enviar, una por una, las encuestas apartadas en 'error'
+
+        Las que se guardan salen de la cola; las demás siguen apartadas y se
+        avisa en el log cuántas quedan.
+
+        Returns:
+            int: Encuestas guardadas
+        """
+        guardadas = 0
+        for encuesta in self._pendientes('error'):
+            try:
+                self._guardar_lote([encuesta])
+            except Exception as e:
+                self._marcar_fallo([encuesta], e)
+                continue
+            self._marcar_guardadas([encuesta])
+            guardadas += 1
+            print(f"✅ Encuesta apartada {encuesta['id']} de {encuesta['email']} guardada "
+                  f"tras {encuesta['intentos']} intentos")
+
+        con_error = self.estadisticas()['con_error']
+        if con_error:
+            print(f"⚠️ {con_error} encuesta(s) siguen apartadas en 'error' en {self.ruta} "
+                  f"(último error: {self.ultimo_error})")
+        return guardadas
+
+    def iniciar(self, guardar_lote):
+        """
+        Inicia el hilo que envía las encuestas pendientes (una sola vez)
+
+        Args:
+            guardar_lote (callable): Recibe la lista de encuestas y las guarda,
+                                     normalmente SupabaseHandler.guardar_encuestas_lote
+        """
+        with self._lock:
+            if self._hilo is not None:
+                return
+            self._guardar_lote = guardar_lote
+            self._hilo = threading.Thread(target=self._ciclo, name="cola-encuestas", daemon=True)
+            self._hilo.start()
+
+    def _ciclo(self):
+        fallos_seguidos = 0
+        while True:
+            try:
+                enviadas = self.enviar_pendientes()
+                fallos_seguidos = 0
+            except Exception as e:
+                print(f"Error al enviar encuestas pendientes: {e}")
+                fallos_seguidos += 1
+                enviadas = 0
+
+            if not fallos_seguidos and time.monotonic() >= self._revisar_apartadas_en:
+                # Solo con Supabase respondiendo; también recoge las de ejecuciones anteriores
+                self._revisar_apartadas_en = time.monotonic() + REINTENTO_APARTADAS_SEGUNDOS
+                try:
+                    self.reintentar_apartadas()
+                except Exception as e:
+                    print(f"Error al reintentar encuestas apartadas: {e}")
+
+            if enviadas >= self.tamano_lote:
+                # Quedan más pendientes: seguir sin esperar
+                continue
+
+            if fallos_seguidos:
+                # Backoff exponencial con jitter, sin perder las encuestas nuevas
+                espera = random.uniform(0, min(BACKOFF_MAXIMO_SEGUNDOS, INTERVALO_SEGUNDOS * 2 ** fallos_seguidos))
+                time.sleep(espera)
+            else:
+                # Esperar una encuesta nueva (o revisar de vez en cuando)
+                self._hay_trabajo.wait(timeout=30)
+                self._hay_trabajo.clear()
+                # Juntar las que lleguen en el siguiente instante en el mismo lote
+                time.sleep(INTERVALO_SEGUNDOS)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Encuestas pendientes, apartadas por error, lotes y encuestas
+                  enviados, errores y último error
+        """
+        with self._conexion() as conexion:
+            pendientes, reintentando, con_error = conexion.execute(
+                "SELECT COALESCE(SUM(estado = 'pendiente'), 0), "
+                "COALESCE(SUM(estado = 'pendiente' AND intentos > 0), 0), "
+                "COALESCE(SUM(estado = 'error'), 0) FROM encuestas WHERE estado != 'guardada'"
+            ).fetchone()
+        with self._lock:
+            return {
+                'pendientes': pendientes,
+                'reintentando': reintentando,
+                'con_error': con_error,
+                'lotes': self.lotes,
+                'guardadas': self.guardadas,
+                'errores': self.errores,
+                'ultimo_error': self.ultimo_error,
+            }
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola():
+    """
+    Devuelve la cola de encuestas del proceso del servidor
+
+    El archivo se configura con la variable de entorno CONSTANCIAS_COLA_ENCUESTAS
+    """
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaEncuestas(os.getenv("CONSTANCIAS_COLA_ENCUESTAS") or RUTA_PREDETERMINADA)
+        return _cola
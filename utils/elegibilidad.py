@@ -0,0 +1,272 @@
+"""
+Reglas de elegibilidad para constancias
+Compartidas por la página de constancias y la generación masiva
+"""
+
+import re
+
+import pandas as pd
+
+PLANTILLA_GENERAL = 'Participacion_general.pdf'
+PLANTILLA_MUNDIALITO = 'Constancia_mundialito.pdf'
+
+# Prefijo del archivo descargado por tipo de constancia
+PREFIJOS_ARCHIVO = {
+    'general': 'Constancia_JII2025',
+    'workshop': 'Constancia_Workshop_JII2025',
+    'mundialito': 'Constancia_Mundialito_JII2025',
+}
+
+COLUMNAS_EMAIL_EQUIPO = [
+    'email_capitan',
+    'email_miembro_1',
+    'email_miembro_2',
+    'email_miembro_3',
+    'email_miembro_4',
+    'email_miembro_5',
+]
+
+
+def verificar_elegibilidad(email, participantes, asistencias, equipos):
+    """Verifica si el participante es elegible para constancias"""
+    # Buscar participante en la vista (que ya incluye total_asistencias)
+    participante = participantes[participantes['email'].str.lower() == email.lower()]
+
+    if participante.empty:
+        return None, "❌ No se encontró tu correo electrónico en la base de datos."
+
+    participante = participante.iloc[0]
+
+    # Obtener número de asistencias desde la columna total_asistencias de la vista
+    # La vista vista_participantes_completa calcula esto automáticamente
+    num_asistencias = int(participante.get('total_asistencias', 0))
+
+    # Verificar participación en workshops (códigos W1-W6)
+    asistencias_participante = asistencias[asistencias['participante_email'].str.lower() == email.lower()]
+    codigos_workshop = sorted({
+        codigo for codigo in asistencias_participante['actividad_codigo'].dropna()
+        if codigo.startswith('W')
+    })
+
+    # Verificar participación en mundialito - buscar email en captain o cualquiera de los 5 miembros
+    participo_mundialito = False
+    email_lower = email.lower()
+
+    # Verificar si el email aparece como capitán o miembro del equipo
+    if not equipos.empty:
+        participo_mundialito = any(
+            (equipos[columna].str.lower() == email_lower).any()
+            for columna in COLUMNAS_EMAIL_EQUIPO
+            if columna in equipos.columns
+        )
+
+    return _armar_elegibilidad(participante, num_asistencias, codigos_workshop, participo_mundialito), None
+
+
+def normalizar_email(email):
+    """Email en la forma en que se indexa: sin espacios alrededor y en minúsculas"""
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+class IndiceElegibilidad:
+    """
+    Índices hash sobre las tablas cargadas, construidos una sola vez por carga
+
+    - email -> fila del participante
+    - email -> resumen de asistencias (número, códigos de actividad y workshops)
+    - email -> equipos del concurso en los que aparece (capitán o miembro)
+
+    verificar() da el mismo resultado que verificar_elegibilidad, pero cada
+    consulta es un acceso a diccionario en lugar de recorrer las tablas.
+    """
+
+    def __init__(self, participantes, asistencias, equipos):
+        """
+        Args:
+            participantes (pd.DataFrame): Participantes (vista_participantes_completa)
+            asistencias (pd.DataFrame): Asistencias con participante_email y actividad_codigo
+            equipos (pd.DataFrame): Equipos del concurso
+        """
+        self.participantes = participantes
+
+        # Si un email se repite gana la primera fila, como en verificar_elegibilidad
+        self._filas = {}
+        for posicion, email in enumerate(participantes['email'].tolist()):
+            email = normalizar_email(email)
+            if email is not None:
+                self._filas.setdefault(email, posicion)
+
+        self._asistencias = {}
+        if not asistencias.empty:
+            for email, codigo, estado in zip(
+                asistencias['participante_email'].tolist(),
+                asistencias['actividad_codigo'].tolist(),
+                asistencias['estado'].tolist() if 'estado' in asistencias.columns else [None] * len(asistencias),
+            ):
+                email = normalizar_email(email)
+                if email is None:
+                    continue
+                resumen = self._asistencias.setdefault(
+                    email, {'total': 0, 'confirmadas': 0, 'codigos': set()}
+                )
+                resumen['total'] += 1
+                if estado == 'asistió':
+                    resumen['confirmadas'] += 1
+                if isinstance(codigo, str):
+                    resumen['codigos'].add(codigo)
+            for resumen in self._asistencias.values():
+                resumen['workshops'] = sorted(c for c in resumen['codigos'] if c.startswith('W'))
+
+        self._equipos = {}
+        if not equipos.empty:
+            for columna in COLUMNAS_EMAIL_EQUIPO:
+                if columna not in equipos.columns:
+                    continue
+                for posicion, email in enumerate(equipos[columna].tolist()):
+                    email = normalizar_email(email)
+                    if email:
+                        self._equipos.setdefault(email, set()).add(posicion)
+
+    def participante(self, email):
+        """Fila del participante (pd.Series) o None"""
+        posicion = self._filas.get(normalizar_email(email))
+        return None if posicion is None else self.participantes.iloc[posicion]
+
+    def asistencias(self, email):
+        """Resumen de asistencias: 'total', 'confirmadas', 'codigos' y 'workshops'"""
+        return self._asistencias.get(
+            normalizar_email(email), {'total': 0, 'confirmadas': 0, 'codigos': set(), 'workshops': []}
+        )
+
+    def equipos(self, email):
+        """Posiciones en la tabla de equipos de los equipos en los que aparece el email"""
+        return self._equipos.get(normalizar_email(email), set())
+
+    def verificar(self, email):
+        """
+        Verifica si el participante es elegible para constancias
+
+        Returns:
+            tuple: (elegibilidad, error) con el mismo formato que verificar_elegibilidad
+        """
+        participante = self.participante(email)
+        if participante is None:
+            return None, "❌ No se encontró tu correo electrónico en la base de datos."
+
+        # Número de asistencias desde la columna total_asistencias de la vista
+        num_asistencias = int(participante.get('total_asistencias', 0))
+
+        return _armar_elegibilidad(
+            participante, num_asistencias, self.asistencias(email)['workshops'], bool(self.equipos(email))
+        ), None
+
+
+def verificar_elegibilidad_puntual(datos):
+    """
+    Verifica la elegibilidad a partir de los datos de un solo participante
+
+    Aplica las mismas reglas que verificar_elegibilidad, pero sin las tablas
+    completas.
+
+    Args:
+        datos (dict): Resultado de SupabaseHandler.obtener_elegibilidad (o de
+                      la función SQL obtener_elegibilidad)
+
+    Returns:
+        tuple: (elegibilidad, error) con el mismo formato que verificar_elegibilidad
+    """
+    if not datos or datos.get('participante') is None:
+        return None, "❌ No se encontró tu correo electrónico en la base de datos."
+
+    num_asistencias = int(datos.get('total_asistencias') or 0)
+
+    # Misma forma que una fila de la vista vista_participantes_completa
+    participante = pd.Series({
+        **datos['participante'],
+        'total_asistencias': num_asistencias,
+        'asistencias_confirmadas': int(datos.get('asistencias_confirmadas') or 0),
+    })
+
+    codigos_workshop = sorted(datos.get('workshops') or [])
+
+    return _armar_elegibilidad(
+        participante, num_asistencias, codigos_workshop, bool(datos.get('en_equipo'))
+    ), None
+
+
+def _armar_elegibilidad(participante, num_asistencias, codigos_workshop, participo_mundialito):
+    """Diccionario de elegibilidad común a la verificación con tablas completas y la puntual"""
+    # Obtener encuesta_completada directamente de la vista
+    # La vista ya incluye este campo de la tabla participantes
+    encuesta_completada = participante.get('encuesta_completada', False)
+
+    return {
+        'participante': participante,
+        'num_asistencias': num_asistencias,
+        'participo_workshop': len(codigos_workshop) > 0,
+        'workshops': codigos_workshop,
+        'workshop_numero': numero_workshop(codigos_workshop),
+        'participo_mundialito': participo_mundialito,
+        'elegible_general': num_asistencias >= 2,
+        'encuesta_completada': encuesta_completada
+    }
+
+
+def numero_workshop(codigos_workshop):
+    """
+    Obtiene el número del primer workshop asistido (W1-W6)
+
+    Args:
+        codigos_workshop (list): Códigos de actividad que empiezan con 'W'
+
+    Returns:
+        str: Número del workshop, '1' si no se puede determinar
+    """
+    for codigo in codigos_workshop:
+        match = re.match(r'^W(\d+)$', codigo)
+        if match:
+            return match.group(1)
+    return '1'
+
+
+def constancias_disponibles(elegibilidad):
+    """
+    Lista las constancias a las que tiene derecho un participante
+
+    Args:
+        elegibilidad (dict): Resultado de verificar_elegibilidad
+
+    Returns:
+        list: Diccionarios con 'tipo', 'nombre' y 'plantilla', en el formato
+              que espera PDFGenerator.generate_multiple_constancias
+    """
+    constancias = []
+
+    if elegibilidad['elegible_general']:
+        constancias.append({
+            'tipo': 'general',
+            'nombre': 'Constancia de Participación General',
+            'plantilla': PLANTILLA_GENERAL
+        })
+
+    if elegibilidad['participo_workshop']:
+        constancias.append({
+            'tipo': 'workshop',
+            'nombre': 'Constancia de Workshop',
+            'plantilla': f"W{elegibilidad['workshop_numero']}.pdf"
+        })
+
+    if elegibilidad['participo_mundialito']:
+        constancias.append({
+            'tipo': 'mundialito',
+            'nombre': 'Constancia de Mundialito Mexicano',
+            'plantilla': PLANTILLA_MUNDIALITO
+        })
+
+    return constancias
+
+
+def nombre_archivo_constancia(tipo, nombre_completo):
+    """Nombre del PDF descargado, igual al de los botones de la página de constancias"""
+    nombre = nombre_completo.replace(' ', '_').replace('/', '_')
+    return f"{PREFIJOS_ARCHIVO.get(tipo, f'Constancia_{tipo}')}_{nombre}.pdf"
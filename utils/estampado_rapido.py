@@ -0,0 +1,357 @@
+"""
+Motor rápido de estampado de nombres sobre plantillas PDF
+En lugar de crear un overlay con reportlab, volver a parsearlo y fusionarlo con
+PyPDF2, cada plantilla se pre-serializa una sola vez con la fuente ya embebida
+y un stream de contenido "hueco" al final de la página. Cada constancia es la
+plantilla pre-serializada más una actualización incremental que solo redefine
+ese stream con el texto del nombre.
+
+La fuente se embebe con codificación cp1252 (un byte por caracter): un nombre
+con caracteres fuera de ella (p. ej. Ł o Ż) no se puede estampar así y
+estampar_nombre lanza TextoNoCodificable para que se use el motor pypdf2.
+"""
+
+import io
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+    NumberObject,
+)
+from reportlab.pdfbase.ttfonts import TTFont, makeToUnicodeCMap
+
+# Nombre del recurso de fuente dentro de la página y prefijo del subset embebido
+NOMBRE_RECURSO_FUENTE = '/FJII'
+PREFIJO_SUBSET = 'JIIAAA'
+
+_CARACTERES_ESCAPE = {ord('('): b'\\(', ord(')'): b'\\)', ord('\\'): b'\\\\'}
+
+
+class TextoNoCodificable(ValueError):
+    """El texto tiene caracteres que no están en el subset cp1252 de la fuente"""
+
+
+class FuenteEmbebible:
+    """Subset de una fuente TrueType con codificación cp1252, listo para embeber"""
+
+    def __init__(self, ruta_ttf):
+        # TTFont solo se usa para leer la fuente; no se registra en pdfmetrics
+        face = TTFont('_estampado_rapido', str(ruta_ttf)).face
+        self.face = face
+
+        # subset[codigo] = punto Unicode; los códigos sin glifo apuntan a .notdef (0)
+        subset = [0] * 256
+        for codigo in range(32, 256):
+            try:
+                unicode = ord(bytes([codigo]).decode('cp1252'))
+            except UnicodeDecodeError:
+                continue
+            if unicode in face.charToGlyph:
+                subset[codigo] = unicode
+        self.subset = subset
+
+        self.nombre_base = f"{PREFIJO_SUBSET}+{face.name.decode('latin-1')}"
+        self._lock = threading.Lock()
+        self.anchos = [face.getCharWidth(u) if u else 0 for u in subset]
+        self.datos_ttf = face.makeSubset(subset)
+
+        # Caracter -> código, para codificar el texto sin pasar por reportlab
+        self.codigos = {chr(u): codigo for codigo, u in enumerate(subset) if u}
+        self.codigos.setdefault(' ', 32)
+
+    def codificar(self, texto):
+        """
+        Convierte el texto a códigos del subset
+
+        Raises:
+            TextoNoCodificable: Si algún caracter no está en el subset cp1252
+        """
+        faltantes = sorted({c for c in texto if c not in self.codigos})
+        if faltantes:
+            raise TextoNoCodificable(
+                f"Caracteres sin código en la fuente embebida: {''.join(faltantes)!r}"
+            )
+        return bytes(self.codigos[c] for c in texto)
+
+    def ancho_texto(self, codigos, tamano):
+        """Ancho en puntos de un texto ya codificado"""
+        return sum(self.anchos[c] for c in codigos) * tamano / 1000
+
+    def programa_para(self, codigos):
+        """
+        Programa TrueType con solo los glifos de los códigos dados
+
+        Los demás códigos apuntan a .notdef, así que la codificación, los anchos
+        y el ToUnicode de la fuente completa siguen siendo válidos.
+
+        Returns:
+            bytes: Programa TTF sin comprimir
+        """
+        subset = [0] * 256
+        for codigo in set(codigos):
+            subset[codigo] = self.subset[codigo]
+        # makeSubset de reportlab no es seguro entre hilos
+        with self._lock:
+            return self.face.makeSubset(subset)
+
+    def agregar_objetos(self, writer, datos_ttf=None):
+        """
+        Agrega al PdfWriter los objetos de la fuente (programa, descriptor, ToUnicode)
+
+        Args:
+            writer (PdfWriter): Escritor destino
+            datos_ttf (bytes, optional): Programa a embeber; por defecto el subset cp1252 completo
+
+        Returns:
+            tuple: Referencias al diccionario /Font y al stream del programa (/FontFile2)
+        """
+        datos_ttf = self.datos_ttf if datos_ttf is None else datos_ttf
+        programa = DecodedStreamObject()
+        programa.set_data(datos_ttf)
+        programa = programa.flate_encode()
+        programa[NameObject('/Length1')] = NumberObject(len(datos_ttf))
+        ref_programa = writer._add_object(programa)
+
+        face = self.face
+        descriptor = DictionaryObject({
+            NameObject('/Type'): NameObject('/FontDescriptor'),
+            NameObject('/FontName'): NameObject('/' + self.nombre_base),
+            NameObject('/Flags'): NumberObject(4),  # Simbólica: usa los códigos del subset tal cual
+            NameObject('/FontBBox'): ArrayObject([NumberObject(v) for v in face.bbox]),
+            NameObject('/ItalicAngle'): FloatObject(face.italicAngle),
+            NameObject('/Ascent'): NumberObject(face.ascent),
+            NameObject('/Descent'): NumberObject(face.descent),
+            NameObject('/CapHeight'): NumberObject(face.capHeight),
+            NameObject('/StemV'): NumberObject(face.stemV),
+            NameObject('/FontFile2'): ref_programa,
+        })
+        ref_descriptor = writer._add_object(descriptor)
+
+        to_unicode = DecodedStreamObject()
+        to_unicode.set_data(makeToUnicodeCMap(self.nombre_base, self.subset).encode('latin-1'))
+        ref_to_unicode = writer._add_object(to_unicode.flate_encode())
+
+        fuente = DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/TrueType'),
+            NameObject('/BaseFont'): NameObject('/' + self.nombre_base),
+            NameObject('/FirstChar'): NumberObject(0),
+            NameObject('/LastChar'): NumberObject(255),
+            NameObject('/Widths'): ArrayObject([NumberObject(a) for a in self.anchos]),
+            NameObject('/FontDescriptor'): ref_descriptor,
+            NameObject('/ToUnicode'): ref_to_unicode,
+        })
+        return writer._add_object(fuente), ref_programa
+
+
+class PlantillaPreparada:
+    """
+    Plantilla pre-serializada con la fuente embebida y un stream "hueco"
+
+    La página queda con /Contents = [q, contenido original..., hueco]. El hueco
+    contiene solo "Q" en la base; cada constancia lo redefine en una
+    actualización incremental con "Q q BT ... ET Q".
+
+    Con subconjunto=True la base lleva un programa de fuente vacío (solo
+    .notdef) y cada constancia lo redefine también, con los glifos de su nombre.
+    """
+
+    def __init__(self, plantilla, fuente, subconjunto=False):
+        self.fuente = fuente
+        self.subconjunto = subconjunto
+        self.ancho = plantilla.ancho
+        self.alto = plantilla.alto
+
+        writer = plantilla.crear_escritor()
+        pagina = writer.pages[0]
+
+        # Registrar la fuente en los recursos de la página
+        ref_fuente, ref_programa = fuente.agregar_objetos(
+            writer, fuente.programa_para([]) if subconjunto else None
+        )
+        self.num_programa = ref_programa.idnum
+        recursos = pagina.get('/Resources')
+        recursos = recursos.get_object() if recursos is not None else DictionaryObject()
+        fuentes = recursos.get('/Font')
+        fuentes = fuentes.get_object() if fuentes is not None else DictionaryObject()
+        fuentes[NameObject(NOMBRE_RECURSO_FUENTE)] = ref_fuente
+        recursos[NameObject('/Font')] = fuentes
+        pagina[NameObject('/Resources')] = recursos
+
+        # Aislar el estado gráfico del contenido original y agregar el hueco
+        guardar_estado = DecodedStreamObject()
+        guardar_estado.set_data(b'q\n')
+        hueco = DecodedStreamObject()
+        hueco.set_data(b'Q\n')
+
+        contenidos = pagina.raw_get('/Contents')
+        if not isinstance(contenidos.get_object(), ArrayObject):
+            contenidos = ArrayObject([contenidos])
+        else:
+            contenidos = ArrayObject(contenidos.get_object())
+
+        ref_hueco = writer._add_object(hueco)
+        self.num_hueco = ref_hueco.idnum
+        pagina[NameObject('/Contents')] = ArrayObject(
+            [writer._add_object(guardar_estado)] + list(contenidos) + [ref_hueco]
+        )
+
+        salida = io.BytesIO()
+        writer.write(salida)
+        base = salida.getvalue()
+        if not base.endswith(b'\n'):
+            base += b'\n'
+        self.base = base
+
+        self._leer_trailer()
+
+    def _leer_trailer(self):
+        """Obtiene de la base lo necesario para encadenar la actualización incremental"""
+        reader = PdfReader(io.BytesIO(self.base))
+        trailer = reader.trailer
+
+        self.size = int(trailer['/Size'])
+        entradas = [f"/Size {self.size}", f"/Root {trailer.raw_get('/Root').idnum} 0 R"]
+        if '/Info' in trailer:
+            entradas.append(f"/Info {trailer.raw_get('/Info').idnum} 0 R")
+        if '/ID' in trailer:
+            ids = ' '.join(f"<{bytes(i.original_bytes).hex()}>" for i in trailer['/ID'])
+            entradas.append(f"/ID [{ids}]")
+
+        startxref = re.findall(rb'startxref\s+(\d+)', self.base)[-1]
+        entradas.append(f"/Prev {int(startxref)}")
+        self.trailer = ("<< " + ' '.join(entradas) + " >>").encode('latin-1')
+
+    def estampar(self, nombre, tamano, color, posicion_y, pagina=None):
+        """
+        Genera la constancia agregando una actualización incremental a la base
+
+        Args:
+            nombre (str): Texto a imprimir, centrado horizontalmente
+            tamano (float): Tamaño de la fuente en puntos
+            color (tuple): Color RGB en escala 0-1
+            posicion_y (float): Fracción de la altura de la página para la línea base
+            pagina (tuple, optional): (ancho, alto) para posicionar el texto; por
+                                      defecto las dimensiones de la plantilla
+
+        Returns:
+            bytes: PDF completo
+        """
+        ancho, alto = pagina or (self.ancho, self.alto)
+        codigos = self.fuente.codificar(nombre)
+        x = (ancho - self.fuente.ancho_texto(codigos, tamano)) / 2
+        y = alto * posicion_y
+        texto = b''.join(_CARACTERES_ESCAPE.get(c) or bytes([c]) for c in codigos)
+
+        contenido = b''.join([
+            b'Q q BT ',
+            f"{NOMBRE_RECURSO_FUENTE} {tamano:g} Tf ".encode('latin-1'),
+            f"{color[0]:.4f} {color[1]:.4f} {color[2]:.4f} rg ".encode('latin-1'),
+            f"{x:.2f} {y:.2f} Td (".encode('latin-1'),
+            texto,
+            b') Tj ET Q\n',
+        ])
+
+        objetos = {self.num_hueco: (b"<< /Length %d >>" % len(contenido), contenido)}
+        if self.subconjunto:
+            datos_ttf = self.fuente.programa_para(codigos)
+            programa = zlib.compress(datos_ttf)
+            objetos[self.num_programa] = (
+                b"<< /Filter /FlateDecode /Length %d /Length1 %d >>" % (len(programa), len(datos_ttf)),
+                programa
+            )
+
+        # Objetos redefinidos, cada uno con su propia subsección en la tabla xref
+        partes = []
+        xref = [b'xref\n']
+        offset = len(self.base)
+        for num in sorted(objetos):
+            diccionario, datos = objetos[num]
+            objeto = b''.join([
+                f"{num} 0 obj\n".encode('latin-1'), diccionario, b"\nstream\n",
+                datos, b'\nendstream\nendobj\n',
+            ])
+            xref.append(f"{num} 1\n{offset:010d} 00000 n \n".encode('latin-1'))
+            partes.append(objeto)
+            offset += len(objeto)
+
+        actualizacion = b''.join(partes + xref + [
+            b'trailer\n', self.trailer,
+            f"\nstartxref\n{offset}\n%%EOF\n".encode('latin-1'),
+        ])
+        return self.base + actualizacion
+
+
+# Plantillas preparadas por (hash de plantilla, fuente); son pocas y pesan lo que la plantilla
+_preparadas = OrderedDict()
+_fuentes = {}
+_lock = threading.Lock()
+MAX_PREPARADAS = 16
+
+
+def obtener_fuente(ruta_ttf):
+    """Devuelve el subset embebible de una fuente, creado una sola vez por proceso"""
+    clave = str(ruta_ttf)
+    with _lock:
+        fuente = _fuentes.get(clave)
+        if fuente is None:
+            fuente = _fuentes[clave] = FuenteEmbebible(ruta_ttf)
+        return fuente
+
+
+def obtener_preparada(plantilla, ruta_ttf, subconjunto=False):
+    """
+    Devuelve la plantilla pre-serializada para una plantilla del registro y una fuente
+
+    Args:
+        plantilla (PlantillaCargada): Plantilla obtenida con utils.plantillas.obtener_plantilla
+        ruta_ttf (str | Path): Archivo TrueType de la fuente del nombre
+        subconjunto (bool): Embeber en cada constancia solo los glifos del nombre
+    """
+    clave = (plantilla.sha256, str(ruta_ttf), subconjunto)
+    with _lock:
+        preparada = _preparadas.get(clave)
+        if preparada is not None:
+            _preparadas.move_to_end(clave)
+            return preparada
+
+    fuente = obtener_fuente(ruta_ttf)
+    preparada = PlantillaPreparada(plantilla, fuente, subconjunto)
+
+    with _lock:
+        _preparadas[clave] = preparada
+        while len(_preparadas) > MAX_PREPARADAS:
+            _preparadas.popitem(last=False)
+    return preparada
+
+
+def estampar_nombre(plantilla, ruta_ttf, nombre, tamano, color, posicion_y, pagina=None, subconjunto=False):
+    """
+    Genera una constancia con el motor rápido
+
+    Args:
+        plantilla (PlantillaCargada): Plantilla del registro
+        ruta_ttf (str | Path): Archivo TrueType de la fuente del nombre
+        nombre (str): Texto a imprimir
+        tamano (float): Tamaño de la fuente en puntos
+        color (tuple): Color RGB en escala 0-1
+        posicion_y (float): Fracción de la altura de la página para la línea base
+        pagina (tuple, optional): (ancho, alto) para posicionar el texto
+        subconjunto (bool): Embeber solo los glifos del nombre (PDF más chico, ~0.5 ms más)
+
+    Returns:
+        bytes: PDF completo
+
+    Raises:
+        TextoNoCodificable: Si el nombre tiene caracteres fuera del subset cp1252
+    """
+    preparada = obtener_preparada(plantilla, ruta_ttf, subconjunto)
+    return preparada.estampar(nombre, tamano, color, posicion_y, pagina)
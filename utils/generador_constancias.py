@@ -0,0 +1,204 @@
+"""
+Renderizado de las constancias de la página de constancias
+Fuera de la página para poder usarlo sin Streamlit (generación masiva,
+benchmarks, pre-renderizado en segundo plano)
+"""
+
+import io
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from utils.assets import obtener_assets, FUENTE_NOMBRE
+from utils.cache_constancias import obtener_cache, clave_constancia
+from utils.elegibilidad import PLANTILLA_GENERAL, PLANTILLA_MUNDIALITO
+from utils.estampado_rapido import estampar_nombre, TextoNoCodificable
+from utils.pdf_generator import MOTOR_PREDETERMINADO, validar_motor
+from utils.optimizacion_pdf import (
+    OPTIMIZACION_PREDETERMINADA,
+    comprimir_streams,
+    finalizar_pdf,
+    obtener_plantilla_optimizada,
+    resolver_optimizacion,
+)
+from utils.plantillas import obtener_plantilla, fusionar_overlay
+
+
+def generar_constancia(participante, tipo_constancia, assets=None, motor=None, usar_cache=True,
+                       optimizacion=None, plantilla=None):
+    """
+    Genera una constancia en PDF con el estilo de la página de constancias
+    
+    Args:
+        participante: Fila (o diccionario) con 'nombre_completo'
+        tipo_constancia (str): 'general', 'workshop' o 'mundialito'
+        assets (RegistroAssets, optional): Registro de assets; por defecto el de assets/
+        motor (str, optional): Motor de renderizado, de MOTORES; por defecto MOTOR_PREDETERMINADO
+        usar_cache (bool): Leer y guardar en el cache de constancias renderizadas
+        optimizacion (str | dict, optional): Nivel de optimización; por defecto OPTIMIZACION_PREDETERMINADA
+        plantilla (str, optional): Archivo de plantilla, el 'plantilla' de constancias_disponibles
+                                   (la del workshop depende del workshop asistido); si no se da,
+                                   la del tipo de constancia
+    
+    Returns:
+        io.BytesIO: Buffer con el PDF, posicionado al inicio
+    """
+    assets = assets or obtener_assets()
+    motor = validar_motor(motor or MOTOR_PREDETERMINADO)
+    optimizacion = resolver_optimizacion(
+        OPTIMIZACION_PREDETERMINADA if optimizacion is None else optimizacion
+    )
+    buffer = io.BytesIO()
+    
+    # Determinar qué plantilla usar
+    archivo_plantilla = plantilla
+    if archivo_plantilla is None:
+        plantillas_map = {
+            'general': PLANTILLA_GENERAL,
+            'workshop': f'W{participante.get("workshop_numero", "1")}.pdf',
+            'mundialito': PLANTILLA_MUNDIALITO
+        }
+        archivo_plantilla = plantillas_map.get(tipo_constancia, PLANTILLA_GENERAL)
+    
+    plantilla_path = assets.plantillas_dir / archivo_plantilla
+    
+    if plantilla_path.exists():
+        # Usar plantilla existente (parseada y optimizada una sola vez por proceso)
+        plantilla = obtener_plantilla_optimizada(obtener_plantilla(plantilla_path), optimizacion)
+        
+        # Obtener dimensiones de la página de la plantilla
+        page_width = plantilla.ancho
+        page_height = plantilla.alto
+        
+        # Configurar fuente con tamaño más grande
+        font_size = 32
+        font_name = FUENTE_NOMBRE
+        if motor != 'rapido' and not assets.fuente_disponible(font_name):
+            font_name = "Helvetica-Bold"
+        
+        # Configurar color del texto: rgba(4, 68, 153) -> RGB en escala 0-1
+        color = (4/255, 68/255, 153/255)
+        
+        # Usar el nombre completo en MAYÚSCULAS para homogeneidad
+        nombre_completo = participante['nombre_completo'].upper()
+        
+        # La salida depende solo de estas entradas: si ya existe, leerla del cache
+        cache = obtener_cache() if usar_cache else None
+        clave = clave_constancia(
+            plantilla.sha256,
+            nombre_completo,
+            {'fuente': font_name, 'tamano': font_size, 'color': color, 'posicion_y': 1 / 1.80},
+            motor,
+            optimizacion
+        )
+        pdf_cacheado = cache.obtener(clave) if cache is not None else None
+        if pdf_cacheado is not None:
+            return io.BytesIO(pdf_cacheado)
+        
+        pdf_rapido = None
+        if motor == 'rapido':
+            # Motor rápido: actualización incremental sobre la plantilla pre-serializada
+            try:
+                pdf_rapido = estampar_nombre(
+                    plantilla, assets.ruta_fuente(FUENTE_NOMBRE),
+                    nombre_completo, font_size, color, 1 / 1.80,
+                    subconjunto=bool(optimizacion and optimizacion.get('subconjunto_fuente'))
+                )
+            except TextoNoCodificable:
+                # Nombre con caracteres fuera de cp1252: se estampa con reportlab
+                if not assets.fuente_disponible(font_name):
+                    font_name = "Helvetica-Bold"
+        
+        if pdf_rapido is not None:
+            buffer.write(pdf_rapido)
+        else:
+            pdf_writer = plantilla.crear_escritor()
+        
+            # Crear overlay con el nombre usando las dimensiones correctas de la plantilla
+            packet = io.BytesIO()
+            can = canvas.Canvas(packet, pagesize=(page_width, page_height))
+            can.setFont(font_name, font_size)
+            can.setFillColorRGB(*color)
+        
+            # Centrar el texto horizontalmente usando drawCentredString
+            # La posición X será el centro de la página automáticamente
+            x_center = page_width / 2
+        
+            # Posición vertical: aproximadamente en el centro vertical de la plantilla
+            # Para una plantilla horizontal de ~612pt de alto, el centro está alrededor de 306pt
+            y = page_height / 1.80
+        
+            # Usar drawCentredString para centrado automático
+            can.drawCentredString(x_center, y, nombre_completo)
+            can.save()
+        
+            # Combinar
+            packet.seek(0)
+            overlay_pdf = PdfReader(packet)
+            fusionar_overlay(pdf_writer, overlay_pdf.pages[0])
+        
+            # PyPDF2 deja el contenido fusionado sin comprimir
+            if optimizacion and optimizacion.get('comprimir'):
+                comprimir_streams(pdf_writer)
+        
+            # Guardar en buffer
+            pdf_writer.write(buffer)
+        
+        if optimizacion and optimizacion.get('linealizar'):
+            buffer = io.BytesIO(finalizar_pdf(buffer.getvalue(), optimizacion))
+        
+        # Guardar en el cache
+        if cache is not None:
+            cache.guardar(clave, buffer.getvalue())
+    else:
+        # Crear constancia desde cero
+        can = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        
+        # Título
+        can.setFont("Helvetica-Bold", 28)
+        can.drawCentredString(width/2, height - 100, "CONSTANCIA")
+        
+        # Subtítulo
+        can.setFont("Helvetica", 16)
+        can.drawCentredString(width/2, height - 150, "Jornada de Ingeniería Industrial 2025")
+        
+        # Cuerpo
+        can.setFont("Helvetica", 14)
+        can.drawCentredString(width/2, height - 250, "Se otorga la presente constancia a:")
+        
+        # Nombre con tamaño más grande
+        font_size = 32
+        try:
+            can.setFont("OldStandardTT-Bold", font_size)
+        except:
+            can.setFont("Helvetica-Bold", font_size)
+        
+        # Usar el nombre completo en MAYÚSCULAS para homogeneidad
+        nombre_completo = participante['nombre_completo'].upper()
+        
+        can.drawCentredString(width/2, height - 300, nombre_completo)
+        
+        # Descripción según tipo
+        can.setFont("Helvetica", 12)
+        if tipo_constancia == 'general':
+            texto = "Por su destacada participación en la Jornada de Ingeniería Industrial 2025"
+        elif tipo_constancia == 'workshop':
+            texto = f"Por su participación en el Workshop de la Jornada de Ingeniería Industrial 2025"
+        else:
+            texto = "Por su participación en el Mundialito Mexicano - JII 2025"
+        
+        can.drawCentredString(width/2, height - 380, texto)
+        
+        # Fecha
+        can.drawCentredString(width/2, height - 450, "Cancún, Quintana Roo - Octubre 2025")
+        
+        # Footer
+        can.setFont("Helvetica", 10)
+        can.drawCentredString(width/2, 50, "Universidad del Caribe")
+        
+        can.save()
+
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,370 @@
+"""
+Optimización del tamaño de los PDF de constancias
+Las plantillas se optimizan una sola vez por proceso (objetos duplicados,
+streams sin comprimir, imágenes con más resolución de la que se puede
+imprimir); a cada constancia solo se le comprime lo que se le agregó y,
+opcionalmente, se linealiza para vista web rápida (requiere pikepdf).
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+from utils.plantillas import PlantillaCargada
+
+# pikepdf (qpdf) es opcional: solo se usa para linealizar
+try:
+    import pikepdf
+    PIKEPDF_AVAILABLE = True
+except ImportError:
+    PIKEPDF_AVAILABLE = False
+
+# Pillow llega como dependencia de reportlab; sin él no se re-muestrean imágenes
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Niveles de optimización
+# 'deduplicar': un solo objeto por stream idéntico (p. ej. imágenes compartidas entre plantillas)
+# 'comprimir': FlateDecode para todo stream sin filtro (el contenido fusionado por PyPDF2 sale sin comprimir)
+# 'subconjunto_fuente': el motor rápido embebe solo los glifos del nombre
+# 'dpi_imagenes': resolución máxima de las imágenes de la plantilla (None para no tocarlas)
+# 'linealizar': PDF linealizado ("fast web view"), requiere pikepdf
+OPTIMIZACIONES = {
+    'ninguna': None,
+    'sin_perdida': {
+        'deduplicar': True,
+        'comprimir': True,
+        'subconjunto_fuente': True,
+        'dpi_imagenes': None,
+        'linealizar': False,
+    },
+    'web': {
+        'deduplicar': True,
+        'comprimir': True,
+        'subconjunto_fuente': True,
+        'dpi_imagenes': 200,
+        'linealizar': True,
+    },
+}
+OPTIMIZACION_PREDETERMINADA = os.getenv("CONSTANCIAS_OPTIMIZACION", "sin_perdida")
+
+# Calidad JPEG al re-muestrear imágenes que ya venían en JPEG
+CALIDAD_JPEG = 85
+
+# Componentes por espacio de color para las imágenes que se pueden re-muestrear
+_MODOS_PIL = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+
+
+def resolver_optimizacion(optimizacion):
+    """
+    Convierte un nivel de optimización (nombre o diccionario) en el diccionario de opciones
+
+    Returns:
+        dict: Opciones, o None si no se optimiza
+    """
+    if optimizacion is None or isinstance(optimizacion, dict):
+        return optimizacion
+    if optimizacion not in OPTIMIZACIONES:
+        raise ValueError(
+            f"Optimización no válida: {optimizacion}. Opciones: {', '.join(OPTIMIZACIONES)}"
+        )
+    return OPTIMIZACIONES[optimizacion]
+
+
+def _reemplazar_stream(writer, idnum, original, datos, **entradas):
+    """Sustituye un stream del escritor conservando su diccionario"""
+    nuevo = EncodedStreamObject()
+    for clave, valor in original.items():
+        if clave not in ('/Length', '/Filter', '/DecodeParms'):
+            nuevo[clave] = valor
+    for clave, valor in entradas.items():
+        nuevo[NameObject('/' + clave)] = valor
+    nuevo._data = datos
+    writer._objects[idnum - 1] = nuevo
+    return nuevo
+
+
+def comprimir_streams(writer):
+    """
+    Comprime con FlateDecode los streams del escritor que no tienen filtro
+
+    Returns:
+        int: Bytes ahorrados
+    """
+    ahorro = 0
+    for i, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject) or '/Filter' in obj:
+            continue
+        datos = obj._data
+        comprimido = zlib.compress(datos, 6)
+        if len(comprimido) >= len(datos):
+            continue
+        _reemplazar_stream(writer, i + 1, obj, comprimido, Filter=NameObject('/FlateDecode'))
+        ahorro += len(datos) - len(comprimido)
+    return ahorro
+
+
+def _huella_stream(obj):
+    """Identifica un stream por su diccionario (sin /Length) y sus bytes"""
+    entradas = sorted((str(k), repr(v)) for k, v in obj.items() if k != '/Length')
+    return hashlib.sha256(repr(entradas).encode('utf-8') + obj._data).digest()
+
+
+def _redirigir(obj, destinos):
+    """Cambia en el árbol de un objeto las referencias a duplicados por la referencia canónica"""
+    if isinstance(obj, DictionaryObject):
+        for clave, valor in list(obj.items()):
+            if isinstance(valor, IndirectObject) and valor.idnum in destinos:
+                obj[clave] = IndirectObject(destinos[valor.idnum], 0, valor.pdf)
+            else:
+                _redirigir(valor, destinos)
+    elif isinstance(obj, ArrayObject):
+        for i, valor in enumerate(obj):
+            if isinstance(valor, IndirectObject) and valor.idnum in destinos:
+                obj[i] = IndirectObject(destinos[valor.idnum], 0, valor.pdf)
+            else:
+                _redirigir(valor, destinos)
+
+
+def deduplicar_streams(writer):
+    """
+    Deja un solo objeto por cada stream idéntico del escritor
+
+    Los duplicados quedan como null y todas las referencias apuntan al primero.
+    Es lo que más reduce un paquete de varias constancias, cuyas plantillas
+    comparten casi todas sus imágenes. Se repite hasta que no hay cambios,
+    porque dos imágenes solo son idénticas una vez que sus perfiles ICC y
+    máscaras ya apuntan al mismo objeto.
+
+    Returns:
+        int: Bytes ahorrados
+    """
+    ahorro = 0
+    while True:
+        canonicos = {}
+        destinos = {}
+        for i, obj in enumerate(writer._objects):
+            if not isinstance(obj, StreamObject):
+                continue
+            huella = _huella_stream(obj)
+            if huella in canonicos:
+                destinos[i + 1] = canonicos[huella]
+                ahorro += len(obj._data)
+            else:
+                canonicos[huella] = i + 1
+
+        if not destinos:
+            return ahorro
+
+        for obj in writer._objects:
+            _redirigir(obj, destinos)
+        for idnum in destinos:
+            writer._objects[idnum - 1] = NullObject()
+
+
+def _componentes(espacio_color):
+    """Número de componentes de un espacio de color, o None si no se sabe re-muestrear"""
+    espacio_color = espacio_color.get_object() if espacio_color is not None else None
+    if espacio_color == '/DeviceGray':
+        return 1
+    if espacio_color == '/DeviceRGB':
+        return 3
+    if espacio_color == '/DeviceCMYK':
+        return 4
+    if isinstance(espacio_color, ArrayObject) and espacio_color and espacio_color[0] == '/ICCBased':
+        return int(espacio_color[1].get_object().get('/N', 0)) or None
+    return None
+
+
+def remuestrear_imagenes(writer, dpi):
+    """
+    Reduce las imágenes que tienen más resolución de la necesaria para imprimir a `dpi`
+
+    Una imagen no se muestra más grande que la página, así que su lado mayor
+    se limita al lado mayor de la página a esa resolución. Las imágenes JPEG se
+    vuelven a codificar en JPEG; las demás se mantienen sin pérdida (Flate).
+    Las máscaras (/SMask) se reducen con la misma escala que su imagen.
+
+    Returns:
+        int: Bytes ahorrados
+    """
+    if not PIL_AVAILABLE:
+        return 0
+
+    lado_pagina = max(
+        max(float(p.mediabox.width), float(p.mediabox.height)) for p in writer.pages
+    )
+    limite = int(lado_pagina / 72 * dpi)
+
+    # Escala de cada imagen; las máscaras usan la de su imagen
+    escalas = {}
+    for i, obj in enumerate(writer._objects):
+        if isinstance(obj, StreamObject) and obj.get('/Subtype') == '/Image':
+            lado = max(int(obj['/Width']), int(obj['/Height']))
+            if lado > limite:
+                escalas[i + 1] = limite / lado
+    for idnum, escala in list(escalas.items()):
+        smask = writer._objects[idnum - 1].get('/SMask')
+        if isinstance(smask, IndirectObject):
+            escalas[smask.idnum] = escala
+
+    ahorro = 0
+    for idnum, escala in escalas.items():
+        obj = writer._objects[idnum - 1]
+        filtro = obj.get('/Filter')
+        if int(obj.get('/BitsPerComponent', 0)) != 8 or '/DecodeParms' in obj or '/Decode' in obj:
+            continue
+        if filtro not in ('/FlateDecode', '/DCTDecode'):
+            continue
+        componentes = _componentes(obj.get('/ColorSpace'))
+        if componentes not in _MODOS_PIL or (filtro == '/DCTDecode' and componentes == 4):
+            # Los JPEG CMYK suelen venir invertidos (Adobe); no vale la pena el riesgo
+            continue
+
+        ancho, alto = int(obj['/Width']), int(obj['/Height'])
+        nuevo_ancho, nuevo_alto = max(1, round(ancho * escala)), max(1, round(alto * escala))
+
+        try:
+            if filtro == '/DCTDecode':
+                imagen = Image.open(io.BytesIO(obj._data))
+                imagen.draft(imagen.mode, (nuevo_ancho, nuevo_alto))
+            else:
+                imagen = Image.frombytes(_MODOS_PIL[componentes], (ancho, alto), obj.get_data())
+            imagen = imagen.resize((nuevo_ancho, nuevo_alto), Image.LANCZOS)
+
+            if filtro == '/DCTDecode':
+                salida = io.BytesIO()
+                imagen.save(salida, format='JPEG', quality=CALIDAD_JPEG, optimize=True)
+                datos = salida.getvalue()
+            else:
+                datos = zlib.compress(imagen.tobytes(), 9)
+        except Exception:
+            # Imagen que Pillow no interpreta como se espera: se deja intacta
+            continue
+
+        if len(datos) >= len(obj._data):
+            continue
+        ahorro += len(obj._data) - len(datos)
+        _reemplazar_stream(
+            writer, idnum, obj, datos,
+            Filter=NameObject(filtro), Width=NumberObject(nuevo_ancho), Height=NumberObject(nuevo_alto)
+        )
+    return ahorro
+
+
+def optimizar_escritor(writer, opciones):
+    """
+    Aplica al escritor las optimizaciones que no dependen del nombre
+
+    Args:
+        writer (PdfWriter): Escritor a optimizar en su lugar
+        opciones (dict): Opciones de OPTIMIZACIONES
+
+    Returns:
+        dict: Bytes ahorrados por cada paso
+    """
+    ahorro = {}
+    if opciones.get('dpi_imagenes'):
+        ahorro['imagenes'] = remuestrear_imagenes(writer, opciones['dpi_imagenes'])
+    if opciones.get('deduplicar'):
+        ahorro['duplicados'] = deduplicar_streams(writer)
+    if opciones.get('comprimir'):
+        ahorro['compresion'] = comprimir_streams(writer)
+    return ahorro
+
+
+def linealizar(pdf_bytes):
+    """
+    Reescribe un PDF linealizado ("fast web view") con flujos de objetos
+
+    Sin pikepdf devuelve el PDF tal cual.
+    """
+    if not PIKEPDF_AVAILABLE:
+        return pdf_bytes
+    salida = io.BytesIO()
+    with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+        pdf.save(
+            salida,
+            linearize=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            compress_streams=True,
+        )
+    return salida.getvalue()
+
+
+def finalizar_pdf(pdf_bytes, opciones):
+    """Último paso de optimización de cada constancia ya renderizada"""
+    if opciones and opciones.get('linealizar'):
+        return linealizar(pdf_bytes)
+    return pdf_bytes
+
+
+# Plantillas optimizadas por (hash de la plantilla, opciones)
+_optimizadas = OrderedDict()
+_lock = threading.Lock()
+MAX_OPTIMIZADAS = 16
+
+
+def obtener_plantilla_optimizada(plantilla, opciones):
+    """
+    Devuelve la versión optimizada de una plantilla, calculada una sola vez por proceso
+
+    La plantilla optimizada tiene su propio sha256, así que las constancias
+    generadas con ella tienen su propia clave en el cache.
+
+    Args:
+        plantilla (PlantillaCargada): Plantilla del registro de plantillas
+        opciones (dict): Opciones de OPTIMIZACIONES, o None para usar la original
+
+    Returns:
+        PlantillaCargada: Plantilla optimizada
+    """
+    if not opciones:
+        return plantilla
+
+    # Solo estas opciones cambian la plantilla; el resto se aplica por constancia
+    relevantes = {k: opciones.get(k) for k in ('deduplicar', 'comprimir', 'dpi_imagenes')}
+    clave = (plantilla.sha256, json.dumps(relevantes, sort_keys=True))
+    with _lock:
+        optimizada = _optimizadas.get(clave)
+        if optimizada is not None:
+            _optimizadas.move_to_end(clave)
+            return optimizada
+
+    writer = plantilla.crear_escritor()
+    optimizar_escritor(writer, relevantes)
+    salida = io.BytesIO()
+    writer.write(salida)
+    datos = salida.getvalue()
+
+    optimizada = PlantillaCargada(
+        plantilla.ruta,
+        PdfReader(io.BytesIO(datos)),
+        plantilla.stat_key,
+        hashlib.sha256(datos).hexdigest()
+    )
+
+    with _lock:
+        _optimizadas[clave] = optimizada
+        while len(_optimizadas) > MAX_OPTIMIZADAS:
+            _optimizadas.popitem(last=False)
+    return optimizada
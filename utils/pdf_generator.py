@@ -1,36 +1,93 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from PyPDF2 import PdfReader, PdfWriter
 from pathlib import Path
 import io
+import os
+import zipfile
+
+from utils.plantillas import fusionar_overlay
+from utils.cache_constancias import obtener_cache, clave_constancia, etag
+from utils.estampado_rapido import estampar_nombre, TextoNoCodificable
+from utils.assets import obtener_assets
+from utils.optimizacion_pdf import (
+    OPTIMIZACION_PREDETERMINADA,
+    comprimir_streams,
+    finalizar_pdf,
+    obtener_plantilla_optimizada,
+    optimizar_escritor,
+    resolver_optimizacion,
+)
+from utils.elegibilidad import nombre_archivo_constancia
+
+# Estilos del nombre sobre la plantilla
+# 'posicion_y' es la fracción de la altura de la página donde va la línea base;
+# 'pagina' None usa las dimensiones de la propia plantilla
+ESTILO_PREDETERMINADO = {
+    'fuente': 'OldStandard-Bold',
+    'tamano': 24,
+    'color': (0, 0, 0),  # Negro
+    'posicion_y': 1 / 2,
+    'mayusculas': False,
+    'pagina': letter,
+}
+
+# Mismo estilo que la página de constancias: rgba(4, 68, 153) y nombre en MAYÚSCULAS
+ESTILO_JII = {
+    'fuente': 'OldStandard-Bold',
+    'tamano': 32,
+    'color': (4/255, 68/255, 153/255),
+    'posicion_y': 1 / 1.80,
+    'mayusculas': True,
+    'pagina': None,
+}
+
+# Motores de renderizado:
+# 'pypdf2' crea un overlay con reportlab y lo fusiona con PyPDF2
+# 'rapido' agrega una actualización incremental a la plantilla pre-serializada
+MOTORES = ('pypdf2', 'rapido')
+MOTOR_PREDETERMINADO = os.getenv("CONSTANCIAS_MOTOR", "pypdf2")
+
+
+def validar_motor(motor):
+    """
+    Devuelve el motor si es uno de MOTORES
+
+    Raises:
+        ValueError: Si el motor no existe
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de renderizado no válido: {motor}. Opciones: {', '.join(MOTORES)}")
+    return motor
+
 
 class PDFGenerator:
-    def __init__(self, assets_dir):
+    def __init__(self, assets_dir, usar_cache=True, motor=None, optimizacion=None):
         self.assets_dir = Path(assets_dir)
         self.fonts_dir = self.assets_dir / "fonts"
         self.plantillas_dir = self.assets_dir / "plantillas"
         
+        self.motor = validar_motor(motor or MOTOR_PREDETERMINADO)
+        
+        # Nivel de optimización de la salida ('ninguna', 'sin_perdida', 'web' o un diccionario)
+        self.optimizacion = resolver_optimizacion(
+            OPTIMIZACION_PREDETERMINADA if optimizacion is None else optimizacion
+        )
+        
+        # Cache en disco de constancias ya renderizadas (compartido por el proceso)
+        self.cache = obtener_cache() if usar_cache else None
+        
         # Registrar fuentes
         self.register_fonts()
     
     def register_fonts(self):
-        """Registra las fuentes personalizadas"""
-        try:
-            pdfmetrics.registerFont(
-                TTFont('OldStandard-Bold', str(self.fonts_dir / 'OldStandardTT-Bold.ttf'))
-            )
-            pdfmetrics.registerFont(
-                TTFont('OldStandard-Regular', str(self.fonts_dir / 'OldStandardTT-Regular.ttf'))
-            )
-            pdfmetrics.registerFont(
-                TTFont('OldStandard-Italic', str(self.fonts_dir / 'OldStandardTT-Italic.ttf'))
-            )
-        except Exception as e:
-            print(f"Advertencia: No se pudieron cargar las fuentes personalizadas: {e}")
+        """Registra las fuentes personalizadas (una sola vez por proceso, vía el registro de assets)"""
+        self.assets = obtener_assets(self.assets_dir)
+        errores = self.assets.estadisticas()['errores']
+        if errores:
+            print(f"Advertencia: No se pudieron cargar las fuentes personalizadas: {errores}")
     
-    def generate_constancia(self, plantilla_nombre, nombre_completo, output_path=None):
+    def generate_constancia(self, plantilla_nombre, nombre_completo, output_path=None, estilo=None):
         """
         Genera una constancia personalizada
         
@@ -38,38 +95,85 @@ class PDFGenerator:
             plantilla_nombre: Nombre del archivo de plantilla (ej: 'Participacion_general.pdf')
             nombre_completo: Nombre completo del participante
             output_path: Ruta donde guardar el PDF (opcional)
+            estilo: Diccionario de estilo del nombre (opcional, ESTILO_PREDETERMINADO por defecto)
         
         Returns:
             bytes del PDF generado
         """
-        plantilla_path = self.plantillas_dir / plantilla_nombre
+        # Obtener la plantilla del registro del proceso (ya optimizada, si aplica)
+        plantilla = self._plantilla(plantilla_nombre)
         
-        if not plantilla_path.exists():
-            raise FileNotFoundError(f"Plantilla no encontrada: {plantilla_path}")
+        estilo = estilo or ESTILO_PREDETERMINADO
+        if estilo['mayusculas']:
+            nombre_completo = nombre_completo.upper()
         
-        # Leer la plantilla
-        reader = PdfReader(str(plantilla_path))
-        writer = PdfWriter()
+        # Si ya se renderizó esta misma constancia, servirla desde el cache
+        clave = None
+        if self.cache is not None:
+            clave = clave_constancia(plantilla.sha256, nombre_completo, estilo, self.motor, self.optimizacion)
+            pdf_cacheado = self.cache.obtener(clave)
+            if pdf_cacheado is not None:
+                if output_path:
+                    with open(output_path, 'wb') as f:
+                        f.write(pdf_cacheado)
+                return pdf_cacheado
+        
+        pdf_bytes = None
+        if self.motor == 'rapido':
+            try:
+                pdf_bytes = estampar_nombre(
+                    plantilla,
+                    self.assets.ruta_fuente(estilo['fuente']),
+                    nombre_completo,
+                    estilo['tamano'],
+                    estilo['color'],
+                    estilo['posicion_y'],
+                    pagina=estilo['pagina'],
+                    subconjunto=bool(self.optimizacion and self.optimizacion.get('subconjunto_fuente'))
+                )
+            except TextoNoCodificable:
+                # Nombre con caracteres fuera de cp1252: reportlab sí los embebe
+                pdf_bytes = None
+        if pdf_bytes is None:
+            pdf_bytes = self._generate_pypdf2(plantilla, nombre_completo, estilo).getvalue()
+        
+        pdf_bytes = finalizar_pdf(pdf_bytes, self.optimizacion)
+        
+        if clave is not None:
+            self.cache.guardar(clave, pdf_bytes)
+        
+        # Si se especificó una ruta, guardar también ahí
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(pdf_bytes)
+        
+        return pdf_bytes
+    
+    def _plantilla(self, plantilla_nombre):
+        """Plantilla del registro, optimizada una sola vez por proceso según self.optimizacion"""
+        return obtener_plantilla_optimizada(self.assets.plantilla(plantilla_nombre), self.optimizacion)
+    
+    def _generate_pypdf2(self, plantilla, nombre_completo, estilo):
+        """Estampa el nombre con un overlay de reportlab fusionado con PyPDF2"""
+        # Copia de la plantilla para esta solicitud
+        writer = plantilla.crear_escritor()
         
         # Crear un PDF temporal con el nombre
+        # Las dimensiones salen del estilo o, si no las define, de la plantilla
+        page_width, page_height = estilo['pagina'] or (plantilla.ancho, plantilla.alto)
         packet = io.BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
-        
-        # Configurar el texto del nombre
-        # Ajusta estas coordenadas según tu plantilla
-        page_width, page_height = letter
+        can = canvas.Canvas(packet, pagesize=(page_width, page_height))
         
         # Configuración para el nombre
-        can.setFont('OldStandard-Bold', 24)
-        can.setFillColorRGB(0, 0, 0)  # Negro
+        can.setFont(estilo['fuente'], estilo['tamano'])
+        can.setFillColorRGB(*estilo['color'])
         
         # Calcular el centro de la página
-        text_width = can.stringWidth(nombre_completo, 'OldStandard-Bold', 24)
+        text_width = can.stringWidth(nombre_completo, estilo['fuente'], estilo['tamano'])
         x_position = (page_width - text_width) / 2
         
-        # Posición Y (ajusta según tu plantilla)
-        # Esta es una posición aproximada, ajústala según tu diseño
-        y_position = page_height / 2  # Centro vertical
+        # Posición Y como fracción de la altura de la página
+        y_position = page_height * estilo['posicion_y']
         
         can.drawString(x_position, y_position, nombre_completo)
         can.save()
@@ -80,57 +184,176 @@ class PDFGenerator:
         # Leer el PDF temporal
         overlay = PdfReader(packet)
         
-        # Combinar con la plantilla
-        page = reader.pages[0]
-        page.merge_page(overlay.pages[0])
-        writer.add_page(page)
+        # Combinar con la primera página (las demás páginas ya están en el escritor)
+        fusionar_overlay(writer, overlay.pages[0])
         
-        # Si hay más páginas en la plantilla, agregarlas
-        for i in range(1, len(reader.pages)):
-            writer.add_page(reader.pages[i])
+        # PyPDF2 deja el contenido fusionado sin comprimir
+        if self.optimizacion and self.optimizacion.get('comprimir'):
+            comprimir_streams(writer)
         
         # Escribir el resultado
         output_stream = io.BytesIO()
         writer.write(output_stream)
         output_stream.seek(0)
         
-        # Si se especificó una ruta, guardar también ahí
-        if output_path:
-            with open(output_path, 'wb') as f:
-                f.write(output_stream.getvalue())
-            output_stream.seek(0)
+        return output_stream
+    
+    def get_etag(self, plantilla_nombre, nombre_completo, estilo=None):
+        """
+        Calcula el ETag de una constancia sin renderizarla
         
-        return output_stream.getvalue()
+        Es el mismo hash con el que se guarda en el cache, así que dos
+        constancias con el mismo ETag tienen exactamente el mismo contenido.
+        """
+        plantilla = self._plantilla(plantilla_nombre)
+        estilo = estilo or ESTILO_PREDETERMINADO
+        if estilo['mayusculas']:
+            nombre_completo = nombre_completo.upper()
+        return etag(clave_constancia(plantilla.sha256, nombre_completo, estilo, self.motor, self.optimizacion))
     
-    def generate_multiple_constancias(self, constancias_info, nombre_completo):
+    def iterar_constancias(self, constancias_info, nombre_completo, estilo=None):
+        """
+        Genera las constancias de un participante una por una
+        
+        Solo hay un PDF en memoria a la vez, lo que permite escribirlos
+        directamente a un ZIP o a disco sin acumularlos.
+        
+        Yields:
+            tuple: (constancia, bytes del PDF o None si no se pudo generar)
+        """
+        for constancia in constancias_info:
+            try:
+                pdf_bytes = self.generate_constancia(
+                    constancia['plantilla'],
+                    nombre_completo,
+                    estilo=estilo
+                )
+            except Exception as e:
+                print(f"Error generando constancia {constancia['tipo']}: {e}")
+                pdf_bytes = None
+            yield constancia, pdf_bytes
+    
+    def generate_multiple_constancias(self, constancias_info, nombre_completo, estilo=None):
         """
         Genera múltiples constancias para un participante
         
         Args:
             constancias_info: Lista de diccionarios con info de constancias
             nombre_completo: Nombre completo del participante
+            estilo: Diccionario de estilo del nombre (opcional)
         
         Returns:
             Dict con bytes de cada constancia generada
         """
         resultados = {}
         
-        for constancia in constancias_info:
-            try:
-                pdf_bytes = self.generate_constancia(
-                    constancia['plantilla'],
-                    nombre_completo
-                )
-                resultados[constancia['tipo']] = {
-                    'bytes': pdf_bytes,
-                    'nombre': constancia['nombre'],
-                    'filename': f"Constancia_{constancia['tipo']}_{nombre_completo.replace(' ', '_')}.pdf"
-                }
-            except Exception as e:
-                print(f"Error generando constancia {constancia['tipo']}: {e}")
+        for constancia, pdf_bytes in self.iterar_constancias(constancias_info, nombre_completo, estilo):
+            if pdf_bytes is None:
                 resultados[constancia['tipo']] = None
+                continue
+            resultados[constancia['tipo']] = {
+                'bytes': pdf_bytes,
+                'nombre': constancia['nombre'],
+                'filename': f"Constancia_{constancia['tipo']}_{nombre_completo.replace(' ', '_')}.pdf"
+            }
         
         return resultados
+    
+    def generate_paquete_pdf(self, constancias_info, nombre_completo, estilo=None):
+        """
+        Genera un solo PDF con todas las constancias de un participante, una tras otra
+        
+        Los nombres de todas las páginas se dibujan en un único overlay de varias
+        páginas, así que la fuente se embebe una sola vez y la comparten todas.
+        
+        Args:
+            constancias_info: Lista de diccionarios con info de constancias
+            nombre_completo: Nombre completo del participante
+            estilo: Diccionario de estilo del nombre (opcional)
+        
+        Returns:
+            bytes del PDF combinado
+        """
+        if not constancias_info:
+            raise ValueError("No hay constancias para combinar")
+        
+        plantillas = [self._plantilla(c['plantilla']) for c in constancias_info]
+        
+        estilo = estilo or ESTILO_PREDETERMINADO
+        if estilo['mayusculas']:
+            nombre_completo = nombre_completo.upper()
+        
+        clave = None
+        if self.cache is not None:
+            clave = clave_constancia(
+                ','.join(p.sha256 for p in plantillas), nombre_completo, estilo, 'paquete', self.optimizacion
+            )
+            pdf_cacheado = self.cache.obtener(clave)
+            if pdf_cacheado is not None:
+                return pdf_cacheado
+        
+        # Overlay con una página por constancia
+        packet = io.BytesIO()
+        can = canvas.Canvas(packet)
+        can.setTitle(f"Constancias JII 2025 - {nombre_completo}")
+        for plantilla in plantillas:
+            page_width, page_height = estilo['pagina'] or (plantilla.ancho, plantilla.alto)
+            can.setPageSize((page_width, page_height))
+            can.setFont(estilo['fuente'], estilo['tamano'])
+            can.setFillColorRGB(*estilo['color'])
+            can.drawCentredString(page_width / 2, page_height * estilo['posicion_y'], nombre_completo)
+            can.showPage()
+        can.save()
+        packet.seek(0)
+        overlay = PdfReader(packet)
+        
+        # Copiar las plantillas al mismo escritor y fusionar cada página del overlay
+        writer = PdfWriter()
+        for i, plantilla in enumerate(plantillas):
+            indice = plantilla.agregar_a(writer)
+            fusionar_overlay(writer, overlay.pages[i], indice=indice)
+        
+        # Las plantillas comparten casi todas sus imágenes: deduplicar aquí es lo que más reduce el paquete
+        if self.optimizacion:
+            optimizar_escritor(writer, {
+                'deduplicar': self.optimizacion.get('deduplicar'),
+                'comprimir': self.optimizacion.get('comprimir'),
+            })
+        
+        output_stream = io.BytesIO()
+        writer.write(output_stream)
+        pdf_bytes = finalizar_pdf(output_stream.getvalue(), self.optimizacion)
+        
+        if clave is not None:
+            self.cache.guardar(clave, pdf_bytes)
+        
+        return pdf_bytes
+    
+    def generate_paquete_zip(self, constancias_info, nombre_completo, destino, estilo=None):
+        """
+        Escribe las constancias de un participante en un ZIP, entrada por entrada
+        
+        Cada PDF se agrega al ZIP en cuanto se genera y se descarta, de modo que
+        nunca están todos los buffers en memoria al mismo tiempo.
+        
+        Args:
+            constancias_info: Lista de diccionarios con info de constancias
+            nombre_completo: Nombre completo del participante
+            destino: Ruta o archivo binario (p. ej. un SpooledTemporaryFile) donde escribir el ZIP
+            estilo: Diccionario de estilo del nombre (opcional)
+        
+        Returns:
+            int: Número de constancias agregadas al ZIP
+        """
+        agregadas = 0
+        # Los PDF ya vienen comprimidos: ZIP_STORED evita recomprimirlos
+        with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as zip_file:
+            for constancia, pdf_bytes in self.iterar_constancias(constancias_info, nombre_completo, estilo):
+                if pdf_bytes is None:
+                    continue
+                zip_file.writestr(nombre_archivo_constancia(constancia['tipo'], nombre_completo), pdf_bytes)
+                agregadas += 1
+        return agregadas
 
 
 class SimplePDFGenerator:
@@ -143,12 +366,8 @@ class SimplePDFGenerator:
         self.fonts_dir = self.assets_dir / "fonts"
         self.plantillas_dir = self.assets_dir / "plantillas"
         
-        try:
-            pdfmetrics.registerFont(
-                TTFont('OldStandard-Bold', str(self.fonts_dir / 'OldStandardTT-Bold.ttf'))
-            )
-        except:
-            pass
+        # Registro de assets del proceso: las fuentes ya registradas no se vuelven a parsear
+        self.assets = obtener_assets(self.assets_dir)
     
     def generate_simple_constancia(self, plantilla_nombre, nombre_completo):
         """
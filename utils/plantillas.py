@@ -0,0 +1,196 @@
+"""
+Registro de plantillas PDF en memoria
+Cada plantilla de assets/plantillas se lee y se parsea una sola vez por proceso;
+las solicitudes reciben copias baratas de la página en un PdfWriter nuevo
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import IndirectObject, NameObject
+
+
+class PlantillaCargada:
+    """Plantilla parseada con sus dimensiones y recursos"""
+
+    def __init__(self, ruta, reader, stat_key, sha256):
+        self.ruta = Path(ruta)
+        self.reader = reader
+        self.pagina = reader.pages[0]
+        self.num_paginas = len(reader.pages)
+
+        media_box = self.pagina.mediabox
+        self.ancho = float(media_box.width)
+        self.alto = float(media_box.height)
+        self.recursos = self.pagina.get('/Resources')
+
+        self.stat_key = stat_key
+        self.sha256 = sha256
+
+        # PdfReader resuelve objetos de forma perezosa leyendo del stream,
+        # por lo que las copias se serializan con este lock
+        self.lock = threading.Lock()
+
+    def crear_escritor(self):
+        """
+        Crea un PdfWriter nuevo con una copia de las páginas de la plantilla
+
+        Returns:
+            PdfWriter: Escritor independiente; modificar sus páginas no altera la plantilla
+        """
+        writer = PdfWriter()
+        self.agregar_a(writer)
+        return writer
+
+    def agregar_a(self, writer):
+        """
+        Agrega una copia de las páginas de la plantilla al final de un escritor existente
+
+        Args:
+            writer (PdfWriter): Escritor destino (p. ej. un paquete de varias constancias)
+
+        Returns:
+            int: Índice en el escritor de la primera página agregada
+        """
+        indice = len(writer.pages)
+        with self.lock:
+            for page in self.reader.pages:
+                writer.add_page(page)
+        return indice
+
+
+def fusionar_overlay(writer, overlay_page, indice=0):
+    """
+    Fusiona una página overlay (p. ej. el nombre generado con reportlab) sobre una
+    página de un escritor creado con PlantillaCargada.crear_escritor
+
+    Args:
+        writer (PdfWriter): Escritor con la copia de la plantilla
+        overlay_page (PageObject): Página a fusionar, leída de otro PDF
+        indice (int): Página del escritor sobre la que se fusiona
+    """
+    # Los recursos del overlay deben pertenecer al escritor antes de fusionar;
+    # de lo contrario PyPDF2 los serializa con números de objeto equivocados.
+    # El contenido se copia en el stream fusionado, así que no hace falta clonarlo.
+    pagina = PageObject(writer)
+    pagina[NameObject('/Resources')] = overlay_page.raw_get('/Resources').clone(writer)
+    pagina[NameObject('/Contents')] = overlay_page.raw_get('/Contents')
+    pagina[NameObject('/MediaBox')] = overlay_page.mediabox
+    destino = writer.pages[indice]
+    destino.merge_page(pagina)
+
+    # merge_page deja el contenido fusionado como stream directo dentro de la
+    # página; los streams deben ser objetos indirectos para que el PDF sea válido
+    contenido = destino.raw_get('/Contents')
+    if not isinstance(contenido, IndirectObject):
+        destino[NameObject('/Contents')] = writer._add_object(contenido)
+
+
+class RegistroPlantillas:
+    """Cache LRU de plantillas parseadas, invalidada por mtime/tamaño y hash del archivo"""
+
+    def __init__(self, max_plantillas=16):
+        self.max_plantillas = max_plantillas
+        self._plantillas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def _stat_key(ruta):
+        stat = ruta.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _sha256(datos):
+        return hashlib.sha256(datos).hexdigest()
+
+    def obtener(self, ruta):
+        """
+        Obtiene una plantilla parseada, cargándola si no está en memoria o si cambió en disco
+
+        Args:
+            ruta (str | Path): Ruta al archivo PDF de la plantilla
+
+        Returns:
+            PlantillaCargada: Plantilla lista para copiar
+        """
+        ruta = Path(ruta).resolve()
+        if not ruta.exists():
+            raise FileNotFoundError(f"Plantilla no encontrada: {ruta}")
+
+        stat_key = self._stat_key(ruta)
+
+        with self._lock:
+            entrada = self._plantillas.get(ruta)
+            if entrada is not None and entrada.stat_key == stat_key:
+                self._plantillas.move_to_end(ruta)
+                self.aciertos += 1
+                return entrada
+
+        # Leer fuera del lock global para no bloquear otras plantillas
+        datos = ruta.read_bytes()
+        sha256 = self._sha256(datos)
+
+        with self._lock:
+            entrada = self._plantillas.get(ruta)
+            if entrada is not None and entrada.sha256 == sha256:
+                # Solo cambió el mtime (p. ej. se copió el archivo); el contenido es el mismo
+                entrada.stat_key = stat_key
+                self._plantillas.move_to_end(ruta)
+                self.aciertos += 1
+                return entrada
+
+            entrada = PlantillaCargada(ruta, PdfReader(io.BytesIO(datos)), stat_key, sha256)
+            self._plantillas[ruta] = entrada
+            self._plantillas.move_to_end(ruta)
+            self.fallos += 1
+
+            while len(self._plantillas) > self.max_plantillas:
+                self._plantillas.popitem(last=False)
+
+            return entrada
+
+    def invalidar(self, ruta=None):
+        """
+        Elimina una plantilla (o todas) del registro
+
+        Args:
+            ruta (str | Path, optional): Plantilla a invalidar. Si es None, se vacía el registro.
+        """
+        with self._lock:
+            if ruta is None:
+                self._plantillas.clear()
+            else:
+                self._plantillas.pop(Path(ruta).resolve(), None)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Plantillas cargadas, aciertos y fallos del registro
+        """
+        with self._lock:
+            return {
+                'plantillas': [p.name for p in self._plantillas],
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+# Registro compartido por todo el proceso (Streamlit reejecuta las páginas,
+# pero los módulos importados se conservan entre reruns y sesiones)
+_registro = RegistroPlantillas()
+
+
+def obtener_registro():
+    """Devuelve el registro de plantillas del proceso"""
+    return _registro
+
+
+def obtener_plantilla(ruta):
+    """Atajo para obtener una plantilla del registro del proceso"""
+    return _registro.obtener(ruta)
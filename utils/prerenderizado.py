@@ -0,0 +1,149 @@
+"""
+Pre-renderizado de constancias en segundo plano
+Al guardar la encuesta se programan las constancias del participante en un pool
+de hilos del proceso del servidor; mientras el usuario lee la confirmación se
+renderizan y quedan en memoria, de modo que la descarga es inmediata.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from utils.generador_constancias import generar_constancia
+
+WORKERS_PREDETERMINADOS = 2
+MAX_MB_PREDETERMINADO = 256
+
+
+def clave_participante(email, nombre_completo, tipo_constancia):
+    """Clave de una constancia pre-renderizada, la misma que usa la sesión de la página"""
+    return (str(email).lower(), nombre_completo, tipo_constancia)
+
+
+class PrerenderizadorConstancias:
+    """Pool de hilos que renderiza constancias y las guarda por participante"""
+
+    def __init__(self, workers=WORKERS_PREDETERMINADOS, max_bytes=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prerender")
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_MB_PREDETERMINADO * 1024 * 1024
+        self._lock = threading.Lock()
+        self._listas = OrderedDict()   # clave -> bytes del PDF
+        self._pendientes = {}          # clave -> Future
+        self._total_bytes = 0
+        self.programadas = 0
+        self.aciertos = 0
+        self.errores = 0
+
+    def programar(self, participante, constancias):
+        """
+        Programa el renderizado de las constancias de un participante
+
+        Args:
+            participante (dict): Datos del participante ('email', 'nombre_completo', ...)
+            constancias (list): Constancias a renderizar, como las devuelve
+                                constancias_disponibles ('tipo' y 'plantilla')
+        """
+        # Copia simple: el hilo no debe depender de la fila de pandas de la sesión
+        participante = dict(participante)
+        with self._lock:
+            for constancia in constancias:
+                tipo = constancia['tipo']
+                clave = clave_participante(participante['email'], participante['nombre_completo'], tipo)
+                if clave in self._listas or clave in self._pendientes:
+                    continue
+                futuro = self._executor.submit(self._renderizar, clave, participante, tipo, constancia['plantilla'])
+                self._pendientes[clave] = futuro
+                self.programadas += 1
+
+    def _renderizar(self, clave, participante, tipo, plantilla):
+        try:
+            pdf_bytes = generar_constancia(participante, tipo, plantilla=plantilla).getvalue()
+        except Exception as e:
+            print(f"Error pre-renderizando constancia {tipo} de {clave[0]}: {e}")
+            with self._lock:
+                self._pendientes.pop(clave, None)
+                self.errores += 1
+            return None
+
+        with self._lock:
+            self._pendientes.pop(clave, None)
+            self._listas[clave] = pdf_bytes
+            self._total_bytes += len(pdf_bytes)
+            # Desalojar las más antiguas si se excede el límite
+            while self._total_bytes > self.max_bytes and len(self._listas) > 1:
+                _, viejo = self._listas.popitem(last=False)
+                self._total_bytes -= len(viejo)
+        return pdf_bytes
+
+    def obtener(self, email, nombre_completo, tipo_constancia, espera=0):
+        """
+        Devuelve una constancia pre-renderizada
+
+        Args:
+            email (str): Correo del participante
+            nombre_completo (str): Nombre del participante
+            tipo_constancia (str): Tipo de constancia
+            espera (float): Segundos a esperar si todavía se está renderizando
+
+        Returns:
+            bytes: PDF, o None si no se programó, falló o no terminó a tiempo
+        """
+        clave = clave_participante(email, nombre_completo, tipo_constancia)
+        with self._lock:
+            pdf_bytes = self._listas.get(clave)
+            if pdf_bytes is not None:
+                self._listas.move_to_end(clave)
+                self.aciertos += 1
+                return pdf_bytes
+            futuro = self._pendientes.get(clave)
+
+        if futuro is None or espera <= 0:
+            return None
+
+        # Ya se está renderizando: esperar ese resultado en lugar de repetir el trabajo
+        try:
+            pdf_bytes = futuro.result(timeout=espera)
+        except TimeoutError:
+            return None
+        if pdf_bytes is not None:
+            with self._lock:
+                self.aciertos += 1
+        return pdf_bytes
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Constancias listas, pendientes, bytes en memoria y contadores
+        """
+        with self._lock:
+            return {
+                'listas': len(self._listas),
+                'pendientes': len(self._pendientes),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'programadas': self.programadas,
+                'aciertos': self.aciertos,
+                'errores': self.errores,
+            }
+
+
+_prerenderizador = None
+_prerenderizador_lock = threading.Lock()
+
+
+def obtener_prerenderizador():
+    """
+    Devuelve el pre-renderizador del proceso del servidor
+
+    El número de hilos y el límite de memoria se configuran con las variables
+    de entorno CONSTANCIAS_PRERENDER_WORKERS y CONSTANCIAS_PRERENDER_MB
+    """
+    global _prerenderizador
+    with _prerenderizador_lock:
+        if _prerenderizador is None:
+            _prerenderizador = PrerenderizadorConstancias(
+                workers=int(os.getenv("CONSTANCIAS_PRERENDER_WORKERS", WORKERS_PREDETERMINADOS)),
+                max_bytes=int(os.getenv("CONSTANCIAS_PRERENDER_MB", MAX_MB_PREDETERMINADO)) * 1024 * 1024
+            )
+        return _prerenderizador
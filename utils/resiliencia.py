@@ -0,0 +1,297 @@
+"""
+Capa de resiliencia para las llamadas a Supabase
+Cada operación del SupabaseHandler pasa por aquí: tiene un tiempo límite, las
+lecturas se reintentan con backoff exponencial con jitter y un circuit breaker
+compartido por el proceso deja de llamar al backend mientras está fallando, de
+modo que las sesiones fallan rápido (y la página sirve su último snapshot) en
+lugar de quedarse bloqueadas.
+
+El tiempo límite también corta la petición HTTP: cada intento publica su
+fecha límite en el hilo que lo ejecuta (tiempo_restante) y el transporte
+del cliente de Supabase la usa como timeout de la petición, así que un
+intento abandonado no sigue ocupando un hilo.
+"""
+
+import functools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Segundos máximos por operación, según su tipo
+TIMEOUTS = {
+    'lectura': float(os.getenv("SUPABASE_TIMEOUT_LECTURA", 10)),
+    'escritura': float(os.getenv("SUPABASE_TIMEOUT_ESCRITURA", 15)),
+}
+
+INTENTOS_LECTURA = int(os.getenv("SUPABASE_INTENTOS", 3))
+BACKOFF_BASE = 0.2      # segundos antes del primer reintento
+BACKOFF_MAXIMO = 2.0    # tope del backoff
+
+UMBRAL_FALLOS = int(os.getenv("SUPABASE_UMBRAL_FALLOS", 5))
+ESPERA_REAPERTURA = float(os.getenv("SUPABASE_ESPERA_CIRCUITO", 30))
+
+# Operaciones simultáneas admitidas; las demás esperan turno (a lo más su
+# tiempo límite) y, si no entran, fallan sin contar como falla del backend
+MAX_LLAMADAS = int(os.getenv("SUPABASE_MAX_LLAMADAS", 16))
+
+# Fecha límite (time.monotonic) del intento que ejecuta cada hilo
+_limite = threading.local()
+
+
+class CircuitoAbierto(Exception):
+    """El circuito está abierto: no se llamó a Supabase"""
+
+
+class SinCapacidad(Exception):
+    """Hubo MAX_LLAMADAS operaciones en curso durante todo el tiempo límite: no se llamó a Supabase"""
+
+
+def tiempo_maximo(tipo='lectura', timeouts=None, intentos=INTENTOS_LECTURA):
+    """
+    Segundos que puede tardar una operación con todos sus reintentos
+
+    Args:
+        tipo (str): 'lectura' o 'escritura'
+        timeouts (dict, optional): Segundos por tipo; por defecto TIMEOUTS
+        intentos (int): Intentos de las lecturas
+
+    Returns:
+        float: Intentos por tiempo límite más el backoff máximo entre ellos
+    """
+    intentos = intentos if tipo == 'lectura' else 1
+    return intentos * {**TIMEOUTS, **(timeouts or {})}[tipo] + (intentos - 1) * BACKOFF_MAXIMO
+
+
+def tiempo_restante():
+    """
+    Segundos que le quedan al intento que se ejecuta en este hilo
+
+    Returns:
+        float: Segundos (0 si ya venció), o None si el hilo no ejecuta una
+               operación con tiempo límite
+    """
+    limite = getattr(_limite, 'valor', None)
+    if limite is None:
+        return None
+    return max(limite - time.monotonic(), 0.0)
+
+
+def falta_en_base(error):
+    """Indica si un error de PostgREST se debe a una función, tabla o vista que no existe"""
+    mensaje = str(error).lower()
+    codigos = ('pgrst202', 'pgrst205', '42883', '42p01')
+    return any(codigo in mensaje for codigo in codigos) or 'could not find the' in mensaje or (
+        ('function' in mensaje or 'relation' in mensaje)
+        and ('not found' in mensaje or 'does not exist' in mensaje)
+    )
+
+
+class Circuito:
+    """
+    Circuit breaker de tres estados
+
+    cerrado: las llamadas pasan; tras umbral_fallos fallos seguidos se abre.
+    abierto: las llamadas fallan de inmediato durante espera_reapertura segundos.
+    medio_abierto: pasa una sola llamada de prueba; si funciona se cierra y si
+    falla se vuelve a abrir.
+    """
+
+    def __init__(self, umbral_fallos=UMBRAL_FALLOS, espera_reapertura=ESPERA_REAPERTURA):
+        self.umbral_fallos = umbral_fallos
+        self.espera_reapertura = espera_reapertura
+        self._lock = threading.Lock()
+        self.estado = 'cerrado'
+        self._fallos_seguidos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self.aperturas = 0
+        self.rechazadas = 0
+
+    def permitir(self):
+        """
+        Autoriza una llamada
+
+        Raises:
+            CircuitoAbierto: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        with self._lock:
+            if self.estado == 'cerrado':
+                return
+            if self.estado == 'abierto' and time.monotonic() >= self._abierto_hasta:
+                self.estado = 'medio_abierto'
+            if self.estado == 'medio_abierto' and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return
+            self.rechazadas += 1
+            restante = max(self._abierto_hasta - time.monotonic(), 0)
+        raise CircuitoAbierto(f"Supabase no disponible temporalmente (reintento en {restante:.0f} s)")
+
+    def exito(self):
+        with self._lock:
+            self.estado = 'cerrado'
+            self._fallos_seguidos = 0
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos_seguidos += 1
+            if self.estado == 'medio_abierto' or self._fallos_seguidos >= self.umbral_fallos:
+                if self.estado != 'abierto':
+                    self.aperturas += 1
+                self.estado = 'abierto'
+                self._abierto_hasta = time.monotonic() + self.espera_reapertura
+                self._prueba_en_curso = False
+
+
+class ResilienciaSupabase:
+    """Tiempo límite, reintentos y circuit breaker para las operaciones del handler"""
+
+    def __init__(self, timeouts=None, intentos=INTENTOS_LECTURA, circuito=None):
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+        self.intentos = intentos
+        self.circuito = circuito or Circuito()
+        # Cada operación admitida puede tener a lo más un intento vivo por
+        # reintento (el anterior termina al vencer su tiempo límite), así que
+        # un intento nunca espera hilo en la cola
+        self._admision = threading.BoundedSemaphore(MAX_LLAMADAS)
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_LLAMADAS * max(self.intentos, 1), thread_name_prefix="supabase"
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.reintentos = 0
+        self.fallos = 0
+        self.timeouts_agotados = 0
+        self.sin_capacidad = 0
+
+    def _contar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def _ejecutar(self, funcion, args, kwargs, timeout):
+        # Las operaciones anidadas (un método que llama a otro) no vuelven a
+        # pasar por la capa: heredan el tiempo límite y los reintentos de la externa
+        self._local.activo = True
+        _limite.valor = None if timeout is None else time.monotonic() + timeout
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            self._local.activo = False
+            _limite.valor = None
+
+    def llamar(self, nombre, tipo, funcion, *args, **kwargs):
+        """
+        Ejecuta una operación con tiempo límite, reintentos y circuit breaker
+
+        Args:
+            nombre (str): Nombre de la operación, para los mensajes
+            tipo (str): 'lectura' (idempotente, se reintenta) o 'escritura'
+            funcion (callable): Operación a ejecutar
+
+        Returns:
+            Resultado de la operación
+
+        Raises:
+            CircuitoAbierto: Si el circuito está abierto
+            SinCapacidad: Si no se liberó un lugar entre las MAX_LLAMADAS
+                          operaciones en curso dentro del tiempo límite
+            Exception: El error de la operación tras agotar los intentos
+        """
+        if getattr(self._local, 'activo', False):
+            return funcion(*args, **kwargs)
+
+        if not self._admision.acquire(timeout=self.timeouts.get(tipo)):
+            self._contar('sin_capacidad')
+            raise SinCapacidad(f"Demasiadas llamadas simultáneas a Supabase ({nombre})")
+        try:
+            return self._llamar(nombre, tipo, funcion, args, kwargs)
+        finally:
+            self._admision.release()
+
+    def _llamar(self, nombre, tipo, funcion, args, kwargs):
+        intentos = self.intentos if tipo == 'lectura' else 1
+        timeout = self.timeouts.get(tipo)
+        self._contar('llamadas')
+
+        for intento in range(1, intentos + 1):
+            self.circuito.permitir()
+            futuro = self._executor.submit(self._ejecutar, funcion, args, kwargs, timeout)
+            try:
+                resultado = futuro.result(timeout=timeout)
+            except TimeoutError:
+                self._contar('timeouts_agotados')
+                error = Exception(f"Tiempo de espera agotado en {nombre} ({timeout:g} s)")
+            except Exception as e:
+                if falta_en_base(e):
+                    # El backend respondió; no es una falla de disponibilidad
+                    self.circuito.exito()
+                    raise
+                error = e
+            else:
+                self.circuito.exito()
+                return resultado
+
+            self._contar('fallos')
+            self.circuito.fallo()
+            if intento == intentos:
+                raise error
+
+            # Backoff exponencial con jitter completo
+            self._contar('reintentos')
+            time.sleep(random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (intento - 1))))
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Estado del circuito y contadores de llamadas, reintentos, fallos,
+                  aperturas y llamadas rechazadas por falta de capacidad
+        """
+        with self._lock:
+            return {
+                'circuito': self.circuito.estado,
+                'llamadas': self.llamadas,
+                'reintentos': self.reintentos,
+                'fallos': self.fallos,
+                'timeouts': self.timeouts_agotados,
+                'sin_capacidad': self.sin_capacidad,
+                'aperturas': self.circuito.aperturas,
+                'rechazadas': self.circuito.rechazadas,
+            }
+
+
+_resiliencia = None
+_resiliencia_lock = threading.Lock()
+
+
+def obtener_resiliencia():
+    """
+    Devuelve la capa de resiliencia del proceso, compartida por todas las sesiones
+
+    Se configura con las variables de entorno SUPABASE_TIMEOUT_LECTURA,
+    SUPABASE_TIMEOUT_ESCRITURA, SUPABASE_INTENTOS, SUPABASE_UMBRAL_FALLOS,
+    SUPABASE_ESPERA_CIRCUITO y SUPABASE_MAX_LLAMADAS
+    """
+    global _resiliencia
+    with _resiliencia_lock:
+        if _resiliencia is None:
+            _resiliencia = ResilienciaSupabase()
+        return _resiliencia
+
+
+def resiliente(tipo='lectura'):
+    """
+    Decorador para los métodos del SupabaseHandler
+
+    Args:
+        tipo (str): 'lectura' para operaciones idempotentes que se pueden
+                    reintentar, 'escritura' para las demás
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(*args, **kwargs):
+            return obtener_resiliencia().llamar(metodo.__name__, tipo, metodo, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,537 @@
+"""
+Snapshot incremental de las tablas de Supabase
+Las tablas se cargan completas una sola vez; después cada refresco pide solo
+las filas que cambiaron desde la última lectura (marca de agua por tabla:
+updated_at, actualizado, created_at o id) y las fusiona por id con las tablas en memoria.
+Las marcas de fecha se toman al inicio de cada transacción (NOW()), así que una
+fila puede aparecer con una fecha anterior a la marca si su transacción terminó
+después del refresco; por eso cada refresco vuelve a leer una ventana de
+SOLAPE_MARCA_SEGUNDOS antes de la marca (las filas que no cambiaron se descartan).
+Si una tabla cambió de columnas, trae demasiados cambios o su número de filas
+no cuadra (borrados o huecos), esa tabla se vuelve a cargar completa; además
+se hace una recarga completa periódica como respaldo.
+
+Cada refresco que cambia algo publica una Instantanea nueva (tablas más su
+índice por email, con número de versión); las sesiones la comparten sin
+copiarla y la anterior nunca se modifica.
+
+CacheDatos sirve ese snapshot a las sesiones: una sola carga en curso a la
+vez (las sesiones que llegan mientras tanto la esperan en lugar de lanzar la
+suya) y, mientras no pase la antigüedad máxima, los datos anteriores se
+siguen sirviendo y se recargan en segundo plano.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.carga_datos import cargar_tablas, TABLAS, TABLAS_OPCIONALES
+from utils.elegibilidad import IndiceElegibilidad
+from utils.supabase_handler import TAMANO_PAGINA
+
+# Por tabla de carga_datos: (tabla en la base, columna de la marca de agua)
+MARCAS = {
+    'participantes': ('participantes', 'updated_at'),
+    'asistencias': ('asistencias', 'created_at'),
+    'actividades': ('actividades', 'actualizado'),
+    'equipos': ('equipos_concurso', 'id'),
+}
+
+# Columnas de vista_participantes_completa calculadas a partir de asistencias
+COLUMNAS_DERIVADAS = ('total_asistencias', 'asistencias_confirmadas')
+
+# Segundos entre recargas completas, para recoger cambios que las marcas no
+# ven (por ejemplo un estado de asistencia corregido)
+RECARGA_COMPLETA_SEGUNDOS = float(os.getenv("CONSTANCIAS_RECARGA_COMPLETA", 1800))
+
+# Segundos antes de la marca que se vuelven a leer en cada refresco, para las
+# filas de transacciones que empezaron antes que la marca y terminaron después
+SOLAPE_MARCA_SEGUNDOS = float(os.getenv("CONSTANCIAS_SOLAPE_MARCA", 30))
+
+
+class RecargaCompleta(Exception):
+    """Los cambios de una tabla no se pueden fusionar: hay que leerla completa"""
+
+
+def _fusionar(actual, cambios):
+    """Reemplaza por id las filas que cambiaron y agrega las nuevas"""
+    if cambios.empty:
+        return actual
+    cambios = cambios.reindex(columns=actual.columns)
+    restantes = actual[~actual['id'].isin(cambios['id'])]
+    return pd.concat([restantes, cambios], ignore_index=True)
+
+
+def _retroceder(marca, segundos):
+    """
+    Marca (valor, id) con la fecha movida segundos hacia atrás
+
+    Con id 0 la lectura incluye todas las filas desde esa fecha. Una marca
+    que no es fecha (la columna id) se devuelve igual.
+    """
+    valor, _ = marca
+    if not isinstance(valor, str):
+        return marca
+    try:
+        fecha = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except ValueError:
+        return marca
+    # Mismo formato que la base (Supabase usa 'T'; SQLite, un espacio)
+    separador = 'T' if 'T' in valor else ' '
+    return (fecha - timedelta(seconds=segundos)).isoformat(sep=separador), 0
+
+
+def _nulo(valor):
+    return valor is None or valor is pd.NA or valor is pd.NaT or (isinstance(valor, float) and valor != valor)
+
+
+def _sin_repetidas(actual, filas):
+    """Quita de filas las que ya están en memoria con los mismos valores (relecturas del solape)"""
+    if not filas or actual.empty:
+        return filas
+    ids = {fila['id'] for fila in filas}
+    previas = {fila['id']: fila for fila in actual[actual['id'].isin(ids)].to_dict('records')}
+
+    def igual(fila):
+        previa = previas.get(fila['id'])
+        if previa is None:
+            return False
+        for columna, valor in fila.items():
+            if columna not in previa:
+                continue
+            anterior = previa[columna]
+            if _nulo(valor) or _nulo(anterior):
+                if not (_nulo(valor) and _nulo(anterior)):
+                    return False
+            elif anterior != valor:
+                return False
+        return True
+
+    return [fila for fila in filas if not igual(fila)]
+
+
+def recalcular_asistencias(participantes, asistencias, emails=None):
+    """
+    Recalcula total_asistencias y asistencias_confirmadas como la vista
+
+    Args:
+        participantes (pd.DataFrame): Participantes de vista_participantes_completa
+        asistencias (pd.DataFrame): Todas las asistencias
+        emails (set, optional): Emails en minúsculas a recalcular; None recalcula todos
+
+    Returns:
+        pd.DataFrame: Participantes con las columnas actualizadas (una copia)
+    """
+    if not set(COLUMNAS_DERIVADAS) <= set(participantes.columns):
+        # Se cargó la tabla participantes en lugar de la vista
+        return participantes
+
+    participantes = participantes.copy()
+    emails_participantes = participantes['email'].str.lower()
+    filas = emails_participantes.isin(emails) if emails is not None else slice(None)
+
+    if asistencias.empty:
+        # Una tabla vacía se carga sin columnas
+        totales = confirmadas = pd.Series(dtype='int64')
+    else:
+        emails_asistencias = asistencias['participante_email'].str.lower()
+        totales = emails_asistencias.value_counts()
+        confirmadas = emails_asistencias[asistencias['estado'] == 'asistió'].value_counts()
+
+    participantes.loc[filas, 'total_asistencias'] = emails_participantes[filas].map(totales).fillna(0)
+    participantes.loc[filas, 'asistencias_confirmadas'] = emails_participantes[filas].map(confirmadas).fillna(0)
+    for columna in COLUMNAS_DERIVADAS:
+        participantes[columna] = participantes[columna].fillna(0).astype(int)
+    return participantes
+
+
+class Instantanea:
+    """
+    Versión de solo lectura de las tablas y su índice de elegibilidad
+
+    Se comparte entre todas las sesiones sin copiarse: las tablas se entregan
+    tal cual y el código que las recibe solo las lee (filtrar o seleccionar
+    crea DataFrames nuevos). Los cambios llegan como una instancia nueva con
+    la versión siguiente; quien tenga la anterior la sigue usando completa.
+    """
+
+    __slots__ = ('version', 'participantes', 'asistencias', 'actividades', 'equipos', 'indice', 'creada_en')
+
+    def __init__(self, version, participantes, asistencias, actividades, equipos, indice=None):
+        """
+        Args:
+            version (int): Número de versión, creciente en el proceso
+            participantes (pd.DataFrame): Participantes de vista_participantes_completa
+            asistencias (pd.DataFrame): Asistencias
+            actividades (pd.DataFrame): Actividades
+            equipos (pd.DataFrame): Equipos del concurso
+            indice (IndiceElegibilidad, optional): Índice de esas tablas; si no
+                                                   se da, se construye
+        """
+        if indice is None:
+            indice = IndiceElegibilidad(participantes, asistencias, equipos)
+        valores = {
+            'version': version,
+            'participantes': participantes,
+            'asistencias': asistencias,
+            'actividades': actividades,
+            'equipos': equipos,
+            'indice': indice,
+            'creada_en': time.time(),
+        }
+        for nombre, valor in valores.items():
+            object.__setattr__(self, nombre, valor)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("La instantánea es de solo lectura; usa siguiente() para publicar cambios")
+
+    def __delattr__(self, nombre):
+        raise AttributeError("La instantánea es de solo lectura")
+
+    def __repr__(self):
+        return f"Instantanea(version={self.version}, participantes={len(self.participantes)})"
+
+    def siguiente(self, participantes, asistencias, actividades, equipos):
+        """
+        Versión con las tablas dadas
+
+        Returns:
+            Instantanea: Esta misma si ninguna tabla cambió (son los mismos
+                         objetos); si no, una nueva con la versión siguiente,
+                         que reutiliza el índice si solo cambiaron las actividades
+        """
+        nuevas = (participantes, asistencias, actividades, equipos)
+        actuales = (self.participantes, self.asistencias, self.actividades, self.equipos)
+        if all(nueva is actual for nueva, actual in zip(nuevas, actuales)):
+            return self
+
+        indice = None
+        if participantes is self.participantes and asistencias is self.asistencias and equipos is self.equipos:
+            indice = self.indice
+        return Instantanea(self.version + 1, participantes, asistencias, actividades, equipos, indice)
+
+    def verificar(self, email):
+        """Elegibilidad de un correo, como verificar_elegibilidad (consulta el índice)"""
+        return self.indice.verificar(email)
+
+    def participante(self, email):
+        """Fila del participante (pd.Series, sin copiar) o None"""
+        return self.indice.participante(email)
+
+
+class SnapshotDatos:
+    """Tablas en memoria que se actualizan con lecturas incrementales"""
+
+    def __init__(self, recarga_completa=RECARGA_COMPLETA_SEGUNDOS, limite_cambios=TAMANO_PAGINA):
+        self.recarga_completa = recarga_completa
+        self.limite_cambios = limite_cambios
+        self._lock = threading.Lock()
+        self._tablas = {}         # nombre -> DataFrame
+        self._marcas = {}         # nombre -> (valor de la columna de la marca, id) de la última fila leída
+        self._completa_en = None  # momento de la última recarga completa de todas las tablas
+        self.recargas_completas = 0
+        self.refrescos_incrementales = 0
+        self.filas_fusionadas = 0
+        self.motivos = {}         # nombre -> motivo de la última recarga completa
+        self._instantanea = None  # última Instantanea publicada
+
+    def _cambios(self, handler, nombre):
+        """Lee y fusiona los cambios de una tabla; RecargaCompleta si no se puede"""
+        tabla, columna = MARCAS[nombre]
+        actual = self._tablas[nombre]
+        marca = self._marcas.get(nombre)
+
+        desde = marca
+        if marca is not None and columna != 'id':
+            desde = _retroceder(marca, SOLAPE_MARCA_SEGUNDOS)
+        filas = handler.obtener_cambios(tabla, columna, desde, limite=self.limite_cambios)
+        if len(filas) >= self.limite_cambios:
+            raise RecargaCompleta(f"más de {self.limite_cambios} cambios")
+
+        # Las filas llegan ordenadas por (columna, id): la última con valor es la
+        # nueva marca (nunca anterior a la actual, aunque la lectura empiece antes)
+        marcadas = [fila for fila in filas if fila.get(columna) is not None]
+        if marcadas:
+            ultima = (marcadas[-1][columna], marcadas[-1]['id'])
+            marca = ultima if marca is None else max(marca, ultima)
+
+        cambios = pd.DataFrame(_sin_repetidas(actual, filas))
+        if not cambios.empty:
+            locales = set(actual.columns)
+            if nombre == 'participantes':
+                locales -= set(COLUMNAS_DERIVADAS)
+                cambio_esquema = not locales <= set(cambios.columns)
+            else:
+                cambio_esquema = locales != set(cambios.columns)
+            if cambio_esquema:
+                raise RecargaCompleta("cambiaron las columnas")
+
+        fusionada = _fusionar(actual, cambios)
+        # Borrados o filas que la marca no vio (por ejemplo transacciones largas);
+        # la vista de participantes tiene una fila por participante
+        if handler.contar_filas(tabla) != len(fusionada):
+            raise RecargaCompleta("el número de filas no coincide")
+        return fusionada, marca, cambios
+
+    def refrescar(self, handler):
+        """
+        Actualiza las tablas en memoria y devuelve su instantánea
+
+        La primera vez (y cada recarga_completa segundos) lee las tablas
+        completas; las demás solo los cambios. Si falla la lectura las tablas
+        en memoria no se modifican.
+
+        Args:
+            handler (SupabaseHandler): Handler conectado
+
+        Returns:
+            Instantanea: La anterior si nada cambió; si no, la versión siguiente
+
+        Raises:
+            Exception: Si una tabla no se pudo leer
+        """
+        with self._lock:
+            tablas = dict(self._tablas)
+            marcas = dict(self._marcas)
+            motivos = {}
+
+            vencida = self._completa_en is None or time.time() - self._completa_en >= self.recarga_completa
+            completas = [n for n in TABLAS if vencida or n not in tablas]
+            incrementales = [n for n in TABLAS if n not in completas]
+
+            # 1. Cambios de las tablas que ya están en memoria, al mismo tiempo
+            cambios_asistencias = None
+            if incrementales:
+                with ThreadPoolExecutor(max_workers=len(incrementales), thread_name_prefix="snapshot") as executor:
+                    futuros = {n: executor.submit(self._cambios, handler, n) for n in incrementales}
+                for nombre, futuro in futuros.items():
+                    try:
+                        tablas[nombre], marcas[nombre], cambios = futuro.result()
+                    except RecargaCompleta as e:
+                        motivos[nombre] = str(e)
+                        completas.append(nombre)
+                        continue
+                    self.filas_fusionadas += len(cambios)
+                    if nombre == 'asistencias':
+                        cambios_asistencias = cambios
+                    if nombre == 'participantes' and not cambios.empty:
+                        # Las filas nuevas de la tabla no traen las columnas de la vista
+                        tablas[nombre] = recalcular_asistencias(
+                            tablas[nombre], tablas['asistencias'], set(cambios['email'].str.lower())
+                        )
+
+            # 2. Tablas completas; la marca se toma antes de leer para no
+            #    perder lo que cambie mientras se lee (se fusiona por id)
+            if completas:
+                for nombre in completas:
+                    tabla, columna = MARCAS[nombre]
+                    try:
+                        marcas[nombre] = handler.obtener_marca(tabla, columna)
+                    except Exception:
+                        if nombre not in TABLAS_OPCIONALES:
+                            raise
+                        # Sin marca, el siguiente refresco lee la tabla desde el principio
+                        marcas[nombre] = None
+                datos, faltantes = cargar_tablas(handler, tablas=tuple(completas))
+                for nombre in completas:
+                    tablas[nombre] = datos[nombre]
+                    if nombre in faltantes:
+                        # Tabla opcional que no respondió: se vuelve a pedir completa
+                        marcas.pop(nombre, None)
+                        tablas.pop(nombre, None)
+
+            # 3. Asistencias nuevas cambian los totales de la vista de participantes
+            if 'participantes' not in completas and 'participantes' in tablas:
+                if 'asistencias' in completas:
+                    tablas['participantes'] = recalcular_asistencias(tablas['participantes'], tablas['asistencias'])
+                elif cambios_asistencias is not None and not cambios_asistencias.empty:
+                    tablas['participantes'] = recalcular_asistencias(
+                        tablas['participantes'], tablas['asistencias'],
+                        set(cambios_asistencias['participante_email'].str.lower())
+                    )
+
+            # Todo se leyó: publicar las tablas nuevas (las anteriores no se modifican)
+            self._tablas = tablas
+            self._marcas = marcas
+            self.motivos.update(motivos)
+            if len(completas) == len(TABLAS):
+                self._completa_en = time.time()
+                self.recargas_completas += 1
+            elif incrementales:
+                self.refrescos_incrementales += 1
+
+            actividades = tablas.get('actividades')
+            if actividades is None:
+                actividades = datos['actividades']
+            tablas_publicadas = (tablas['participantes'], tablas['asistencias'], actividades, tablas['equipos'])
+            if self._instantanea is None:
+                self._instantanea = Instantanea(1, *tablas_publicadas)
+            else:
+                self._instantanea = self._instantanea.siguiente(*tablas_publicadas)
+            return self._instantanea
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Recargas completas, refrescos incrementales, filas fusionadas, marcas
+                  actuales y versión de la instantánea publicada
+        """
+        with self._lock:
+            return {
+                'recargas_completas': self.recargas_completas,
+                'refrescos_incrementales': self.refrescos_incrementales,
+                'filas_fusionadas': self.filas_fusionadas,
+                'marcas': dict(self._marcas),
+                'motivos': dict(self.motivos),
+                'version': self._instantanea.version if self._instantanea is not None else None,
+            }
+
+
+class CacheDatos:
+    """
+    Cache de un valor costoso con carga única y stale-while-revalidate
+
+    Mientras el valor tiene menos de ttl segundos se sirve tal cual. Entre ttl
+    y antiguedad_maxima se sirve el valor anterior y se lanza una recarga en
+    segundo plano. Sin valor, o pasada la antigüedad máxima, se espera la
+    carga. En todos los casos hay a lo más una carga en curso.
+    """
+
+    def __init__(self, cargar, ttl, antiguedad_maxima):
+        """
+        Args:
+            cargar (callable): Función sin argumentos que devuelve el valor
+            ttl (float): Segundos durante los que el valor se sirve sin recargar
+            antiguedad_maxima (float): Segundos después de los cuales ya no se
+                                       sirve el valor anterior sin esperar la recarga
+        """
+        self._cargar = cargar
+        self.ttl = ttl
+        self.antiguedad_maxima = max(antiguedad_maxima, ttl)
+        self._lock = threading.Lock()
+        self._valor = None
+        self._cargado_en = None
+        self._en_curso = None     # Future de la carga en curso
+        self.aciertos = 0
+        self.obsoletos = 0
+        self.esperas = 0
+        self.cargas = 0
+        self.errores = 0
+        self.ultimo_error = None
+
+    def _antiguedad(self):
+        return None if self._cargado_en is None else time.time() - self._cargado_en
+
+    def _iniciar_carga(self):
+        """Lanza la carga si no hay una en curso (con el lock tomado) y devuelve su Future"""
+        if self._en_curso is None:
+            self._en_curso = Future()
+            threading.Thread(
+                target=self._ejecutar, args=(self._en_curso,), name="cache-datos", daemon=True
+            ).start()
+        return self._en_curso
+
+    def _ejecutar(self, futuro):
+        try:
+            valor = self._cargar()
+        except Exception as e:
+            with self._lock:
+                self._en_curso = None
+                self.errores += 1
+                self.ultimo_error = str(e)
+            futuro.set_exception(e)
+            return
+        with self._lock:
+            self._valor = valor
+            self._cargado_en = time.time()
+            self._en_curso = None
+            self.cargas += 1
+        futuro.set_result(valor)
+
+    def obtener(self, timeout=None):
+        """
+        Devuelve el valor, esperando la carga solo si no hay uno servible
+
+        Args:
+            timeout (float, optional): Segundos máximos de espera de la carga
+
+        Returns:
+            El valor en cache o el recién cargado
+
+        Raises:
+            Exception: El error de la carga, si hubo que esperarla y falló
+        """
+        with self._lock:
+            antiguedad = self._antiguedad()
+            if antiguedad is not None and antiguedad < self.ttl:
+                self.aciertos += 1
+                return self._valor
+            if antiguedad is not None and antiguedad < self.antiguedad_maxima:
+                self.obsoletos += 1
+                self._iniciar_carga()
+                return self._valor
+            self.esperas += 1
+            futuro = self._iniciar_carga()
+        return futuro.result(timeout=timeout)
+
+    def vigente(self):
+        """El valor si se puede servir sin esperar (aunque esté por recargarse), o None"""
+        with self._lock:
+            antiguedad = self._antiguedad()
+            if antiguedad is not None and antiguedad < self.antiguedad_maxima:
+                return self._valor
+            return None
+
+    def refrescar_en_segundo_plano(self):
+        """Lanza una carga si no hay una en curso, sin esperarla"""
+        with self._lock:
+            self._iniciar_carga()
+
+    def ultimo(self):
+        """
+        Returns:
+            tuple: (último valor cargado o None, momento de la carga o None),
+                   sin importar su antigüedad
+        """
+        with self._lock:
+            return self._valor, self._cargado_en
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Antigüedad del valor, carga en curso y contadores de aciertos,
+                  valores obsoletos servidos, esperas, cargas y errores
+        """
+        with self._lock:
+            return {
+                'antiguedad': self._antiguedad(),
+                'cargando': self._en_curso is not None,
+                'aciertos': self.aciertos,
+                'obsoletos': self.obsoletos,
+                'esperas': self.esperas,
+                'cargas': self.cargas,
+                'errores': self.errores,
+                'ultimo_error': self.ultimo_error,
+            }
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def obtener_snapshot():
+    """
+    Devuelve el snapshot incremental del proceso del servidor
+
+    El intervalo de recarga completa se configura con la variable de entorno
+    CONSTANCIAS_RECARGA_COMPLETA (segundos)
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = SnapshotDatos()
+        return _snapshot
@@ -0,0 +1,635 @@
+"""
+Handler de almacenamiento local en SQLite
+Implementa los mismos métodos que SupabaseHandler sobre un archivo SQLite con
+el esquema de crear_tablas_supabase.sql, de modo que la aplicación y los
+scripts pueden correr sin red: sirve para pruebas de carga y benchmarks, y
+para atender desde una réplica local cuando Supabase no está disponible.
+Se elige con CONSTANCIAS_BACKEND=sqlite (ver supabase_handler.obtener_handler).
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from utils.elegibilidad import COLUMNAS_EMAIL_EQUIPO
+from utils.supabase_handler import TAMANO_PAGINA, COLUMNAS_PARTICIPANTE, filas_respuestas
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RUTA_PREDETERMINADA = ROOT_DIR / ".cache" / "constancias.sqlite3"
+
+# Esquema de crear_tablas_supabase.sql traducido a SQLite: BIGINT/BIGSERIAL
+# como INTEGER, BOOLEAN como 0/1 y TIMESTAMPTZ como texto ISO con milisegundos (para las marcas de agua)
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS participantes (
+    id INTEGER PRIMARY KEY,
+    nombre_completo TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    telefono TEXT,
+    categoria TEXT,
+    programa TEXT,
+    brazalete TEXT,
+    encuesta_completada INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_participantes_categoria ON participantes(categoria);
+-- Las búsquedas por email comparan en minúsculas, igual que la vista
+CREATE INDEX IF NOT EXISTS idx_participantes_email_lower ON participantes(LOWER(email));
+CREATE TRIGGER IF NOT EXISTS update_participantes_updated_at
+AFTER UPDATE ON participantes
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE participantes SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS actividades (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT UNIQUE NOT NULL,
+    titulo TEXT NOT NULL,
+    ponente TEXT,
+    institucion TEXT,
+    bio_ponente TEXT,
+    descripcion TEXT,
+    imagen_ponente TEXT,
+    banner TEXT,
+    fecha_inicio TEXT,
+    fecha_fin TEXT,
+    lugar TEXT,
+    tipo TEXT,
+    cupo_maximo INTEGER,
+    activa INTEGER DEFAULT 1,
+    creado TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    actualizado TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_actividades_tipo ON actividades(tipo);
+CREATE INDEX IF NOT EXISTS idx_actividades_actualizado ON actividades(actualizado);
+CREATE TRIGGER IF NOT EXISTS update_actividades_actualizado
+AFTER UPDATE ON actividades
+FOR EACH ROW WHEN NEW.actualizado IS OLD.actualizado
+BEGIN
+    UPDATE actividades SET actualizado = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS asistencias (
+    id INTEGER PRIMARY KEY,
+    participante_email TEXT NOT NULL,
+    actividad_codigo TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    modo_asistencia TEXT,
+    fecha_asistencia TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    notas TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_asistencias_actividad ON asistencias(actividad_codigo);
+CREATE INDEX IF NOT EXISTS idx_asistencias_estado ON asistencias(estado);
+CREATE INDEX IF NOT EXISTS idx_asistencias_email_lower ON asistencias(LOWER(participante_email));
+CREATE UNIQUE INDEX IF NOT EXISTS idx_asistencias_unique
+ON asistencias(participante_email, actividad_codigo);
+
+CREATE TABLE IF NOT EXISTS equipos_concurso (
+    id INTEGER PRIMARY KEY,
+    nombre_equipo TEXT NOT NULL,
+    estado_id INTEGER,
+    email_capitan TEXT NOT NULL,
+    nombre_capitan TEXT NOT NULL,
+    telefono_capitan TEXT,
+    email_miembro_1 TEXT,
+    email_miembro_2 TEXT,
+    email_miembro_3 TEXT,
+    email_miembro_4 TEXT,
+    email_miembro_5 TEXT,
+    estado_registro TEXT DEFAULT 'pendiente',
+    activo INTEGER DEFAULT 1,
+    fecha_registro TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    fecha_confirmacion TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_equipos_capitan_lower ON equipos_concurso(LOWER(email_capitan));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_1_lower ON equipos_concurso(LOWER(email_miembro_1));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_2_lower ON equipos_concurso(LOWER(email_miembro_2));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_3_lower ON equipos_concurso(LOWER(email_miembro_3));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_4_lower ON equipos_concurso(LOWER(email_miembro_4));
+CREATE INDEX IF NOT EXISTS idx_equipos_miembro_5_lower ON equipos_concurso(LOWER(email_miembro_5));
+
+CREATE TABLE IF NOT EXISTS encuesta_respuestas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participante_email TEXT NOT NULL,
+    nombre_completo TEXT NOT NULL,
+    pregunta_id INTEGER NOT NULL,
+    pregunta_texto TEXT NOT NULL,
+    respuesta TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_encuesta_pregunta ON encuesta_respuestas(pregunta_id);
+CREATE INDEX IF NOT EXISTS idx_encuesta_timestamp ON encuesta_respuestas(timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_encuesta_unique
+ON encuesta_respuestas(participante_email, pregunta_id);
+
+CREATE VIEW IF NOT EXISTS vista_participantes_completa AS
+SELECT
+    p.id,
+    p.nombre_completo,
+    p.email,
+    p.categoria,
+    p.programa,
+    p.encuesta_completada,
+    COUNT(a.id) AS total_asistencias,
+    COUNT(CASE WHEN a.estado = 'asistió' THEN 1 END) AS asistencias_confirmadas
+FROM participantes p
+LEFT JOIN asistencias a ON LOWER(p.email) = LOWER(a.participante_email)
+GROUP BY p.id, p.nombre_completo, p.email, p.categoria, p.programa, p.encuesta_completada;
+
+CREATE VIEW IF NOT EXISTS vista_estadisticas_encuesta AS
+SELECT
+    COUNT(*) AS total_respuestas,
+    COUNT(DISTINCT participante_email) AS total_participantes,
+    (SELECT fecha FROM encuesta_respuestas ORDER BY timestamp DESC LIMIT 1) AS ultima_respuesta
+FROM encuesta_respuestas;
+"""
+
+# Tablas y vistas que se pueden leer; las tablas además se pueden limpiar y llenar
+TABLAS = ('participantes', 'actividades', 'asistencias', 'equipos_concurso', 'encuesta_respuestas')
+VISTAS = ('vista_participantes_completa', 'vista_estadisticas_encuesta')
+
+# Columnas BOOLEAN en Postgres; SQLite las guarda como 0/1
+COLUMNAS_BOOLEANAS = {'encuesta_completada', 'activa', 'activo'}
+
+_IDENTIFICADOR = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _columnas_sql(columnas):
+    """Convierte 'id,email' al SQL de un select, validando los nombres"""
+    if columnas.strip() == '*':
+        return '*'
+    nombres = [c.strip() for c in columnas.split(',') if c.strip()]
+    for nombre in nombres:
+        if not _IDENTIFICADOR.match(nombre):
+            raise ValueError(f"Columna no válida: {nombre}")
+    return ', '.join(nombres)
+
+
+def _validar_tabla(tabla, vistas=True):
+    permitidas = TABLAS + VISTAS if vistas else TABLAS
+    if tabla not in permitidas:
+        raise ValueError(f"Tabla no válida: {tabla}")
+    return tabla
+
+
+def _valor(valor):
+    """Valor que sqlite3 puede guardar (los escalares de numpy se convierten a Python)"""
+    if hasattr(valor, 'item') and not isinstance(valor, (str, bytes)):
+        return valor.item()
+    return valor
+
+
+def _a_dict(fila):
+    """sqlite3.Row -> dict, con las columnas booleanas como bool, igual que PostgREST"""
+    datos = dict(fila)
+    for columna in COLUMNAS_BOOLEANAS & datos.keys():
+        if datos[columna] is not None:
+            datos[columna] = bool(datos[columna])
+    return datos
+
+
+class SQLiteHandler:
+    """Maneja la conexión y operaciones con una base SQLite local"""
+
+    def __init__(self, ruta=None):
+        """
+        Args:
+            ruta (str, optional): Archivo de la base; por defecto CONSTANCIAS_SQLITE_PATH
+                                  o .cache/constancias.sqlite3
+        """
+        self.ruta = Path(ruta or os.getenv("CONSTANCIAS_SQLITE_PATH") or RUTA_PREDETERMINADA)
+        self._local = threading.local()
+        self._conectado = False
+
+    def connect(self):
+        """Abre (o crea) la base y aplica el esquema"""
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            conexion = self._conexion()
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(ESQUEMA)
+            self._conectado = True
+            return True
+        except Exception as e:
+            raise Exception(f"Error al conectar con SQLite: {str(e)}")
+
+    def _conexion(self):
+        """Conexión del hilo actual (sqlite3 no comparte conexiones entre hilos)"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _consultar(self, sql, parametros=()):
+        if not self._conectado:
+            self.connect()
+        return [_a_dict(fila) for fila in self._conexion().execute(sql, parametros).fetchall()]
+
+    def iterar_paginas(self, tabla, columnas='*', tamano_pagina=None, prefetch=False):
+        """
+        Recorre una tabla completa por páginas, usando paginación por id (keyset)
+
+        Misma interfaz que SupabaseHandler.iterar_paginas; prefetch se acepta
+        por compatibilidad pero no hace falta con una base local.
+
+        Yields:
+            list: Filas de cada página (lista de diccionarios)
+        """
+        tamano_pagina = tamano_pagina or TAMANO_PAGINA
+        try:
+            sql = f"SELECT {_columnas_sql(columnas)} FROM {_validar_tabla(tabla)}"
+            filas = self._consultar(f"{sql} ORDER BY id LIMIT ?", (tamano_pagina,))
+            while filas:
+                ultimo = filas[-1]['id']
+                yield filas
+                if len(filas) < tamano_pagina:
+                    break
+                filas = self._consultar(f"{sql} WHERE id > ? ORDER BY id LIMIT ?", (ultimo, tamano_pagina))
+        except Exception as e:
+            raise Exception(f"Error al leer {tabla} desde SQLite: {str(e)}")
+
+    def obtener_marca(self, tabla, columna):
+        """(valor, id) de la fila más reciente según una columna, o None si no hay filas"""
+        try:
+            columna = _columnas_sql(columna)
+            filas = self._consultar(
+                f"SELECT {columna} AS valor, id FROM {_validar_tabla(tabla)} "
+                f"WHERE {columna} IS NOT NULL ORDER BY {columna} DESC, id DESC LIMIT 1"
+            )
+            return (filas[0]['valor'], filas[0]['id']) if filas else None
+        except Exception as e:
+            raise Exception(f"Error al consultar {tabla}.{columna}: {str(e)}")
+
+    def obtener_cambios(self, tabla, columna, desde=None, columnas='*', limite=None):
+        """Filas posteriores a la marca (valor, id), ordenadas por ese par (ver SupabaseHandler.obtener_cambios)"""
+        try:
+            columna = _columnas_sql(columna)
+            sql = f"SELECT {_columnas_sql(columnas)} FROM {_validar_tabla(tabla)}"
+            parametros = []
+            if desde is not None:
+                sql += f" WHERE ({columna}, id) > (?, ?)"
+                parametros.extend(desde)
+            sql += f" ORDER BY {columna}, id LIMIT ?"
+            parametros.append(limite or TAMANO_PAGINA)
+            return self._consultar(sql, parametros)
+        except Exception as e:
+            raise Exception(f"Error al leer cambios de {tabla}: {str(e)}")
+
+    def contar_filas(self, tabla):
+        """Número de filas de una tabla o vista"""
+        try:
+            return int(self._consultar(f"SELECT COUNT(*) AS total FROM {_validar_tabla(tabla)}")[0]['total'])
+        except Exception as e:
+            raise Exception(f"Error al contar {tabla}: {str(e)}")
+
+    def iterar_filas(self, tabla, columnas='*', tamano_pagina=None, prefetch=False):
+        """Igual que iterar_paginas, pero entrega las filas una por una"""
+        for filas in self.iterar_paginas(tabla, columnas, tamano_pagina, prefetch):
+            yield from filas
+
+    def iterar_participantes(self, tamano_pagina=None, prefetch=False):
+        """Recorre los participantes por páginas desde vista_participantes_completa"""
+        yield from self.iterar_paginas('vista_participantes_completa', '*', tamano_pagina, prefetch)
+
+    def _escribir_respuestas(self, conexion, filas_por_email):
+        """Upsert de las respuestas, borrado de las obsoletas y encuesta completada, en la transacción abierta"""
+        conexion.executemany(
+            "INSERT INTO encuesta_respuestas "
+            "(participante_email, nombre_completo, pregunta_id, pregunta_texto, respuesta, fecha, timestamp) "
+            "VALUES (:participante_email, :nombre_completo, :pregunta_id, :pregunta_texto, :respuesta, :fecha, :timestamp) "
+            "ON CONFLICT (participante_email, pregunta_id) DO UPDATE SET "
+            "nombre_completo = excluded.nombre_completo, pregunta_texto = excluded.pregunta_texto, "
+            "respuesta = excluded.respuesta, fecha = excluded.fecha, timestamp = excluded.timestamp",
+            [fila for filas in filas_por_email.values() for fila in filas]
+        )
+        for email, filas in filas_por_email.items():
+            ids = [f['pregunta_id'] for f in filas]
+            marcas = ','.join('?' * len(ids))
+            filtro = f" AND pregunta_id NOT IN ({marcas})" if ids else ""
+            conexion.execute(
+                f"DELETE FROM encuesta_respuestas WHERE participante_email = ?{filtro}", [email, *ids]
+            )
+
+    def guardar_respuestas(self, email, nombre_completo, respuestas, preguntas_dict):
+        """
+        Guarda las respuestas de la encuesta en SQLite
+
+        Args:
+            email (str): Email del participante
+            nombre_completo (str): Nombre completo del participante
+            respuestas (dict): Diccionario {pregunta_id: respuesta}
+            preguntas_dict (dict): Diccionario {pregunta_id: texto_pregunta}
+
+        Returns:
+            bool: True si se guardó exitosamente
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            filas = filas_respuestas(email, nombre_completo, respuestas, preguntas_dict)
+            with self._conexion() as conexion:
+                self._escribir_respuestas(conexion, {email.lower(): filas})
+            return True
+        except Exception as e:
+            raise Exception(f"Error al guardar en SQLite: {str(e)}")
+
+    def guardar_encuesta(self, email, nombre_completo, respuestas, preguntas_dict):
+        """
+        Guarda las respuestas y marca la encuesta como completada en una sola transacción
+
+        Returns:
+            dict: 'email', 'respuestas' (número guardado) y 'encuesta_completada'
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            filas = filas_respuestas(email, nombre_completo, respuestas, preguntas_dict)
+            with self._conexion() as conexion:
+                self._escribir_respuestas(conexion, {email.lower(): filas})
+                conexion.execute(
+                    "UPDATE participantes SET encuesta_completada = 1 WHERE LOWER(email) = ?",
+                    (email.lower(),)
+                )
+            return {'email': email.lower(), 'respuestas': len(filas), 'encuesta_completada': True}
+        except Exception as e:
+            raise Exception(f"Error al guardar la encuesta en SQLite: {str(e)}")
+
+    def guardar_encuestas_lote(self, encuestas):
+        """
+        Guarda varias encuestas completas en una sola transacción
+
+        Args:
+            encuestas (list): Misma forma que SupabaseHandler.guardar_encuestas_lote
+
+        Returns:
+            int: Número de encuestas guardadas
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            if not encuestas:
+                return 0
+
+            filas_por_email = {}
+            for encuesta in encuestas:
+                # Si un participante envió varias veces, gana el último envío
+                filas_por_email[encuesta['email'].lower()] = filas_respuestas(
+                    encuesta['email'], encuesta['nombre_completo'], encuesta['respuestas'],
+                    encuesta['preguntas'], encuesta.get('momento')
+                )
+
+            with self._conexion() as conexion:
+                self._escribir_respuestas(conexion, filas_por_email)
+                conexion.executemany(
+                    "UPDATE participantes SET encuesta_completada = 1 WHERE LOWER(email) = ?",
+                    [(email,) for email in filas_por_email]
+                )
+            return len(filas_por_email)
+        except Exception as e:
+            raise Exception(f"Error al guardar encuestas en SQLite: {str(e)}")
+
+    def obtener_respuestas(self, email=None):
+        """
+        Obtiene respuestas de la base de datos
+
+        Args:
+            email (str, optional): Email del participante. Si es None, obtiene todas.
+
+        Returns:
+            list: Lista de diccionarios con las respuestas
+        """
+        try:
+            if email:
+                return self._consultar(
+                    "SELECT * FROM encuesta_respuestas WHERE participante_email = ? ORDER BY pregunta_id",
+                    (email.lower(),)
+                )
+            return self._consultar("SELECT * FROM encuesta_respuestas ORDER BY timestamp DESC")
+        except Exception as e:
+            raise Exception(f"Error al obtener respuestas de SQLite: {str(e)}")
+
+    def obtener_estadisticas(self, incremental=False):
+        """
+        Obtiene estadísticas básicas de las respuestas desde vista_estadisticas_encuesta
+
+        Args:
+            incremental (bool): Se acepta por compatibilidad; en SQLite la vista
+                                ya se resuelve con los índices locales
+
+        Returns:
+            dict: Diccionario con estadísticas
+        """
+        try:
+            fila = self._consultar(
+                "SELECT total_respuestas, total_participantes, ultima_respuesta FROM vista_estadisticas_encuesta"
+            )[0]
+            return {
+                'total_respuestas': int(fila['total_respuestas'] or 0),
+                'total_participantes': int(fila['total_participantes'] or 0),
+                'ultima_respuesta': fila['ultima_respuesta']
+            }
+        except Exception as e:
+            raise Exception(f"Error al obtener estadísticas: {str(e)}")
+
+    def obtener_respuestas_por_pregunta(self, pregunta_id):
+        """
+        Obtiene todas las respuestas de una pregunta específica
+
+        Returns:
+            list: Lista con las respuestas
+        """
+        try:
+            return self._consultar(
+                "SELECT nombre_completo, respuesta, fecha FROM encuesta_respuestas "
+                "WHERE pregunta_id = ? ORDER BY timestamp DESC",
+                (pregunta_id,)
+            )
+        except Exception as e:
+            raise Exception(f"Error al obtener respuestas por pregunta: {str(e)}")
+
+    def verificar_encuesta_completada(self, email):
+        """
+        Verifica si un participante ya completó la encuesta
+
+        Returns:
+            bool: True si completó la encuesta, False si no
+        """
+        try:
+            filas = self._consultar(
+                "SELECT encuesta_completada FROM participantes WHERE LOWER(email) = ?", (email.lower(),)
+            )
+            return bool(filas and filas[0]['encuesta_completada'])
+        except Exception as e:
+            raise Exception(f"Error al verificar encuesta: {str(e)}")
+
+    def marcar_encuesta_completada(self, email):
+        """
+        Marca la encuesta como completada para un participante
+
+        Returns:
+            bool: True si se actualizó exitosamente
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            with self._conexion() as conexion:
+                conexion.execute(
+                    "UPDATE participantes SET encuesta_completada = 1 WHERE LOWER(email) = ?",
+                    (email.lower(),)
+                )
+            return True
+        except Exception as e:
+            raise Exception(f"Error al marcar encuesta completada: {str(e)}")
+
+    def obtener_participante(self, email):
+        """
+        Obtiene los datos de un participante
+
+        Returns:
+            dict: Datos del participante o None si no existe
+        """
+        try:
+            filas = self._consultar("SELECT * FROM participantes WHERE LOWER(email) = ?", (email.lower(),))
+            return filas[0] if filas else None
+        except Exception as e:
+            raise Exception(f"Error al obtener participante: {str(e)}")
+
+    def obtener_datos_elegibilidad(self, email):
+        """
+        Obtiene lo necesario para verificar la elegibilidad de un solo participante
+
+        Returns:
+            dict: Misma forma que SupabaseHandler.obtener_datos_elegibilidad
+        """
+        try:
+            email = email.strip().lower()
+
+            participantes = self._consultar(
+                f"SELECT {_columnas_sql(COLUMNAS_PARTICIPANTE)} FROM participantes WHERE LOWER(email) = ? LIMIT 1",
+                (email,)
+            )
+            if not participantes:
+                return {
+                    'participante': None,
+                    'total_asistencias': 0,
+                    'asistencias_confirmadas': 0,
+                    'workshops': [],
+                    'en_equipo': False,
+                }
+
+            asistencias = self._consultar(
+                "SELECT actividad_codigo, estado FROM asistencias WHERE LOWER(participante_email) = ?", (email,)
+            )
+
+            # Capitán o cualquiera de los 5 miembros
+            filtro_equipo = ' OR '.join(f'LOWER({columna}) = :email' for columna in COLUMNAS_EMAIL_EQUIPO)
+            equipos = self._consultar(
+                f"SELECT id FROM equipos_concurso WHERE {filtro_equipo} LIMIT 1", {'email': email}
+            )
+
+            return {
+                'participante': participantes[0],
+                'total_asistencias': len(asistencias),
+                'asistencias_confirmadas': sum(1 for a in asistencias if a.get('estado') == 'asistió'),
+                'workshops': sorted({
+                    a['actividad_codigo'] for a in asistencias
+                    if a.get('actividad_codigo') and a['actividad_codigo'].startswith('W')
+                }),
+                'en_equipo': bool(equipos),
+            }
+        except Exception as e:
+            raise Exception(f"Error al obtener elegibilidad del participante: {str(e)}")
+
+    def obtener_elegibilidad(self, email):
+        """Igual que obtener_datos_elegibilidad (no hay llamadas de red que ahorrar)"""
+        return self.obtener_datos_elegibilidad(email)
+
+    def obtener_elegibilidad_lote(self, emails):
+        """
+        Obtiene los datos de elegibilidad de varios participantes
+
+        Returns:
+            dict: Email (en minúsculas) -> datos con la forma de obtener_datos_elegibilidad
+        """
+        emails = sorted({e.strip().lower() for e in emails if e and e.strip()})
+        return {email: self.obtener_datos_elegibilidad(email) for email in emails}
+
+    def obtener_todos_participantes(self):
+        """Obtiene todos los participantes con total_asistencias y asistencias_confirmadas"""
+        try:
+            return [fila for filas in self.iterar_participantes() for fila in filas]
+        except Exception as e:
+            raise Exception(f"Error al obtener participantes: {str(e)}")
+
+    def obtener_todas_asistencias(self):
+        """Obtiene todas las asistencias"""
+        try:
+            return list(self.iterar_filas('asistencias'))
+        except Exception as e:
+            raise Exception(f"Error al obtener asistencias: {str(e)}")
+
+    def obtener_todas_actividades(self):
+        """Obtiene todas las actividades"""
+        try:
+            return list(self.iterar_filas('actividades'))
+        except Exception as e:
+            raise Exception(f"Error al obtener actividades: {str(e)}")
+
+    def obtener_todos_equipos(self):
+        """Obtiene todos los equipos del concurso"""
+        try:
+            return list(self.iterar_filas('equipos_concurso'))
+        except Exception as e:
+            raise Exception(f"Error al obtener equipos: {str(e)}")
+
+    def limpiar_tabla(self, nombre_tabla):
+        """
+        Elimina todas las filas de una tabla
+
+        Args:
+            nombre_tabla (str): Una de TABLAS
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            with self._conexion() as conexion:
+                conexion.execute(f"DELETE FROM {_validar_tabla(nombre_tabla, vistas=False)}")
+            return True
+        except Exception as e:
+            raise Exception(f"Error al limpiar {nombre_tabla}: {str(e)}")
+
+    def insertar_filas(self, nombre_tabla, filas):
+        """
+        Inserta filas en una tabla, en una sola transacción
+
+        Args:
+            nombre_tabla (str): Una de TABLAS
+            filas (list): Diccionarios columna -> valor
+
+        Returns:
+            int: Filas insertadas
+        """
+        try:
+            if not self._conectado:
+                self.connect()
+            if not filas:
+                return 0
+            columnas = list(dict.fromkeys(columna for fila in filas for columna in fila))
+            sql = (
+                f"INSERT INTO {_validar_tabla(nombre_tabla, vistas=False)} ({_columnas_sql(','.join(columnas))}) "
+                f"VALUES ({','.join('?' * len(columnas))})"
+            )
+            with self._conexion() as conexion:
+                conexion.executemany(sql, [[_valor(fila.get(c)) for c in columnas] for fila in filas])
+            return len(filas)
+        except Exception as e:
+            raise Exception(f"Error al insertar en {nombre_tabla}: {str(e)}")
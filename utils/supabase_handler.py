@@ -4,8 +4,15 @@ Opción más simple que Turso y Google Sheets - todo en el navegador
 """
 
 import streamlit as st
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import hashlib
 import os
+import threading
+
+from utils.elegibilidad import COLUMNAS_EMAIL_EQUIPO
+from utils.resiliencia import resiliente, falta_en_base, tiempo_restante
 
 # Cargar variables de entorno ANTES de intentar usarlas
 try:
@@ -20,6 +27,276 @@ try:
 except ImportError:
     SUPABASE_AVAILABLE = False
 
+# Opciones del cliente e httpx son opcionales: según la versión de supabase-py
+# el cliente acepta o no un httpx.Client propio con límites de conexiones
+try:
+    import httpx
+    from supabase import ClientOptions
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Límites del pool de conexiones HTTP por cliente
+MAX_CONEXIONES = int(os.getenv("SUPABASE_MAX_CONEXIONES", 20))
+MAX_CONEXIONES_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", 10))
+KEEPALIVE_SEGUNDOS = 60
+# Tope de las peticiones hechas fuera de la capa de resiliencia; dentro de
+# ella manda el tiempo límite de la operación (TransporteConLimite)
+TIMEOUT_SEGUNDOS = 30
+
+# Límite de filas por respuesta de PostgREST (max-rows, 1000 por defecto en
+# Supabase); el servidor corta en silencio cualquier página más grande
+MAX_FILAS_POSTGREST = int(os.getenv("SUPABASE_MAX_FILAS", 1000))
+# Filas por página en las lecturas completas (nunca más que MAX_FILAS_POSTGREST)
+TAMANO_PAGINA = min(int(os.getenv("SUPABASE_TAMANO_PAGINA", 1000)), MAX_FILAS_POSTGREST)
+
+# Backend de almacenamiento: 'supabase' (predeterminado) o 'sqlite' para usar
+# una base local con el mismo esquema (ver utils/sqlite_handler.py)
+BACKEND = os.getenv("CONSTANCIAS_BACKEND", "supabase").strip().lower()
+
+# Columnas de participantes que se leen en la consulta puntual
+COLUMNAS_PARTICIPANTE = 'id,nombre_completo,email,categoria,programa,encuesta_completada'
+
+
+def patron_email(email):
+    """Patrón de ilike que coincide solo con ese email: escapa los comodines \\, % y _"""
+    return email.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def filtrar_email(consulta, columna, email):
+    """
+    Filtra una consulta por email sin distinguir mayúsculas, como LOWER() en la vista
+
+    Args:
+        consulta: Consulta de postgrest
+        columna (str): Columna con el email
+        email (str): Email buscado
+
+    Returns:
+        La consulta filtrada
+    """
+    if '*' in email:
+        # PostgREST convierte * en comodín y no se puede escapar: comparación exacta
+        return consulta.eq(columna, email)
+    return consulta.ilike(columna, patron_email(email))
+
+
+def condicion_email(columna, email):
+    """Condición de or_() equivalente a filtrar_email"""
+    if '*' in email:
+        return f'{columna}.eq."{email}"'
+    # Dentro de comillas, PostgREST pide escapar la diagonal invertida
+    return f'{columna}.ilike."{patron_email(email).replace(chr(92), chr(92) * 2)}"'
+
+
+def obtener_credenciales():
+    """
+    Obtiene SUPABASE_URL y SUPABASE_KEY desde Streamlit secrets o variables de entorno
+
+    Returns:
+        tuple: (url, key); cualquiera puede ser None si no está definida
+    """
+    try:
+        # Primero intenta Streamlit secrets (producción)
+        url = st.secrets.get("SUPABASE_URL")
+        key = st.secrets.get("SUPABASE_KEY")
+    except:
+        # Luego intenta variables de entorno (desarrollo local)
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+    return url, key
+
+
+def filas_respuestas(email, nombre_completo, respuestas, preguntas_dict, momento=None):
+    """Filas de encuesta_respuestas de un participante, con la misma fecha y timestamp"""
+    momento = datetime.fromtimestamp(momento) if momento else datetime.now()
+    fecha = momento.strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = int(momento.timestamp())
+
+    filas = []
+    for pregunta_id, respuesta in respuestas.items():
+        pregunta_texto = preguntas_dict.get(pregunta_id, f"Pregunta {pregunta_id}")
+
+        filas.append({
+            'participante_email': email.lower(),
+            'nombre_completo': nombre_completo,
+            'pregunta_id': pregunta_id,
+            'pregunta_texto': pregunta_texto,
+            'respuesta': str(respuesta),
+            'fecha': fecha,
+            'timestamp': timestamp
+        })
+    return filas
+
+
+if HTTPX_AVAILABLE:
+    class TransporteConLimite(httpx.HTTPTransport):
+        """
+        Transporte que acota cada petición al tiempo que le queda a la operación
+
+        Cuando la petición se hace dentro de una operación de la capa de
+        resiliencia, su timeout de conexión, lectura, escritura y espera del
+        pool es el tiempo restante de ese intento; así, al vencer, la petición
+        se corta en lugar de seguir ocupando el hilo.
+        """
+
+        def handle_request(self, request):
+            restante = tiempo_restante()
+            if restante is not None:
+                if restante <= 0:
+                    raise httpx.TimeoutException("Tiempo de la operación agotado", request=request)
+                actual = request.extensions.get('timeout', {})
+                request.extensions['timeout'] = {
+                    tipo: restante if actual.get(tipo) is None else min(actual[tipo], restante)
+                    for tipo in ('connect', 'read', 'write', 'pool')
+                }
+            return super().handle_request(request)
+
+
+class GestorClientes:
+    """
+    Clientes de Supabase compartidos por todo el proceso
+
+    Crea un solo cliente por juego de credenciales y lo reutiliza entre
+    sesiones de Streamlit e hilos, de modo que las conexiones HTTP (y sus
+    handshakes TLS) se mantienen abiertas entre operaciones. Cuando la versión
+    de supabase-py lo permite, cada cliente usa un httpx.Client con un pool de
+    conexiones acotado.
+    """
+
+    def __init__(self, max_conexiones=MAX_CONEXIONES, max_keepalive=MAX_CONEXIONES_KEEPALIVE):
+        self.max_conexiones = max_conexiones
+        self.max_keepalive = max_keepalive
+        self._lock = threading.Lock()
+        self._clientes = {}       # (url, hash de la key) -> cliente
+        self._http = {}           # (url, hash de la key) -> httpx.Client propio, si se pudo usar
+        self._credenciales = None
+        self.creados = 0
+        self.reutilizados = 0
+        self.errores = 0
+
+    @staticmethod
+    def _clave(url, key):
+        # La key no se guarda en claro como clave del diccionario
+        return (url, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def credenciales(self):
+        """Credenciales del proceso, resueltas una sola vez"""
+        with self._lock:
+            if self._credenciales is None or not all(self._credenciales):
+                self._credenciales = obtener_credenciales()
+            return self._credenciales
+
+    def _crear_http(self):
+        """httpx.Client con pool acotado y timeout por operación, o None si supabase-py no permite pasarlo"""
+        if not HTTPX_AVAILABLE:
+            return None
+        try:
+            if 'httpx_client' not in ClientOptions.__dataclass_fields__:
+                return None
+        except AttributeError:
+            return None
+        return httpx.Client(
+            transport=TransporteConLimite(
+                limits=httpx.Limits(
+                    max_connections=self.max_conexiones,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=KEEPALIVE_SEGUNDOS
+                )
+            ),
+            timeout=TIMEOUT_SEGUNDOS
+        )
+
+    def obtener(self, url, key):
+        """
+        Devuelve el cliente para unas credenciales, creándolo la primera vez
+
+        Args:
+            url (str): SUPABASE_URL
+            key (str): SUPABASE_KEY
+
+        Returns:
+            Client: Cliente compartido
+        """
+        clave = self._clave(url, key)
+        with self._lock:
+            cliente = self._clientes.get(clave)
+            if cliente is not None:
+                self.reutilizados += 1
+                return cliente
+
+            try:
+                http = self._crear_http()
+                if http is not None:
+                    cliente = create_client(url, key, options=ClientOptions(httpx_client=http))
+                    self._http[clave] = http
+                else:
+                    cliente = create_client(url, key)
+                # Crear ya el cliente de PostgREST (perezoso en supabase-py) para
+                # que dos hilos no lo inicialicen al mismo tiempo
+                getattr(cliente, 'postgrest', None)
+            except Exception:
+                self.errores += 1
+                raise
+
+            self._clientes[clave] = cliente
+            self.creados += 1
+            return cliente
+
+    def invalidar(self, url=None, key=None):
+        """Descarta el cliente de unas credenciales (o todos) para recrearlo en el siguiente uso"""
+        with self._lock:
+            if url is None:
+                claves = list(self._clientes)
+                self._credenciales = None
+            else:
+                claves = [self._clave(url, key)]
+            for clave in claves:
+                self._clientes.pop(clave, None)
+                http = self._http.pop(clave, None)
+                if http is not None:
+                    try:
+                        http.close()
+                    except Exception:
+                        pass
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Clientes vivos, creados, reutilizados, errores y conexiones de los pools propios
+        """
+        with self._lock:
+            conexiones = 0
+            for http in self._http.values():
+                try:
+                    # Detalle interno de httpcore; si cambia, simplemente no se reporta
+                    conexiones += len(http._transport._pool.connections)
+                except Exception:
+                    pass
+            return {
+                'clientes': len(self._clientes),
+                'creados': self.creados,
+                'reutilizados': self.reutilizados,
+                'errores': self.errores,
+                'pool_propio': len(self._http),
+                'conexiones_abiertas': conexiones,
+                'max_conexiones': self.max_conexiones,
+                'max_keepalive': self.max_keepalive,
+            }
+
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+
+def obtener_gestor():
+    """Devuelve el gestor de clientes de Supabase del proceso"""
+    global _gestor
+    with _gestor_lock:
+        if _gestor is None:
+            _gestor = GestorClientes()
+        return _gestor
+
 
 class SupabaseHandler:
     """Maneja la conexión y operaciones con Supabase"""
@@ -30,14 +307,8 @@ class SupabaseHandler:
             raise ImportError("supabase no está instalado. Ejecuta: pip install supabase")
         
         # Obtener credenciales desde Streamlit secrets o variables de entorno
-        try:
-            # Primero intenta Streamlit secrets (producción)
-            self.url = st.secrets.get("SUPABASE_URL")
-            self.key = st.secrets.get("SUPABASE_KEY")
-        except:
-            # Luego intenta variables de entorno (desarrollo local)
-            self.url = os.getenv("SUPABASE_URL")
-            self.key = os.getenv("SUPABASE_KEY")
+        # (resueltas una sola vez por proceso)
+        self.url, self.key = obtener_gestor().credenciales()
         
         if not self.url or not self.key:
             raise ValueError(
@@ -46,19 +317,189 @@ class SupabaseHandler:
             )
         
         self.client: Client = None
+        self._funciones_faltantes = set()   # funciones y vistas SQL que no están instaladas
     
     def connect(self):
-        """Establece conexión con Supabase"""
+        """Establece conexión con Supabase (reutiliza el cliente compartido del proceso)"""
         try:
-            self.client = create_client(self.url, self.key)
+            self.client = obtener_gestor().obtener(self.url, self.key)
             return True
         except Exception as e:
             raise Exception(f"Error al conectar con Supabase: {str(e)}")
     
+    @resiliente('lectura')
+    def _pagina(self, tabla, columnas, despues_de, tamano_pagina):
+        """Lee una página de una tabla: las filas con id mayor a despues_de, ordenadas por id"""
+        consulta = self.client.table(tabla).select(columnas)
+        if despues_de is not None:
+            consulta = consulta.gt('id', despues_de)
+        response = consulta.order('id').limit(tamano_pagina).execute()
+        return response.data or []
+
+    def iterar_paginas(self, tabla, columnas='*', tamano_pagina=None, prefetch=False):
+        """
+        Recorre una tabla completa por páginas, usando paginación por id (keyset)
+
+        A diferencia de un select('*') sin límite, no se trunca en el máximo de
+        filas de PostgREST y nunca hay más de una o dos páginas en memoria. Las
+        columnas deben incluir 'id'. Termina con la primera página vacía, no con
+        la primera corta: si el servidor tiene un max-rows menor que el tamaño
+        de página, todas las páginas llegan cortas.
+
+        Args:
+            tabla (str): Tabla o vista con columna 'id' única
+            columnas (str): Columnas a leer (ej: 'id,email')
+            tamano_pagina (int, optional): Filas por página; por defecto TAMANO_PAGINA
+            prefetch (bool): Pedir la siguiente página mientras se procesa la actual
+
+        Yields:
+            list: Filas de cada página (lista de diccionarios)
+        """
+        if not self.client:
+            self.connect()
+        tamano_pagina = tamano_pagina or TAMANO_PAGINA
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="supabase-pagina") if prefetch else None
+        try:
+            filas = self._pagina(tabla, columnas, None, tamano_pagina)
+            while filas:
+                siguiente = None
+                if executor is not None:
+                    siguiente = executor.submit(self._pagina, tabla, columnas, filas[-1]['id'], tamano_pagina)
+
+                ultimo = filas[-1]['id']
+                yield filas
+
+                if siguiente is not None:
+                    filas = siguiente.result()
+                else:
+                    filas = self._pagina(tabla, columnas, ultimo, tamano_pagina)
+        except Exception as e:
+            raise Exception(f"Error al leer {tabla} desde Supabase: {str(e)}")
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    @resiliente('lectura')
+    def obtener_marca(self, tabla, columna):
+        """
+        Marca de agua de una tabla: la fila más reciente según una columna
+
+        Args:
+            tabla (str): Tabla a consultar
+            columna (str): Columna ordenable (ej: 'updated_at' o 'id')
+
+        Returns:
+            tuple: (valor de la columna, id) de la última fila, o None si no hay filas
+        """
+        try:
+            if not self.client:
+                self.connect()
+            response = self.client.table(tabla)\
+                .select(f'{columna},id')\
+                .not_.is_(columna, 'null')\
+                .order(columna, desc=True)\
+                .order('id', desc=True)\
+                .limit(1)\
+                .execute()
+            if not response.data:
+                return None
+            return response.data[0][columna], response.data[0]['id']
+        except Exception as e:
+            raise Exception(f"Error al consultar {tabla}.{columna}: {str(e)}")
+
+    @resiliente('lectura')
+    def obtener_cambios(self, tabla, columna, desde=None, columnas='*', limite=None):
+        """
+        Filas posteriores a una marca de agua, para las lecturas incrementales
+
+        Se ordenan por (columna, id) y se pagina por ese par, así que las filas
+        con el mismo valor de la columna (un lote insertado en la misma
+        transacción) no se vuelven a leer.
+
+        Args:
+            tabla (str): Tabla a consultar
+            columna (str): Columna de la marca (ej: 'updated_at', 'created_at' o 'id')
+            desde (tuple, optional): (valor, id) de obtener_marca o de la última
+                                     fila leída; None lee desde el principio
+            columnas (str): Columnas a leer
+            limite (int, optional): Máximo de filas; por defecto TAMANO_PAGINA
+
+        Returns:
+            list: Filas ordenadas por la columna de la marca y el id
+        """
+        try:
+            if not self.client:
+                self.connect()
+            consulta = self.client.table(tabla).select(columnas)
+            if desde is not None:
+                valor, ultimo_id = desde
+                if columna == 'id':
+                    consulta = consulta.gt('id', ultimo_id)
+                else:
+                    consulta = consulta.or_(
+                        f'{columna}.gt."{valor}",and({columna}.eq."{valor}",id.gt.{ultimo_id})'
+                    )
+            response = consulta.order(columna).order('id').limit(limite or TAMANO_PAGINA).execute()
+            return response.data or []
+        except Exception as e:
+            raise Exception(f"Error al leer cambios de {tabla}: {str(e)}")
+
+    @resiliente('lectura')
+    def contar_filas(self, tabla):
+        """
+        Número de filas de una tabla o vista (sin leerlas)
+
+        Returns:
+            int: Filas de la tabla
+        """
+        try:
+            if not self.client:
+                self.connect()
+            response = self.client.table(tabla)\
+                .select('id', count='exact')\
+                .limit(1)\
+                .execute()
+            return int(response.count or 0)
+        except Exception as e:
+            raise Exception(f"Error al contar {tabla}: {str(e)}")
+
+    def iterar_filas(self, tabla, columnas='*', tamano_pagina=None, prefetch=False):
+        """Igual que iterar_paginas, pero entrega las filas una por una"""
+        for filas in self.iterar_paginas(tabla, columnas, tamano_pagina, prefetch):
+            yield from filas
+
+    def iterar_participantes(self, tamano_pagina=None, prefetch=False):
+        """
+        Recorre los participantes por páginas desde la vista completa
+
+        Si la vista no existe o falla en la primera página, se usa la tabla
+        participantes como en obtener_todos_participantes.
+
+        Yields:
+            list: Filas de cada página
+        """
+        paginas = self.iterar_paginas('vista_participantes_completa', '*', tamano_pagina, prefetch)
+        try:
+            primera = next(paginas, None)
+        except Exception:
+            paginas = self.iterar_paginas('participantes', '*', tamano_pagina, prefetch)
+            primera = next(paginas, None)
+        if primera is None:
+            return
+        yield primera
+        yield from paginas
+
+    @resiliente('escritura')
     def guardar_respuestas(self, email, nombre_completo, respuestas, preguntas_dict):
         """
         Guarda las respuestas de la encuesta en Supabase
         
+        Las respuestas se escriben con upsert sobre el índice único
+        (participante_email, pregunta_id) y después se borran las de preguntas
+        que ya no se respondieron, así que un error a la mitad nunca deja al
+        participante sin respuestas.
+        
         Args:
             email (str): Email del participante
             nombre_completo (str): Nombre completo del participante
@@ -72,45 +513,167 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            # 1. Eliminar respuestas previas del mismo participante
-            self.client.table('encuesta_respuestas')\
-                .delete()\
-                .eq('participante_email', email.lower())\
-                .execute()
+            # 1. Insertar o reemplazar todas las respuestas de una vez
+            filas = filas_respuestas(email, nombre_completo, respuestas, preguntas_dict)
+            if filas:
+                self.client.table('encuesta_respuestas')\
+                    .upsert(filas, on_conflict='participante_email,pregunta_id')\
+                    .execute()
             
-            # 2. Preparar timestamp
-            fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            timestamp = int(datetime.now().timestamp())
-            
-            # 3. Preparar datos para inserción
-            datos_insertar = []
-            for pregunta_id, respuesta in respuestas.items():
-                pregunta_texto = preguntas_dict.get(pregunta_id, f"Pregunta {pregunta_id}")
-                
-                datos_insertar.append({
-                    'participante_email': email.lower(),
-                    'nombre_completo': nombre_completo,
-                    'pregunta_id': pregunta_id,
-                    'pregunta_texto': pregunta_texto,
-                    'respuesta': str(respuesta),
-                    'fecha': fecha,
-                    'timestamp': timestamp
-                })
-            
-            # 4. Insertar todas las respuestas de una vez
-            result = self.client.table('encuesta_respuestas')\
-                .insert(datos_insertar)\
-                .execute()
+            # 2. Eliminar respuestas previas de preguntas que ya no se respondieron
+            consulta = self.client.table('encuesta_respuestas')\
+                .delete()\
+                .eq('participante_email', email.lower())
+            if filas:
+                consulta = consulta.not_.in_('pregunta_id', [f['pregunta_id'] for f in filas])
+            consulta.execute()
             
             return True
             
         except Exception as e:
             raise Exception(f"Error al guardar en Supabase: {str(e)}")
     
+    @resiliente('escritura')
+    def guardar_encuesta(self, email, nombre_completo, respuestas, preguntas_dict):
+        """
+        Guarda las respuestas y marca la encuesta como completada en una sola transacción
+        
+        Usa la función SQL guardar_encuesta (una sola llamada HTTP); si no está
+        instalada, hace guardar_respuestas y marcar_encuesta_completada.
+        
+        Args:
+            email (str): Email del participante
+            nombre_completo (str): Nombre completo del participante
+            respuestas (dict): Diccionario {pregunta_id: respuesta}
+            preguntas_dict (dict): Diccionario {pregunta_id: texto_pregunta}
+        
+        Returns:
+            dict: 'email', 'respuestas' (número guardado) y 'encuesta_completada'
+        """
+        try:
+            if not self.client:
+                self.connect()
+            
+            filas = filas_respuestas(email, nombre_completo, respuestas, preguntas_dict)
+            instalada, estado = self._llamar_funcion('guardar_encuesta', {
+                'p_email': email.lower(),
+                'p_nombre_completo': nombre_completo,
+                'p_respuestas': [
+                    {k: f[k] for k in ('pregunta_id', 'pregunta_texto', 'respuesta')} for f in filas
+                ],
+                'p_fecha': filas[0]['fecha'] if filas else datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'p_timestamp': filas[0]['timestamp'] if filas else int(datetime.now().timestamp()),
+            })
+            if instalada:
+                return estado
+            
+            self.guardar_respuestas(email, nombre_completo, respuestas, preguntas_dict)
+            self.marcar_encuesta_completada(email)
+            return {'email': email.lower(), 'respuestas': len(filas), 'encuesta_completada': True}
+            
+        except Exception as e:
+            raise Exception(f"Error al guardar la encuesta en Supabase: {str(e)}")
+    
+    @resiliente('escritura')
+    def guardar_encuestas_lote(self, encuestas):
+        """
+        Guarda varias encuestas completas a la vez
+        
+        Usa la función SQL guardar_encuestas_lote (una sola llamada y una sola
+        transacción); si no está instalada, hace un upsert con las respuestas de
+        todas las encuestas, borra las respuestas obsoletas y marca las
+        encuestas como completadas con una actualización por lote.
+        
+        Args:
+            encuestas (list): Diccionarios con 'email', 'nombre_completo',
+                              'respuestas' {pregunta_id: respuesta},
+                              'preguntas' {pregunta_id: texto} y 'momento'
+                              (timestamp Unix del envío)
+        
+        Returns:
+            int: Número de encuestas guardadas
+        """
+        try:
+            if not self.client:
+                self.connect()
+            if not encuestas:
+                return 0
+            
+            filas_por_email = {}
+            for encuesta in encuestas:
+                # Si un participante envió varias veces, gana el último envío
+                filas_por_email[encuesta['email'].lower()] = filas_respuestas(
+                    encuesta['email'], encuesta['nombre_completo'], encuesta['respuestas'],
+                    encuesta['preguntas'], encuesta.get('momento')
+                )
+            
+            instalada, guardadas = self._llamar_funcion('guardar_encuestas_lote', {
+                'p_encuestas': [
+                    {
+                        'email': email,
+                        'nombre_completo': filas[0]['nombre_completo'] if filas else '',
+                        'respuestas': [
+                            {k: f[k] for k in ('pregunta_id', 'pregunta_texto', 'respuesta')} for f in filas
+                        ],
+                        'fecha': filas[0]['fecha'] if filas else '',
+                        'timestamp': filas[0]['timestamp'] if filas else 0,
+                    }
+                    for email, filas in filas_por_email.items()
+                ]
+            })
+            if instalada:
+                return guardadas
+            
+            # 1. Upsert de todas las respuestas en una sola petición
+            todas = [fila for filas in filas_por_email.values() for fila in filas]
+            if todas:
+                self.client.table('encuesta_respuestas')\
+                    .upsert(todas, on_conflict='participante_email,pregunta_id')\
+                    .execute()
+            
+            # 2. Borrar respuestas obsoletas; una petición por cada conjunto de
+            #    preguntas distinto (general, con workshop, con mundialito...)
+            por_preguntas = {}
+            for email, filas in filas_por_email.items():
+                ids = tuple(sorted(f['pregunta_id'] for f in filas))
+                por_preguntas.setdefault(ids, []).append(email)
+            for ids, emails in por_preguntas.items():
+                consulta = self.client.table('encuesta_respuestas')\
+                    .delete()\
+                    .in_('participante_email', emails)
+                if ids:
+                    consulta = consulta.not_.in_('pregunta_id', list(ids))
+                consulta.execute()
+            
+            # 3. Marcar todas como completadas (sin distinguir mayúsculas)
+            self.client.table('participantes')\
+                .update({'encuesta_completada': True})\
+                .or_(','.join(condicion_email('email', email) for email in filas_por_email))\
+                .execute()
+            
+            return len(filas_por_email)
+            
+        except Exception as e:
+            raise Exception(f"Error al guardar encuestas en Supabase: {str(e)}")
+    
+    @resiliente('lectura')
+    def _respuestas_de(self, email):
+        """Respuestas de un participante, ordenadas por pregunta"""
+        response = self.client.table('encuesta_respuestas')\
+            .select('*')\
+            .eq('participante_email', email.lower())\
+            .order('pregunta_id')\
+            .execute()
+        return response.data
+
     def obtener_respuestas(self, email=None):
         """
         Obtiene respuestas de la base de datos
         
+        Sin email se recorre la tabla completa; no pasa como una sola operación
+        por la capa de resiliencia, sino cada página, con su propio tiempo
+        límite y sus reintentos.
+        
         Args:
             email (str, optional): Email del participante. Si es None, obtiene todas.
         
@@ -122,26 +685,39 @@ class SupabaseHandler:
                 self.connect()
             
             if email:
-                response = self.client.table('encuesta_respuestas')\
-                    .select('*')\
-                    .eq('participante_email', email.lower())\
-                    .order('pregunta_id')\
-                    .execute()
-            else:
-                response = self.client.table('encuesta_respuestas')\
-                    .select('*')\
-                    .order('timestamp', desc=True)\
-                    .execute()
+                return self._respuestas_de(email)
             
-            return response.data
+            # Todas: se leen por páginas y se ordenan aquí por timestamp
+            respuestas = list(self.iterar_filas('encuesta_respuestas'))
+            respuestas.sort(key=lambda r: r.get('timestamp') or '', reverse=True)
+            return respuestas
             
         except Exception as e:
             raise Exception(f"Error al obtener respuestas de Supabase: {str(e)}")
     
-    def obtener_estadisticas(self):
+    @resiliente('lectura')
+    def _leer_estadisticas(self, tabla):
+        """Primera fila de la vista o tabla de estadísticas, o None si está vacía"""
+        response = self.client.table(tabla)\
+            .select('total_respuestas,total_participantes,ultima_respuesta')\
+            .limit(1)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    def obtener_estadisticas(self, incremental=False):
         """
         Obtiene estadísticas básicas de las respuestas
         
+        Se calculan en la base con la vista vista_estadisticas_encuesta, en una
+        sola consulta. Con incremental=True se leen los contadores de
+        encuesta_estadisticas, que los triggers mantienen al guardar encuestas
+        y no dependen del número de respuestas. Si no están instaladas se
+        calculan en el cliente recorriendo la tabla por páginas, así que cada
+        consulta (no el cálculo completo) pasa por la capa de resiliencia.
+        
+        Args:
+            incremental (bool): Leer los contadores mantenidos por triggers
+        
         Returns:
             dict: Diccionario con estadísticas
         """
@@ -149,41 +725,57 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            # Total de respuestas
-            total_response = self.client.table('encuesta_respuestas')\
-                .select('id', count='exact')\
-                .execute()
-            total_respuestas = total_response.count if hasattr(total_response, 'count') else 0
-            
-            # Obtener todas las respuestas para contar participantes únicos
-            all_response = self.client.table('encuesta_respuestas')\
-                .select('participante_email')\
-                .execute()
-            
-            emails_unicos = set()
-            if all_response.data:
-                emails_unicos = {r['participante_email'] for r in all_response.data}
-            
-            # Última respuesta
-            ultima_response = self.client.table('encuesta_respuestas')\
-                .select('fecha')\
-                .order('timestamp', desc=True)\
-                .limit(1)\
-                .execute()
+            tabla = 'encuesta_estadisticas' if incremental else 'vista_estadisticas_encuesta'
+            if tabla not in self._funciones_faltantes:
+                try:
+                    fila = self._leer_estadisticas(tabla)
+                    if fila:
+                        return {
+                            'total_respuestas': int(fila['total_respuestas'] or 0),
+                            'total_participantes': int(fila['total_participantes'] or 0),
+                            'ultima_respuesta': fila['ultima_respuesta']
+                        }
+                except Exception as e:
+                    if not falta_en_base(e):
+                        raise
+                    print(f"{tabla} no disponible en Supabase, calculando estadísticas en el cliente")
+                    self._funciones_faltantes.add(tabla)
             
-            ultima_respuesta = None
-            if ultima_response.data and len(ultima_response.data) > 0:
-                ultima_respuesta = ultima_response.data[0]['fecha']
-            
-            return {
-                'total_respuestas': total_respuestas,
-                'total_participantes': len(emails_unicos),
-                'ultima_respuesta': ultima_respuesta
-            }
+            return self._calcular_estadisticas()
             
         except Exception as e:
             raise Exception(f"Error al obtener estadísticas: {str(e)}")
     
+    @resiliente('lectura')
+    def _ultima_respuesta(self):
+        """Fecha de la respuesta más reciente, o None si no hay respuestas"""
+        response = self.client.table('encuesta_respuestas')\
+            .select('fecha')\
+            .order('timestamp', desc=True)\
+            .limit(1)\
+            .execute()
+        return response.data[0]['fecha'] if response.data else None
+
+    def _calcular_estadisticas(self):
+        """Estadísticas calculadas en el cliente, si la vista no está instalada en la base"""
+        # Total de respuestas
+        total_respuestas = self.contar_filas('encuesta_respuestas')
+        
+        # Participantes únicos (leídos por páginas)
+        emails_unicos = {
+            r['participante_email'] for r in self.iterar_filas('encuesta_respuestas', 'id,participante_email')
+        }
+        
+        # Última respuesta
+        ultima_respuesta = self._ultima_respuesta()
+        
+        return {
+            'total_respuestas': total_respuestas,
+            'total_participantes': len(emails_unicos),
+            'ultima_respuesta': ultima_respuesta
+        }
+    
+    @resiliente('lectura')
     def obtener_respuestas_por_pregunta(self, pregunta_id):
         """
         Obtiene todas las respuestas de una pregunta específica
@@ -209,6 +801,7 @@ class SupabaseHandler:
         except Exception as e:
             raise Exception(f"Error al obtener respuestas por pregunta: {str(e)}")
     
+    @resiliente('lectura')
     def verificar_encuesta_completada(self, email):
         """
         Verifica si un participante ya completó la encuesta
@@ -223,10 +816,9 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('participantes')\
-                .select('encuesta_completada')\
-                .eq('email', email.lower())\
-                .execute()
+            response = filtrar_email(
+                self.client.table('participantes').select('encuesta_completada'), 'email', email.lower()
+            ).execute()
             
             if response.data and len(response.data) > 0:
                 return response.data[0].get('encuesta_completada', False)
@@ -236,6 +828,7 @@ class SupabaseHandler:
         except Exception as e:
             raise Exception(f"Error al verificar encuesta: {str(e)}")
     
+    @resiliente('escritura')
     def marcar_encuesta_completada(self, email):
         """
         Marca la encuesta como completada para un participante
@@ -250,16 +843,16 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('participantes')\
-                .update({'encuesta_completada': True})\
-                .eq('email', email.lower())\
-                .execute()
+            response = filtrar_email(
+                self.client.table('participantes').update({'encuesta_completada': True}), 'email', email.lower()
+            ).execute()
             
             return True
             
         except Exception as e:
             raise Exception(f"Error al marcar encuesta completada: {str(e)}")
     
+    @resiliente('lectura')
     def obtener_participante(self, email):
         """
         Obtiene los datos de un participante desde Supabase
@@ -274,10 +867,9 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('participantes')\
-                .select('*')\
-                .eq('email', email.lower())\
-                .execute()
+            response = filtrar_email(
+                self.client.table('participantes').select('*'), 'email', email.lower()
+            ).execute()
             
             if response.data and len(response.data) > 0:
                 return response.data[0]
@@ -287,6 +879,150 @@ class SupabaseHandler:
         except Exception as e:
             raise Exception(f"Error al obtener participante: {str(e)}")
     
+    @resiliente('lectura')
+    def obtener_datos_elegibilidad(self, email):
+        """
+        Obtiene lo necesario para verificar la elegibilidad de un solo participante
+
+        Son tres consultas filtradas por email (todas sobre columnas con índice)
+        y con solo las columnas necesarias, en lugar de leer las tablas completas.
+        El resultado se pasa a elegibilidad.verificar_elegibilidad_puntual.
+
+        Args:
+            email (str): Email del participante
+
+        Returns:
+            dict: 'participante' (dict o None), 'total_asistencias',
+                  'asistencias_confirmadas', 'workshops' (códigos W*) y
+                  'en_equipo' (bool); la misma forma que la función SQL
+                  obtener_elegibilidad
+        """
+        try:
+            if not self.client:
+                self.connect()
+
+            email = email.strip().lower()
+
+            # Sin distinguir mayúsculas, igual que la vista y el snapshot completo
+            response = filtrar_email(
+                self.client.table('participantes').select(COLUMNAS_PARTICIPANTE), 'email', email
+            ).limit(1).execute()
+            if not response.data:
+                return {
+                    'participante': None,
+                    'total_asistencias': 0,
+                    'asistencias_confirmadas': 0,
+                    'workshops': [],
+                    'en_equipo': False,
+                }
+            participante = response.data[0]
+
+            asistencias = filtrar_email(
+                self.client.table('asistencias').select('actividad_codigo,estado'), 'participante_email', email
+            ).execute()
+
+            # Capitán o cualquiera de los 5 miembros
+            filtro_equipo = ','.join(condicion_email(columna, email) for columna in COLUMNAS_EMAIL_EQUIPO)
+            equipos = self.client.table('equipos_concurso')\
+                .select('id')\
+                .or_(filtro_equipo)\
+                .limit(1)\
+                .execute()
+
+            asistencias = asistencias.data or []
+            return {
+                'participante': participante,
+                'total_asistencias': len(asistencias),
+                'asistencias_confirmadas': sum(1 for a in asistencias if a.get('estado') == 'asistió'),
+                'workshops': sorted({
+                    a['actividad_codigo'] for a in asistencias
+                    if a.get('actividad_codigo') and a['actividad_codigo'].startswith('W')
+                }),
+                'en_equipo': bool(equipos.data),
+            }
+
+        except Exception as e:
+            raise Exception(f"Error al obtener elegibilidad del participante: {str(e)}")
+    
+    def _llamar_funcion(self, nombre, parametros):
+        """
+        Llama una función SQL por RPC
+
+        Si la función no está instalada en la base (no se ha ejecutado la
+        versión actual de crear_tablas_supabase.sql) se recuerda y no se vuelve
+        a intentar en este proceso.
+
+        Returns:
+            tuple: (instalada, datos); datos es None si la función no existe
+        """
+        if nombre in self._funciones_faltantes:
+            return False, None
+        try:
+            response = self.client.rpc(nombre, parametros).execute()
+            return True, response.data
+        except Exception as e:
+            if falta_en_base(e):
+                print(f"Función {nombre} no disponible en Supabase, usando consultas directas")
+                self._funciones_faltantes.add(nombre)
+                return False, None
+            raise
+    
+    @resiliente('lectura')
+    def obtener_elegibilidad(self, email):
+        """
+        Obtiene los datos de elegibilidad de un participante en una sola llamada
+
+        Usa la función SQL obtener_elegibilidad; si no está instalada, hace las
+        consultas de obtener_datos_elegibilidad.
+
+        Args:
+            email (str): Email del participante
+
+        Returns:
+            dict: Misma forma que obtener_datos_elegibilidad
+        """
+        try:
+            if not self.client:
+                self.connect()
+            
+            email = email.strip().lower()
+            instalada, datos = self._llamar_funcion('obtener_elegibilidad', {'p_email': email})
+            if instalada:
+                return datos
+            
+            return self.obtener_datos_elegibilidad(email)
+            
+        except Exception as e:
+            raise Exception(f"Error al obtener elegibilidad: {str(e)}")
+    
+    @resiliente('lectura')
+    def obtener_elegibilidad_lote(self, emails):
+        """
+        Obtiene los datos de elegibilidad de varios participantes en una sola llamada
+
+        Args:
+            emails (list): Emails de los participantes
+
+        Returns:
+            dict: Email (en minúsculas) -> datos con la forma de obtener_datos_elegibilidad
+        """
+        try:
+            if not self.client:
+                self.connect()
+            
+            emails = sorted({e.strip().lower() for e in emails if e and e.strip()})
+            if not emails:
+                return {}
+            
+            instalada, datos = self._llamar_funcion('obtener_elegibilidad_lote', {'p_emails': emails})
+            if instalada:
+                return datos or {}
+            
+            return {email: self.obtener_datos_elegibilidad(email) for email in emails}
+            
+        except Exception as e:
+            raise Exception(f"Error al obtener elegibilidad: {str(e)}")
+    
     def obtener_todos_participantes(self):
         """
         Obtiene todos los participantes desde Supabase usando la vista completa
@@ -300,21 +1036,11 @@ class SupabaseHandler:
                 self.connect()
             
             # Usar la vista que ya calcula total_asistencias automáticamente
-            response = self.client.table('vista_participantes_completa')\
-                .select('*')\
-                .execute()
-            
-            return response.data if response.data else []
+            # (con la tabla participantes como fallback), leída por páginas
+            return [fila for filas in self.iterar_participantes() for fila in filas]
             
         except Exception as e:
-            # Si falla la vista, intentar con tabla participantes como fallback
-            try:
-                response = self.client.table('participantes')\
-                    .select('*')\
-                    .execute()
-                return response.data if response.data else []
-            except:
-                raise Exception(f"Error al obtener participantes: {str(e)}")
+            raise Exception(f"Error al obtener participantes: {str(e)}")
     
     def obtener_todas_asistencias(self):
         """
@@ -327,11 +1053,7 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('asistencias')\
-                .select('*')\
-                .execute()
-            
-            return response.data if response.data else []
+            return list(self.iterar_filas('asistencias'))
             
         except Exception as e:
             raise Exception(f"Error al obtener asistencias: {str(e)}")
@@ -347,11 +1069,7 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('actividades')\
-                .select('*')\
-                .execute()
-            
-            return response.data if response.data else []
+            return list(self.iterar_filas('actividades'))
             
         except Exception as e:
             raise Exception(f"Error al obtener actividades: {str(e)}")
@@ -367,14 +1085,105 @@ class SupabaseHandler:
             if not self.client:
                 self.connect()
             
-            response = self.client.table('equipos_concurso')\
-                .select('*')\
-                .execute()
-            
-            return response.data if response.data else []
+            return list(self.iterar_filas('equipos_concurso'))
             
         except Exception as e:
             raise Exception(f"Error al obtener equipos: {str(e)}")
+    
+    @resiliente('escritura')
+    def limpiar_tabla(self, nombre_tabla):
+        """
+        Elimina todas las filas de una tabla
+        
+        Args:
+            nombre_tabla (str): Nombre de la tabla
+        """
+        try:
+            if not self.client:
+                self.connect()
+            
+            self.client.table(nombre_tabla).delete().neq('id', -9999).execute()
+            return True
+            
+        except Exception as e:
+            raise Exception(f"Error al limpiar {nombre_tabla}: {str(e)}")
+    
+    @resiliente('escritura')
+    def insertar_filas(self, nombre_tabla, filas):
+        """
+        Inserta filas en una tabla en una sola petición
+        
+        Args:
+            nombre_tabla (str): Nombre de la tabla
+            filas (list): Diccionarios columna -> valor
+        
+        Returns:
+            int: Filas insertadas
+        """
+        try:
+            if not self.client:
+                self.connect()
+            if not filas:
+                return 0
+            
+            self.client.table(nombre_tabla).insert(filas).execute()
+            return len(filas)
+            
+        except Exception as e:
+            raise Exception(f"Error al insertar en {nombre_tabla}: {str(e)}")
+
+
+def construir_dataframe(paginas, columnas=None):
+    """
+    Construye un DataFrame página por página
+
+    Cada página se convierte a DataFrame en cuanto llega y su lista de
+    diccionarios se descarta, así que la tabla completa nunca está en memoria
+    dos veces (como filas y como DataFrame).
+
+    Args:
+        paginas (iterable): Páginas de filas, por ejemplo de SupabaseHandler.iterar_paginas
+        columnas (list, optional): Columnas del DataFrame si no llega ninguna fila
+
+    Returns:
+        pd.DataFrame: Todas las filas
+    """
+    partes = [pd.DataFrame(filas) for filas in paginas if filas]
+    if not partes:
+        return pd.DataFrame(columns=columnas or [])
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat(partes, ignore_index=True)
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def obtener_handler():
+    """
+    Devuelve un SupabaseHandler conectado, compartido por todo el proceso
+
+    El handler solo guarda las credenciales y el cliente compartido, así que
+    se puede usar desde varias sesiones e hilos a la vez. Con
+    CONSTANCIAS_BACKEND=sqlite se devuelve en su lugar un SQLiteHandler sobre
+    la base local (CONSTANCIAS_SQLITE_PATH), con los mismos métodos.
+
+    Returns:
+        SupabaseHandler: Handler ya conectado
+    """
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            if BACKEND == 'sqlite':
+                # Importación local: sqlite_handler importa este módulo
+                from utils.sqlite_handler import SQLiteHandler
+                handler = SQLiteHandler()
+            else:
+                handler = SupabaseHandler()
+            handler.connect()
+            _handler = handler
+        return _handler
 
 
 # Función de utilidad para uso rápido
@@ -386,7 +1195,7 @@ def guardar_respuestas_supabase(email, nombre_completo, respuestas, preguntas_di
         tuple: (success: bool, message: str)
     """
     try:
-        handler = SupabaseHandler()
+        handler = obtener_handler()
         handler.guardar_respuestas(email, nombre_completo, respuestas, preguntas_dict)
         return True, "Respuestas guardadas exitosamente en Supabase"
     except ImportError: